@@ -1,19 +1,49 @@
 #  pylint: disable=unsupported-assignment-operation,unsubscriptable-object
 import argparse
+import json
 import logging
 import pathlib
+import resource
 import sys
+import time
 import warnings
+from typing import Callable, Dict, List, Tuple, Union
 from urllib.request import urlretrieve
 
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+from stadfangaskra.cells import CELL_COLS, cell_columns
+from stadfangaskra.derived import (
+    build_centroids,
+    build_service_areas,
+    build_special_names,
+    build_street_dative,
+    build_street_postcodes,
+)
+from stadfangaskra.sqlite import write_sqlite
+from stadfangaskra.static import file_digest
 
 from .config import (
+    ADMINISTRATIVE_DIVISION_OVERRIDES,
+    COORDINATE_COLUMNS,
+    INDEX_COLUMNS,
     INT_CATEGORY_COLUMNS,
+    NATIVE_COORDINATE_COLUMNS,
+    NATIVE_POINT_COLUMN,
     POSTCODE_MUNICIPALITY_LOOKUP,
+    READ_BLOCK_SIZE,
+    REGIONS_PATH,
     RENAME_MAP,
+    ROW_GROUP_SIZE,
+    SORT_COLUMNS,
+    SOURCE_COLUMNS,
     STR_CATEGORY_COLUMNS,
+    TOWN_REGION_OVERRIDES,
 )
 
 SOURCE_URL = "https://gis.skra.is/geoserver/wfs?SERVICE=WFS&VERSION=1.0.0&REQUEST=GetFeature&TYPENAME=public%3aStadfangaskra&SRSNAME=EPSG%3a3057&OutputFormat=csv"
@@ -26,6 +56,299 @@ def download(dst: pathlib.Path) -> None:
     logger.info(f"Source file downloaded: {dst}")
 
 
+def peak_memory_mib() -> float:
+    """Peak resident set size of the current process in MiB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and kilobytes on Linux
+    if sys.platform == "darwin":
+        return peak / 1024 / 1024
+    return peak / 1024
+
+
+def map_categories(s: pd.Series, func: Callable[[pd.Index], pd.Index]) -> pd.Series:
+    """Applies ``func`` to the categories of ``s`` instead of to every row.
+
+    The mapped categories don't have to be unique, rows whose categories
+    collapse into the same value share a category in the result.
+
+    :param s: series to map, cast to a category if it isn't one already
+    :type s: pd.Series
+    :param func: vectorized function applied to the categories
+    :type func: Callable[[pd.Index], pd.Index]
+    :return: categorical series with mapped values
+    :rtype: pd.Series
+    """
+    cat = s.astype("category").cat
+    mapped, uniques = pd.factorize(pd.Index(func(cat.categories)))
+    codes = cat.codes.values
+    # keep missing values missing, take would wrap -1 around
+    row_codes = np.where(codes == -1, -1, mapped.take(codes))
+    return pd.Series(
+        pd.Categorical.from_codes(row_codes, categories=uniques), index=s.index
+    )
+
+
+def categories_to_str(s: pd.Series) -> np.ndarray:
+    """Materializes a categorical series as strings, missing values become "".
+
+    :param s: categorical series
+    :type s: pd.Series
+    :return: array of strings
+    :rtype: np.ndarray
+    """
+    # the code of missing values is -1, which takes the trailing empty string
+    values = np.append(s.cat.categories.astype(str).values, "")
+    return values.take(s.cat.codes.values)
+
+
+def parse_points(s: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    """Parses WKT points, "POINT (x y)", into coordinate arrays.
+
+    :param s: WKT points
+    :type s: pd.Series
+    :return: x and y of each point, NaN where it isn't a point
+    :rtype: Tuple[np.ndarray, np.ndarray]
+    """
+    parts = pc.extract_regex(
+        pa.array(s, type=pa.string(), from_pandas=True),
+        r"^\s*POINT\s*\(\s*(?P<x>[-+.\deE]+)\s+(?P<y>[-+.\deE]+)\s*\)\s*$",
+    )
+    return tuple(
+        pc.struct_field(parts, [i]).cast(pa.float64()).to_numpy(zero_copy_only=False)
+        for i in range(2)
+    )
+
+
+def read_source(path: Union[str, pathlib.Path]) -> pd.DataFrame:
+    """Parses the source csv with pyarrow, skipping unused columns.
+
+    The file is parsed in blocks of ``READ_BLOCK_SIZE`` bytes, only the
+    columns in ``SOURCE_COLUMNS`` are converted and string columns are
+    dictionary encoded while parsing. The parsed table is held in memory as a
+    whole, it's deduplicated and sorted by ``build_registry``.
+
+    :param path: path to the source csv file
+    :type path: Union[str, pathlib.Path]
+    :return: data frame with the columns in ``SOURCE_COLUMNS``, string
+             columns are categorical
+    :rtype: pd.DataFrame
+    """
+    dictionary = pa.dictionary(pa.int32(), pa.string())
+    column_types = {c: dictionary for c in STR_CATEGORY_COLUMNS if c != "municipality"}
+    column_types.update({c: pa.int32() for c in INT_CATEGORY_COLUMNS})
+    column_types.update({c: pa.float64() for c in COORDINATE_COLUMNS})
+    column_types.update(
+        {"POSTNR": pa.int32(), "FID": pa.string(), NATIVE_POINT_COLUMN: pa.string()}
+    )
+    reader = pa_csv.open_csv(
+        str(path),
+        read_options=pa_csv.ReadOptions(block_size=READ_BLOCK_SIZE, use_threads=False),
+        convert_options=pa_csv.ConvertOptions(
+            include_columns=SOURCE_COLUMNS,
+            column_types=column_types,
+        ),
+    )
+    return reader.read_all().to_pandas()
+
+
+def build_registry(df: pd.DataFrame) -> pd.DataFrame:
+    """Transforms the parsed source into the registry data frame.
+
+    All string transformations are done on the categories rather than
+    row by row.
+
+    :param df: data frame as returned by ``read_source``
+    :type df: pd.DataFrame
+    :return: deduplicated registry, sorted by ``SORT_COLUMNS``
+    :rtype: pd.DataFrame
+    """
+    df["SERHEITI"] = map_categories(
+        df["SERHEITI"], lambda cats: cats.str.replace(r"^\s*$", "", regex=True)
+    )
+    df["POSTNR"] = map_categories(df["POSTNR"].fillna(0).astype(int), lambda cats: cats)
+
+    logger.info("Adding municipality")
+    df["municipality"] = map_categories(
+        df["POSTNR"],
+        lambda cats: cats.map(lambda p: POSTCODE_MUNICIPALITY_LOOKUP.get(p, "")),
+    )
+    df["POSTNR"] = map_categories(df["POSTNR"], lambda cats: cats.astype(str))
+
+    logger.debug("Casting house_nr to uppercase")
+    df["HUSMERKING"] = map_categories(df["HUSMERKING"], lambda cats: cats.str.upper())
+
+    logger.debug("Parsing native coordinates")
+    x, y = parse_points(df[NATIVE_POINT_COLUMN])
+    df = df.assign(**dict(zip(NATIVE_COORDINATE_COLUMNS, (x, y))))
+
+    logger.debug("Adding grid cell keys")
+    lat, lon = (df[c].values for c in COORDINATE_COLUMNS)
+    df = df.assign(**cell_columns(lon, lat, x, y))
+
+    keep = (
+        INT_CATEGORY_COLUMNS
+        + STR_CATEGORY_COLUMNS
+        + COORDINATE_COLUMNS
+        + NATIVE_COORDINATE_COLUMNS
+        + CELL_COLS
+        + ["FID"]
+    )
+    logger.debug("Discarding all columns except for %s", ", ".join(keep))
+    df = df[keep]
+
+    for c in INT_CATEGORY_COLUMNS:
+        logger.debug("Casting %s to int", c)
+        df[c] = df[c].astype(pd.Int32Dtype())
+
+    for c in STR_CATEGORY_COLUMNS:
+        logger.debug("Casting %s to str", c)
+        df[c] = categories_to_str(df[c])
+
+    logger.debug("Renaming columns: %s", RENAME_MAP)
+    df = df.rename(columns=RENAME_MAP)
+
+    # filter out duplicated
+    df = df.drop_duplicates(subset=INDEX_COLUMNS, keep="first")
+    return df.sort_values(SORT_COLUMNS, kind="mergesort").reset_index(drop=True)
+
+
+def build_region_postcodes(regions: pd.DataFrame, df: pd.DataFrame) -> pd.Series:
+    """Assigns every postcode in the registry to a region.
+
+    Rows get the region of their town, rows of towns missing from the regions
+    table get the most common region of their municipality code. A postcode
+    is assigned to the most common region of its rows.
+
+    :param regions: regions data frame
+    :type regions: pd.DataFrame
+    :param df: registry data frame
+    :type df: pd.DataFrame
+    :return: region indexed by postcode
+    :rtype: pd.Series
+    """
+    town_regions = dict(zip(regions["name"], regions["region"]))
+    town_regions.update(TOWN_REGION_OVERRIDES)
+    region = df["municipality"].map(town_regions)
+    code_regions = region.groupby(df["municipality_code"]).agg(
+        lambda s: s.mode().iloc[0] if s.notna().any() else None
+    )
+    region = region.fillna(df["municipality_code"].map(code_regions))
+    return region.groupby(df["postcode"]).agg(lambda s: s.mode().iloc[0])
+
+
+def build_divisions(
+    regions: pd.DataFrame, df: pd.DataFrame
+) -> Dict[str, Dict[str, List[str]]]:
+    """Builds the region => municipalities, region => postcodes and
+    municipality => administrative division names lookups.
+
+    :param regions: regions data frame
+    :type regions: pd.DataFrame
+    :param df: registry data frame
+    :type df: pd.DataFrame
+    :return: dict with keys "regions", "region_postcodes" and
+             "administrative_divisions"
+    :rtype: Dict[str, Dict[str, List[str]]]
+    """
+    region_map = {
+        k: list(v)
+        for (k, v) in regions.groupby("region")["municipality"].unique().items()
+    }
+    postcode_regions = build_region_postcodes(regions, df)
+    region_postcodes = {
+        k: sorted(v.index) for (k, v) in postcode_regions.groupby(postcode_regions)
+    }
+    divisions = {
+        k: list(v)
+        for (k, v) in regions.groupby("municipality")["name"].unique().items()
+        # drop municipalities which only consist of a single, equally named town
+        if not (len(v) == 1 and k == v[0])
+    }
+    divisions.update(ADMINISTRATIVE_DIVISION_OVERRIDES)
+    return {
+        "regions": region_map,
+        "region_postcodes": region_postcodes,
+        "administrative_divisions": divisions,
+    }
+
+
+def write_table(df: pd.DataFrame, path: pathlib.Path) -> None:
+    """Writes a derived lookup table, see ``write_registry``.
+
+    :param df: lookup table
+    :type df: pd.DataFrame
+    :param path: output file
+    :type path: pathlib.Path
+    """
+    pq.write_table(
+        pa.Table.from_pandas(df, preserve_index=False),
+        str(path),
+        compression="zstd",
+        use_dictionary=True,
+    )
+
+
+def write_lookup_tables(df: pd.DataFrame, output_path: pathlib.Path) -> None:
+    """Writes the lookup tables derived from the registry next to it, so
+    ``Lookup`` can load them instead of deriving them on construction.
+
+    :param df: registry data frame
+    :type df: pd.DataFrame
+    :param output_path: output folder
+    :type output_path: pathlib.Path
+    """
+    logger.info("Writing lookup tables")
+    write_table(build_street_postcodes(df), output_path / "street_postcodes.parquet")
+    write_table(build_street_dative(df), output_path / "street_dative.parquet")
+    write_table(build_centroids(df), output_path / "centroids.parquet")
+    write_table(build_special_names(df), output_path / "special_names.parquet")
+    write_table(build_service_areas(df), output_path / "service_areas.parquet")
+    divisions = build_divisions(pd.read_parquet(REGIONS_PATH), df)
+    with open(output_path / "divisions.json", "w", encoding="utf-8") as f:
+        json.dump(divisions, f, ensure_ascii=False, indent=1, sort_keys=True)
+
+
+def write_registry(df: pd.DataFrame, path: pathlib.Path) -> None:
+    """Writes the registry as dictionary encoded, zstd compressed row groups.
+
+    :param df: registry data frame
+    :type df: pd.DataFrame
+    :param path: output file
+    :type path: pathlib.Path
+    """
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    pq.write_table(
+        table,
+        str(path),
+        row_group_size=ROW_GROUP_SIZE,
+        compression="zstd",
+        use_dictionary=True,
+    )
+
+
+def write_sqlite_registry(df: pd.DataFrame, output_path: pathlib.Path) -> None:
+    """Exports the registry and its lookup tables to an indexed SQLite file,
+    "registry.sqlite", queried with ``SqliteLookup``. Versioned by the
+    registry file written by ``write_registry``.
+
+    :param df: registry data frame
+    :type df: pd.DataFrame
+    :param output_path: output folder
+    :type output_path: pathlib.Path
+    """
+    logger.info("Writing SQLite registry")
+    write_sqlite(
+        output_path / "registry.sqlite",
+        df,
+        build_street_postcodes(df),
+        build_street_dative(df),
+        build_centroids(df),
+        build_special_names(df),
+        build_service_areas(df),
+        file_digest(output_path / "df.parquet.gzip"),
+    )
+
+
 def main():
     warnings.filterwarnings("ignore", message=".*initial implementation of Parquet.*")
     default_output_path = pathlib.Path.cwd() / "stadfangaskra/data"
@@ -40,6 +363,17 @@ def main():
         help=f"Output path, default: {default_output_path}",
         default=default_output_path,
     )
+    parser.add_argument(
+        "--source",
+        nargs="?",
+        help="Local source csv file, downloaded if omitted",
+        default=None,
+    )
+    parser.add_argument(
+        "--sqlite",
+        help="Also export the registry to registry.sqlite, for SqliteLookup",
+        action="store_true",
+    )
     parser.add_argument("--verbose", "-v", help="verbose logging", action="store_true")
 
     args = parser.parse_args()
@@ -52,48 +386,27 @@ def main():
         logger.info("Output file folder does not exist: %s", output_path)
         sys.exit(1)
     logger.info("Starting")
+    started = time.perf_counter()
 
-    db_path = pathlib.Path.cwd() / "source.csv"
-    download(db_path)
+    if args.source:
+        db_path = pathlib.Path(args.source)
+    else:
+        db_path = pathlib.Path.cwd() / "source.csv"
+        download(db_path)
     logger.info("Parsing source file")
-    df: pd.DataFrame = pd.read_csv(db_path)
+    df = build_registry(read_source(db_path))
+    write_registry(df, output_path / "df.parquet.gzip")
+    write_lookup_tables(df, output_path)
+    if args.sqlite:
+        write_sqlite_registry(df, output_path)
 
-    df["SERHEITI"] = df["SERHEITI"].replace(r"^\s*$", np.nan, regex=True)
-    df["POSTNR"] = df["POSTNR"].fillna(0).astype(int)
-
-    for c in INT_CATEGORY_COLUMNS:
-        logger.debug("Casting %s to int category", c)
-        df[c] = pd.Categorical(df[c].astype(pd.Int32Dtype()))
-
-    logger.info("Adding municipality")
-    df["municipality"] = df.POSTNR.apply(
-        lambda p: POSTCODE_MUNICIPALITY_LOOKUP.get(p, np.nan)
+    logger.info(
+        "Rebuilt registry of %d addresses in %.2fs, peak memory %.1f MiB",
+        len(df),
+        time.perf_counter() - started,
+        peak_memory_mib(),
     )
 
-    for c in STR_CATEGORY_COLUMNS:
-        logger.debug("Casting %s to str category", c)
-        df[c] = df[c].fillna("").astype(str)
-
-    keep = INT_CATEGORY_COLUMNS
-    keep.extend(STR_CATEGORY_COLUMNS)
-    keep.extend(["N_HNIT_WGS84", "E_HNIT_WGS84", "FID"])
-    logger.debug("Discarding all columns except for %s", ", ".join(keep))
-    df = df[keep]
-    logger.debug("Renaming columns: %s", RENAME_MAP)
-    df = df.rename(columns=RENAME_MAP)
-    logger.debug("Casting house_nr to uppercase")
-    df["house_nr"] = df["house_nr"].str.upper()
-    idx = pd.MultiIndex.from_frame(
-        df[["municipality", "postcode", "street_nominative", "house_nr"]]
-    )
-
-    df = df.set_index(idx).sort_index()
-
-    # filter out duplicated
-    df = df.loc[~df.index.duplicated(keep="first")]
-
-    df.to_parquet(output_path / "df.parquet.gzip")
-
 
 if __name__ == "__main__":
     main()
@@ -1,4 +1,39 @@
-from typing import Dict
+import pathlib
+from typing import Dict, List
+
+# Rows per parquet row group, small enough for row-group pruning on
+# postcode to be effective while keeping the file compact.
+ROW_GROUP_SIZE = 8192
+
+# Bytes of the source csv parsed per block
+READ_BLOCK_SIZE = 1 << 20
+
+INDEX_COLUMNS = ["municipality", "postcode", "street_nominative", "house_nr"]
+
+# The registry is written sorted by postcode, so row groups can be skipped
+# when loading a subset of postcodes, municipalities or regions.
+SORT_COLUMNS = ["postcode", "street_nominative", "house_nr"]
+
+REGIONS_PATH = (
+    pathlib.Path(__file__).parent.parent / "stadfangaskra" / "data" / "regions.parquet"
+)
+
+# Administrative divisions whose names can't be derived from the regions table
+ADMINISTRATIVE_DIVISION_OVERRIDES: Dict[str, List[str]] = {
+    "Seltjarnarnesbær": ["Seltjarnarnes"],
+    "Ísafjarðarbær": ["Ísafjörður"],
+    "Garðabær": ["Garðabær", "Garðabær (Álftanes)"],
+}
+
+# Regions of towns which are named differently in the regions table
+TOWN_REGION_OVERRIDES: Dict[str, str] = {
+    "Egilsstöðir": "Austurland",
+    "Höfn í Hornafirði": "Austurland",
+    "Öræfum": "Austurland",
+    "Flatey á Breiðafirði": "Vestfirðir",
+    "Reykhólahreppur": "Vestfirðir",
+    "Árneshreppur": "Vestfirðir",
+}
 
 INT_CATEGORY_COLUMNS = [
     "SVFNR",
@@ -13,6 +48,26 @@ STR_CATEGORY_COLUMNS = [
     "POSTNR",
 ]
 
+COORDINATE_COLUMNS = ["N_HNIT_WGS84", "E_HNIT_WGS84"]
+
+# WKT point in ISN93 (EPSG:3057), the native coordinates of the registry
+NATIVE_POINT_COLUMN = "HNIT"
+NATIVE_COORDINATE_COLUMNS = ["x", "y"]
+
+# Columns read from the source file, everything else is skipped by the parser
+SOURCE_COLUMNS = [
+    "SVFNR",
+    "HEITI_NF",
+    "HEITI_TGF",
+    "HUSMERKING",
+    "SERHEITI",
+    "POSTNR",
+    "N_HNIT_WGS84",
+    "E_HNIT_WGS84",
+    "HNIT",
+    "FID",
+]
+
 RENAME_MAP = {
     "FID": "fid",
     "HEITI_NF": "street_nominative",
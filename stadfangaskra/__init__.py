@@ -1,23 +1,40 @@
+import functools
 import logging
-from typing import List
+from typing import Any, Optional
 
 import pandas as pd
 
-from .static import df, regions
+from . import static
+from .base import BaseLookup
+from .cache import ResultCache
+from .cells import CELL_COLS
+from .keys import MATCH_STATUSES
+from .parser import is_structured
+from .static import regions
 from .tree import Lookup
 
-__all__ = ["df", "Lookup", "regions"]
+__all__ = ["Lookup", "ResultCache", "regions"]
 
-lookup = Lookup()
 logger = logging.getLogger("stadfangaskra")
 
+# "full" adds the address columns, "validate" only the match status and fid
+HYDRATE_MODES = ["full", "validate"]
 
-def _is_structured(cols: List[str]) -> bool:
-    return (
-        "postcode" in cols
-        and ("street" in cols or "street_nominative" in cols)
-        and "house_nr" in cols
-    )
+
+@functools.lru_cache(maxsize=None)
+def get_lookup() -> Lookup:
+    """Returns the default lookup over the whole registry, built on first use."""
+    return Lookup()
+
+
+def __getattr__(name: str):
+    # ``df`` and ``lookup`` are loaded lazily so importing the package is cheap
+    # and processes using a filtered ``Lookup`` never load the whole registry.
+    if name == "df":
+        return static.df
+    if name == "lookup":
+        return get_lookup()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 @pd.api.extensions.register_dataframe_accessor("stadfangaskra")
@@ -29,63 +46,147 @@ class SDAccessor:  # pylint: disable=too-few-public-methods
     @staticmethod
     def _validate(obj):
         cols = obj.columns
-        if not _is_structured(cols) and "address" not in cols:
+        if not is_structured(cols) and "address" not in cols:
             raise AttributeError("Must have 'address' data.")
 
-    def __query_structured(self) -> pd.DataFrame:
+    def __query_structured(
+        self,
+        lookup: BaseLookup,
+        region: Optional[str],
+        fallback: bool,
+        cache: Optional[ResultCache],
+        crs: Optional[Any],
+        house_nr_fallback: Optional[str],
+        cells: bool,
+    ) -> pd.DataFrame:
         qf: pd.DataFrame = self._obj
         should_reset_index = bool(qf.index.name)
         if should_reset_index:
             qf = qf.reset_index()
-        res = lookup.query_dataframe(qf)
+        res = lookup.query_dataframe(
+            qf,
+            region=region,
+            fallback=fallback,
+            cache=cache,
+            crs=crs,
+            house_nr_fallback=house_nr_fallback,
+        )
         if should_reset_index:
             res = res.set_index(self._obj.index.name)
         else:
             res = res.reset_index(drop=True)
         res = res.drop("fid", axis=1)
+        if not cells:
+            res = res.drop([c for c in CELL_COLS if c in res.columns], axis=1)
         return res
 
-    def hydrate(self, query_column: str = "address") -> pd.DataFrame:
+    def __validate(
+        self, lookup: BaseLookup, query_column: str, region: Optional[str]
+    ) -> pd.DataFrame:
+        qf: pd.DataFrame = self._obj
+        if is_structured(qf.columns):
+            data = qf
+        elif query_column in qf.columns:
+            data = qf[query_column].values
+        else:
+            raise AttributeError(f"query column {query_column} missing")
 
+        status, fid = lookup.validate(data, region=region)
+        res = qf.assign(
+            status=pd.Categorical.from_codes(status, categories=MATCH_STATUSES),
+            fid=fid,
+        )
+        if qf.index.name:
+            return res.loc[~res.index.duplicated(keep="first")]
+        return res.reset_index(drop=True)
+
+    def hydrate(
+        self,
+        query_column: str = "address",
+        region: Optional[str] = None,
+        lookup: Optional[BaseLookup] = None,
+        fallback: bool = False,
+        cache: Optional[ResultCache] = None,
+        mode: str = "full",
+        crs: Optional[Any] = None,
+        house_nr_fallback: Optional[str] = None,
+        cells: bool = False,
+    ) -> pd.DataFrame:
+
+        if mode not in HYDRATE_MODES:
+            raise ValueError(f"Unknown mode: {mode}")
+        if lookup is None:
+            lookup = get_lookup()
         qf: pd.DataFrame = self._obj
         original_index = self._obj.index.name
-        is_structured = _is_structured(qf.columns)
-        if is_structured:
-            return self.__query_structured()
+        if mode == "validate":
+            return self.__validate(lookup, query_column, region)
+        if is_structured(qf.columns):
+            return self.__query_structured(
+                lookup, region, fallback, cache, crs, house_nr_fallback, cells
+            )
 
         cols = list(qf.columns)
         if query_column not in cols:
             raise AttributeError(f"query column {query_column} missing")
 
-        addrs = qf[query_column].values
-
-        res = lookup.query(addrs)
+        res = lookup.query(
+            qf[query_column].values,
+            region=region,
+            fallback=fallback,
+            cache=cache,
+            crs=crs,
+            house_nr_fallback=house_nr_fallback,
+        )
         logger.debug("len after lookup: %d", len(res))
 
-        qf.reset_index(inplace=True)
-        qf["query"] = qf[query_column]
-        qf = qf.set_index("query")
-        res.set_index("query", inplace=True)
-
-        res = qf.join(res).sort_values("order")
-        logger.debug("len after joining on query: %d", len(res))
-
-        cols.extend(
-            [
+        # results are in the order of the queries, one row for each
+        address_cols = [
+            c
+            for c in [
                 "municipality",
                 "postcode",
                 "street_nominative",
                 "street_dative",
                 "house_nr",
                 "geometry",
+                "precision",
+                "house_nr_match",
             ]
-        )
+            if c in res.columns
+        ]
+        if cells:
+            # precomputed on the registry rows, taken along with the address
+            address_cols += [c for c in CELL_COLS if c in res.columns]
+        res = qf.assign(**{c: res[c].values for c in address_cols})
 
         if original_index:
-            res.set_index(original_index, inplace=True)
             res = res.loc[~res.index.duplicated(keep="first")]
             logger.debug("len after removing duplicated indices: %d", len(res))
         else:
-            res.reset_index(inplace=True)
+            res = res.reset_index(drop=True)
+
+        return res[cols + address_cols]
+
+
+@pd.api.extensions.register_series_accessor("stadfangaskra")
+class SDSeriesAccessor:  # pylint: disable=too-few-public-methods
+    def __init__(self, pandas_obj):
+        self._obj = pandas_obj
 
-        return res[cols]
+    def query_text_bodies(
+        self, region: Optional[str] = None, lookup: Optional[Lookup] = None
+    ) -> pd.DataFrame:
+        """Finds addresses in a series of documents, see
+        ``Lookup.query_text_bodies``.
+
+        :param region: limit partial matches to addresses in this region
+        :type region: Optional[str]
+        :param lookup: lookup to query, defaults to the whole registry
+        :type lookup: Optional[Lookup]
+        :return: one row per match, keyed by "document" index label and "match"
+        :rtype: pd.DataFrame
+        """
+        if lookup is None:
+            lookup = get_lookup()
+        return lookup.query_text_bodies(self._obj, region=region)
@@ -0,0 +1,116 @@
+import numpy as np
+import pandas as pd
+import shapely
+
+from .spatial import _expand_ranges
+
+# columns of the service area table built by ``preprocess``
+AREA_COLS = ["municipality", "postcode", "municipality_code"]
+
+
+class ServiceAreaIndex:
+    """
+    Grid index over the postcode and municipality service areas built by
+    ``preprocess``, polygons in WGS84 which don't overlap.
+
+    How it works:
+    - The bounds of the areas are divided into cells of ``cell_size``
+      degrees. A cell covered by a single area is labeled with it, a cell on
+      the edge of an area keeps a list of the areas it overlaps.
+    - Points are assigned to cells arithmetically, only points in edge cells
+      are tested against the polygons of their candidate areas.
+    """
+
+    table: pd.DataFrame
+    areas: np.ndarray
+    cell_size: float
+    x0: float
+    y0: float
+    ncols: int
+    nrows: int
+    labels: np.ndarray
+    starts: np.ndarray
+    stops: np.ndarray
+    candidates: np.ndarray
+
+    def __init__(
+        self, table: pd.DataFrame, cell_size: float = 0.01
+    ) -> "ServiceAreaIndex":
+        """
+        :param table: service area table with columns ``AREA_COLS`` and the
+                      WKB polygons in "geometry"
+        :type table: pd.DataFrame
+        :param cell_size: cell size in degrees, defaults to 0.01
+        :type cell_size: float
+        """
+        self.table = (
+            table[AREA_COLS]
+            .astype(
+                {"municipality": str, "postcode": str, "municipality_code": "Int32"}
+            )
+            .reset_index(drop=True)
+        )
+        self.areas = shapely.from_wkb(table["geometry"].values)
+        shapely.prepare(self.areas)
+        self.cell_size = cell_size
+        if len(self.areas):
+            self.x0, self.y0, maxx, maxy = shapely.total_bounds(self.areas)
+        else:
+            self.x0 = self.y0 = maxx = maxy = 0.0
+        self.ncols = int((maxx - self.x0) // cell_size) + 1
+        self.nrows = int((maxy - self.y0) // cell_size) + 1
+
+        ncells = self.ncols * self.nrows
+        cy, cx = np.divmod(np.arange(ncells), self.ncols)
+        minx = self.x0 + cx * cell_size
+        miny = self.y0 + cy * cell_size
+        boxes = shapely.box(minx, miny, minx + cell_size, miny + cell_size)
+        cell, area = shapely.STRtree(self.areas).query(boxes)
+        # vectorized predicates use the prepared areas, unlike a tree query
+        overlaps = shapely.intersects(self.areas[area], boxes[cell])
+        cell, area = cell[overlaps], area[overlaps]
+        covered = shapely.covers(self.areas[area], boxes[cell])
+
+        self.labels = np.full(ncells, -1, dtype=np.int64)
+        self.labels[cell[covered]] = area[covered]
+        edge = ~np.isin(cell, cell[covered])
+        cell, area = cell[edge], area[edge]
+        # -2 marks edge cells, their candidates are area[starts:stops]
+        self.labels[cell] = -2
+        self.starts = np.searchsorted(cell, np.arange(ncells), side="left")
+        self.stops = np.searchsorted(cell, np.arange(ncells), side="right")
+        self.candidates = area
+
+    def __len__(self) -> int:
+        return len(self.areas)
+
+    def locate(self, lon: np.ndarray, lat: np.ndarray) -> np.ndarray:
+        """Finds the service area of each point.
+
+        :param lon: point longitudes
+        :type lon: np.ndarray
+        :param lat: point latitudes
+        :type lat: np.ndarray
+        :return: position of the area of each point in ``table``, -1 if the
+                 point isn't in any area
+        :rtype: np.ndarray
+        """
+        lon = np.atleast_1d(np.asarray(lon, dtype=np.float64))
+        lat = np.atleast_1d(np.asarray(lat, dtype=np.float64))
+        with np.errstate(invalid="ignore"):
+            cx = np.floor((lon - self.x0) / self.cell_size)
+            cy = np.floor((lat - self.y0) / self.cell_size)
+            inside = (cx >= 0) & (cx < self.ncols) & (cy >= 0) & (cy < self.nrows)
+        keys = np.where(inside, cy * self.ncols + cx, 0).astype(np.int64)
+        out = np.where(inside, self.labels[keys], -1)
+
+        edge = np.flatnonzero(out == -2)
+        owner, positions = _expand_ranges(
+            self.starts[keys[edge]], self.stops[keys[edge]]
+        )
+        area = self.candidates[positions]
+        point = edge[owner]
+        hit = shapely.contains_xy(self.areas[area], lon[point], lat[point])
+        out[edge] = -1
+        out[point[hit]] = area[hit]
+        return out
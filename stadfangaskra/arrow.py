@@ -0,0 +1,256 @@
+import hashlib
+import json
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import geopandas
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.ipc as ipc
+
+GEOMETRY_FORMATS = ["coordinates", "wkb"]
+
+# schema metadata key and version of ``Lookup.save`` snapshots
+SNAPSHOT_KEY = "stadfangaskra"
+SNAPSHOT_VERSION = 1
+
+# registry columns which are stored dictionary encoded
+DICTIONARY_COLS = [
+    "municipality",
+    "postcode",
+    "special_name",
+    "house_nr",
+    "street_dative",
+    "street_nominative",
+]
+
+
+def registry_table(df: pd.DataFrame, geometry_format: str) -> pa.Table:
+    """Converts the registry to an Arrow table.
+
+    String columns are dictionary encoded, the geometry is stored either as
+    float "lon"/"lat" columns or as a WKB "geometry" column.
+
+    :param df: registry data frame
+    :type df: pd.DataFrame
+    :param geometry_format: "coordinates" or "wkb"
+    :type geometry_format: str
+    :return: registry table, rows in the same order as ``df``
+    :rtype: pa.Table
+    """
+    arrays = []
+    names = []
+    for c in df.columns:
+        if c == "geometry":
+            continue
+        s = df[c]
+        if c in DICTIONARY_COLS:
+            arr = pa.array(pd.Categorical(s))
+        elif c == "municipality_code":
+            arr = pa.array(s.astype(pd.Int32Dtype()))
+        else:
+            arr = pa.array(s)
+        arrays.append(arr)
+        names.append(c)
+
+    if "geometry" in df.columns:
+        geometry = geopandas.GeoSeries(df["geometry"])
+        if geometry_format == "wkb":
+            arrays.append(pa.array(geometry.to_wkb().values, type=pa.binary()))
+            names.append("geometry")
+        else:
+            arrays.extend([pa.array(geometry.x.values), pa.array(geometry.y.values)])
+            names.extend(["lon", "lat"])
+    return pa.Table.from_arrays(arrays, names=names)
+
+
+def encode_text(data: Union[pa.Array, pa.ChunkedArray]) -> Tuple[List[str], np.ndarray]:
+    """Dictionary encodes free text queries.
+
+    :param data: string array
+    :type data: Union[pa.Array, pa.ChunkedArray]
+    :return: unique values and the index of each row's value, -1 for nulls
+    :rtype: Tuple[List[str], np.ndarray]
+    """
+    if isinstance(data, pa.ChunkedArray):
+        data = data.combine_chunks()
+    encoded = pc.dictionary_encode(data.cast(pa.string()))
+    indices = pc.fill_null(encoded.indices, -1).to_numpy()
+    return encoded.dictionary.to_pylist(), indices
+
+
+def encode_structured(
+    table: pa.Table, columns: List[str]
+) -> Tuple[pa.Table, np.ndarray]:
+    """Dictionary encodes structured queries on the values of ``columns``.
+
+    :param table: query table
+    :type table: pa.Table
+    :param columns: columns making up the query
+    :type columns: List[str]
+    :return: table of unique queries and the index of each row's query,
+             -1 if any of the values is null
+    :rtype: Tuple[pa.Table, np.ndarray]
+    """
+    keys = pc.binary_join_element_wise(
+        *[table[c].cast(pa.string()) for c in columns], "\x1f"
+    )
+    if isinstance(keys, pa.ChunkedArray):
+        keys = keys.combine_chunks()
+    encoded = pc.dictionary_encode(keys)
+    indices = pc.fill_null(encoded.indices, -1).to_numpy()
+    # the first row of every unique query
+    _, first = np.unique(indices, return_index=True)
+    first = pa.array(first[indices[first] >= 0])
+    unique = pa.Table.from_arrays(
+        [table[c].take(first).cast(pa.string()) for c in columns], names=columns
+    )
+    return unique, indices
+
+
+def structured_columns(columns: List[str]) -> List[str]:
+    """Columns making up a structured query, in the order of the index.
+
+    :param columns: columns of a structured query table
+    :type columns: List[str]
+    :return: [municipality, postcode, street/street_nominative, house_nr],
+             the ones in ``columns``
+    :rtype: List[str]
+    """
+    street = "street_nominative" if "street_nominative" in columns else "street"
+    return [c for c in ["municipality", "postcode", street, "house_nr"] if c in columns]
+
+
+def take_matches(
+    registry: pa.Table, query: pa.Table, found: np.ndarray, indices: np.ndarray
+) -> pa.Table:
+    """Joins the query columns with the registry rows their queries matched.
+
+    :param registry: registry table
+    :type registry: pa.Table
+    :param query: query columns, the registry columns in it are replaced
+    :type query: pa.Table
+    :param found: registry position of each unique query, -1 if not found
+    :type found: np.ndarray
+    :param indices: unique query of each row, -1 for nulls
+    :type indices: np.ndarray
+    :return: the query columns followed by the registry columns, null where
+             no address was found
+    :rtype: pa.Table
+    """
+    query = query.drop([c for c in query.column_names if c in registry.column_names])
+    # index -1 (null queries) maps to the appended -1
+    positions = np.append(found, -1)[indices]
+    matched = registry.take(pa.array(positions, mask=positions < 0))
+    return pa.Table.from_arrays(
+        query.columns + matched.columns,
+        names=query.column_names + matched.column_names,
+    )
+
+
+def decode_dictionaries(table: pa.Table) -> pa.Table:
+    """Decodes dictionary encoded columns back to plain values.
+
+    :param table: table
+    :type table: pa.Table
+    :return: table without dictionary columns
+    :rtype: pa.Table
+    """
+    schema = pa.schema(
+        [
+            f.with_type(f.type.value_type) if pa.types.is_dictionary(f.type) else f
+            for f in table.schema
+        ],
+        metadata=table.schema.metadata,
+    )
+    return table.cast(schema)
+
+
+def table_digest(table: pa.Table) -> str:
+    """SHA-256 digest of the schema and data of a table.
+
+    :param table: table
+    :type table: pa.Table
+    :return: hex digest
+    :rtype: str
+    """
+    h = hashlib.sha256(table.schema.serialize().to_pybytes())
+    for column in table.columns:
+        for chunk in column.chunks:
+            arrays = [chunk]
+            if pa.types.is_dictionary(chunk.type):
+                # the dictionary isn't one of the buffers of the indices
+                arrays.append(chunk.dictionary)
+            for arr in arrays:
+                for buf in arr.buffers():
+                    if buf is not None:
+                        h.update(buf)
+    return h.hexdigest()
+
+
+def write_ipc(
+    table: pa.Table,
+    sink: Union[str, pa.NativeFile],
+    compression: Optional[str] = "zstd",
+) -> None:
+    """Writes a table in the Arrow IPC file format.
+
+    :param table: table
+    :type table: pa.Table
+    :param sink: path or file to write to
+    :type sink: Union[str, pa.NativeFile]
+    :param compression: "zstd", "lz4" or None, defaults to "zstd"
+    :type compression: Optional[str]
+    """
+    options = ipc.IpcWriteOptions(compression=compression)
+    with ipc.new_file(sink, table.schema, options=options) as writer:
+        writer.write_table(table)
+
+
+def read_ipc(source: Union[str, bytes]) -> pa.Table:
+    """Reads a table in the Arrow IPC file format, memory mapping files.
+
+    :param source: path or bytes
+    :type source: Union[str, bytes]
+    :return: table
+    :rtype: pa.Table
+    """
+    if isinstance(source, bytes):
+        return ipc.open_file(pa.py_buffer(source)).read_all()
+    with pa.memory_map(str(source)) as f:
+        return ipc.open_file(f).read_all()
+
+
+def with_snapshot_state(table: pa.Table, state: Dict[str, Any]) -> pa.Table:
+    """Stores the state of a ``Lookup`` snapshot in the schema metadata.
+
+    :param table: registry table
+    :type table: pa.Table
+    :param state: JSON serializable state, its "version" is set
+    :type state: Dict[str, Any]
+    :return: snapshot table
+    :rtype: pa.Table
+    """
+    state = dict(state, version=SNAPSHOT_VERSION)
+    return table.replace_schema_metadata(
+        {SNAPSHOT_KEY: json.dumps(state, ensure_ascii=False)}
+    )
+
+
+def snapshot_state(table: pa.Table) -> Dict[str, Any]:
+    """Reads the state of a ``Lookup`` snapshot from the schema metadata.
+
+    :param table: snapshot table
+    :type table: pa.Table
+    :raises ValueError: if the table isn't a snapshot of a supported version
+    :return: state
+    :rtype: Dict[str, Any]
+    """
+    metadata = table.schema.metadata or {}
+    if SNAPSHOT_KEY.encode() not in metadata:
+        raise ValueError("Not a Lookup snapshot")
+    state = json.loads(metadata[SNAPSHOT_KEY.encode()])
+    if state["version"] != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported snapshot version: {state['version']}")
+    return state
@@ -0,0 +1,834 @@
+import functools
+from abc import ABC, abstractmethod
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import (
+    IO,
+    Any,
+    Callable,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+import geopandas
+import numpy as np
+import pandas as pd
+
+from .areas import ServiceAreaIndex
+from .cache import ResultCache
+from .cells import CELL_COLS, cell_columns
+from .centroids import PRECISIONS, CentroidIndex
+from .housenr import (
+    HOUSE_NR_FALLBACKS,
+    HOUSE_NR_MATCHES,
+    HouseNumberIndex,
+    parse_house_nrs,
+    parse_house_range,
+)
+from .matches import MATCH_COLS, Match, iter_matches, iter_stream_matches
+from .parser import QueryParser
+from .spatial import epsg_code
+from .static import CRS, NATIVE_CRS
+
+STRING_COLS = [
+    "municipality",
+    "postcode",
+    "special_name",
+    "house_nr",
+    "street_dative",
+    "street_nominative",
+]
+
+
+def _cache_prefix(kind: str, region: Optional[str], fallback: bool) -> str:
+    # the options a result depends on, prepended to the normalized query
+    return f"{kind}\x1f{region or ''}\x1f{int(fallback)}\x1f"
+
+
+def _add_query_columns(out: pd.DataFrame, q: pd.DataFrame) -> pd.DataFrame:
+    # the query columns are added to the result and missing strings filled
+    for c in q.columns:
+        out[c] = q[c].values
+    string_cols = [c for c in STRING_COLS if c in out.columns]
+    out[string_cols] = out[string_cols].fillna(value="")
+    return out
+
+
+class BaseLookup(QueryParser, ABC):
+    """
+    Query pipeline of lookups, independent of how the registry is stored.
+
+    Subclasses store the registry and implement the abstract methods, they
+    resolve address tuples to registry positions, ``_match_index``, build the
+    rows of positions, ``_take``, and load the centroids, service areas and
+    house numbers, e.g. ``centroid_index``.
+    """
+
+    registry_version: str
+    version: str
+
+    @abstractmethod
+    def _match_index(
+        self, index: pd.MultiIndex, region: Optional[str]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Matches address tuples exactly, and partially when they're
+        incomplete.
+
+        :param index: [municipality, postcode, street_nominative, house_nr] of
+                      each query
+        :type index: pd.MultiIndex
+        :param region: limit partial matches to addresses in this region
+        :type region: Optional[str]
+        :return: registry position of each query, -1 if not found, and its
+                 status, an index into ``MATCH_STATUSES``
+        :rtype: Tuple[np.ndarray, np.ndarray]
+        """
+
+    @abstractmethod
+    def _take(self, positions: np.ndarray, native: bool = False) -> pd.DataFrame:
+        """Selects registry rows by position, -1 gives a row of missing values.
+
+        :param positions: registry positions
+        :type positions: np.ndarray
+        :param native: take the geometry in ISN93, built from the native
+                       "x"/"y" coordinates
+        :type native: bool
+        :return: registry rows
+        :rtype: pd.DataFrame
+        """
+
+    @abstractmethod
+    def _has_column(self, name: str) -> bool:
+        """Whether the registry was loaded with a column."""
+
+    @abstractmethod
+    def _take_column(self, name: str, positions: np.ndarray) -> np.ndarray:
+        """Values of a registry column at positions, which must all be found."""
+
+    @property
+    @abstractmethod
+    def centroid_index(self) -> CentroidIndex:
+        """Street, postcode and municipality centroids.
+
+        :return: centroid index
+        :rtype: CentroidIndex
+        """
+
+    @property
+    @abstractmethod
+    def service_area_index(self) -> ServiceAreaIndex:
+        """Postcode and municipality service areas.
+
+        :return: service area index
+        :rtype: ServiceAreaIndex
+        """
+
+    @abstractmethod
+    def _street_house_nrs(
+        self, streets: np.ndarray
+    ) -> Tuple[HouseNumberIndex, Optional[np.ndarray]]:
+        """Sorted house numbers of streets, in every postcode they're in.
+
+        :param streets: nominative street names
+        :type streets: np.ndarray
+        :return: house number index over at least the addresses of
+                 ``streets``, and the registry position of each of its
+                 positions, None if they're registry positions
+        :rtype: Tuple[HouseNumberIndex, Optional[np.ndarray]]
+        """
+
+    def _query_vector_dataframe(
+        self,
+        q: pd.DataFrame,
+        region: Optional[str] = None,
+        fallback: bool = False,
+        crs: Optional[Any] = None,
+        house_nr_fallback: Optional[str] = None,
+    ) -> pd.DataFrame:
+        """Given a data frame with index:
+          [municipality, postcode, street_nominative, house_nr]
+        and columns "qidx" (query index) and "order", matches exact and
+        partial matches to the address dataframe.
+
+        :param q: query dataframe
+        :type q: pd.DataFrame
+        :param region: limit partial matches to addresses in this region
+        :type region: Optional[str]
+        :param fallback: locate unmatched queries at the centroid of their
+                         street, postcode or municipality
+        :type fallback: bool
+        :param crs: crs of the result geometry, defaults to the registry's
+        :type crs: Optional[Any]
+        :param house_nr_fallback: approximate house numbers which aren't in
+                                  the registry, "nearest" or "interpolate"
+        :type house_nr_fallback: Optional[str]
+        :return: query dataframe with additional address columns
+        :rtype: pd.DataFrame
+        """
+        positions, centroids = self._resolve(q.index, region, fallback)
+        house_nrs = None
+        if house_nr_fallback is not None:
+            positions, *house_nrs = self._approximate_house_nrs(
+                positions, house_nr_fallback, lambda rows: q.index[rows]
+            )
+        return self._result(q, positions, centroids, crs, house_nrs)
+
+    def _approximate_house_nrs(
+        self,
+        positions: np.ndarray,
+        mode: str,
+        parse: Callable[[np.ndarray], pd.MultiIndex],
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Approximates the house numbers of unmatched queries from the
+        addresses on the same side of their street.
+
+        :param positions: registry position of each query, -1 if not found
+        :type positions: np.ndarray
+        :param mode: "nearest" or "interpolate", see
+                     ``HouseNumberIndex.approximate``
+        :type mode: str
+        :param parse: [municipality, postcode, street_nominative, house_nr] of
+                      the given rows, only unmatched queries are parsed
+        :type parse: Callable[[np.ndarray], pd.MultiIndex]
+        :raises ValueError: if the mode is unknown
+        :return: registry position of each query, including the nearest
+                 addresses, how its house number was found, an index into
+                 ``HOUSE_NR_MATCHES``, and the [lon, lat, x, y] of
+                 interpolated queries
+        :rtype: Tuple[np.ndarray, np.ndarray, np.ndarray]
+        """
+        if mode not in HOUSE_NR_FALLBACKS:
+            raise ValueError(f"Unknown house number fallback: {mode}")
+        positions = positions.copy()
+        codes = np.where(positions >= 0, 0, -1).astype(np.int8)
+        points = np.full((len(positions), 4), np.nan)
+        missing = np.flatnonzero(positions < 0)
+        index = parse(missing)
+        levels = [np.asarray(index.get_level_values(i), dtype=object) for i in range(4)]
+        given = (levels[2] != "") & (levels[3] != "")
+        missing = missing[given]
+        if len(missing):
+            _, postcode, street, house_nr = (v[given] for v in levels)
+            index, rows = self._street_house_nrs(street)
+            pos, code, pts = index.approximate(postcode, street, house_nr, mode)
+            if rows is not None:
+                pos = np.where(pos >= 0, rows[np.maximum(pos, 0)], -1)
+            positions[missing] = pos
+            codes[missing] = code
+            points[missing] = pts
+        return positions, codes, points
+
+    def _resolve(
+        self, index: pd.MultiIndex, region: Optional[str], fallback: bool
+    ) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """Resolves address tuples to registry rows, and to centroids when
+        falling back.
+
+        :param index: [municipality, postcode, street_nominative, house_nr] of
+                      each query
+        :type index: pd.MultiIndex
+        :param region: limit partial matches to addresses in this region
+        :type region: Optional[str]
+        :param fallback: locate unmatched queries at a centroid
+        :type fallback: bool
+        :return: registry position of each query and, when falling back,
+                 position in the centroid index, -1 if not found
+        :rtype: Tuple[np.ndarray, Optional[np.ndarray]]
+        """
+        positions, _ = self._match_index(index, region)
+        if not fallback:
+            return positions, None
+        centroids = np.full(len(positions), -1, dtype=np.int64)
+        missing = np.flatnonzero(positions < 0)
+        if len(missing):
+            centroids[missing], _ = self.centroid_index.locate(
+                *[index.get_level_values(i).values[missing] for i in range(3)]
+            )
+        return positions, centroids
+
+    def _result(
+        self,
+        q: pd.DataFrame,
+        positions: np.ndarray,
+        centroids: Optional[np.ndarray],
+        crs: Optional[Any] = None,
+        house_nrs: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+    ) -> pd.DataFrame:
+        """Builds the query result from resolved positions.
+
+        :param q: query dataframe
+        :type q: pd.DataFrame
+        :param positions: registry position of each query, -1 if not found
+        :type positions: np.ndarray
+        :param centroids: centroid position of each query, adds a "precision"
+                          column unless None
+        :type centroids: Optional[np.ndarray]
+        :param crs: crs of the result geometry, defaults to the registry's
+        :type crs: Optional[Any]
+        :param house_nrs: how the house number of each query was found and the
+                          interpolated points, adds a "house_nr_match" column
+                          unless None
+        :type house_nrs: Optional[Tuple[np.ndarray, np.ndarray]]
+        :return: query dataframe with additional address columns
+        :rtype: pd.DataFrame
+        """
+        # ISN93 is taken from the native coordinates, anything else is transformed
+        native = epsg_code(crs) == NATIVE_CRS and self._has_column("x")
+        out = self._take(positions, native=native)
+        if centroids is not None:
+            out = self._fill_centroids(out, positions, centroids, native=native)
+        if house_nrs is not None:
+            out = self._fill_house_nrs(out, *house_nrs, native=native)
+        if crs is not None and not native and "geometry" in out.columns:
+            if epsg_code(crs) != CRS:
+                out = out.to_crs(crs)
+        return _add_query_columns(out, q)
+
+    def _fill_centroids(
+        self,
+        out: pd.DataFrame,
+        positions: np.ndarray,
+        centroids: np.ndarray,
+        native: bool = False,
+    ) -> pd.DataFrame:
+        """Adds the "precision" of each result and locates unmatched queries
+        at their centroid.
+
+        :param out: query result
+        :type out: pd.DataFrame
+        :param positions: registry position of each query, -1 if not found
+        :type positions: np.ndarray
+        :param centroids: centroid position of each query, -1 if not found
+        :type centroids: np.ndarray
+        :param native: the result geometry is in ISN93
+        :type native: bool
+        :return: query result with a "precision" column
+        :rtype: pd.DataFrame
+        """
+        index = self.centroid_index
+        x, y = (index.x, index.y) if native else (index.lon, index.lat)
+        codes = np.where(positions >= 0, 0, -1).astype(np.int8)
+        hit = np.flatnonzero((positions < 0) & (centroids >= 0))
+        if len(hit):
+            codes[hit] = index.level[centroids[hit]]
+            if "geometry" in out.columns:
+                geometry = out["geometry"].values.copy()
+                geometry[hit] = geopandas.points_from_xy(
+                    x[centroids[hit]], y[centroids[hit]]
+                )
+                out["geometry"] = geometry
+        out["precision"] = pd.Categorical.from_codes(
+            codes, categories=PRECISIONS, ordered=True
+        )
+        return out
+
+    def _fill_house_nrs(
+        self,
+        out: pd.DataFrame,
+        codes: np.ndarray,
+        points: np.ndarray,
+        native: bool = False,
+    ) -> pd.DataFrame:
+        """Adds the "house_nr_match" of each result and places interpolated
+        house numbers between their neighbours.
+
+        :param out: query result
+        :type out: pd.DataFrame
+        :param codes: how the house number of each query was found, an index
+                      into ``HOUSE_NR_MATCHES``, -1 if it wasn't
+        :type codes: np.ndarray
+        :param points: [lon, lat, x, y] of each interpolated query
+        :type points: np.ndarray
+        :param native: the result geometry is in ISN93
+        :type native: bool
+        :return: query result with a "house_nr_match" column
+        :rtype: pd.DataFrame
+        """
+        hit = np.flatnonzero(codes == HOUSE_NR_MATCHES.index("interpolated"))
+        if len(hit):
+            if "geometry" in out.columns:
+                x, y = (2, 3) if native else (0, 1)
+                geometry = out["geometry"].values.copy()
+                geometry[hit] = geopandas.points_from_xy(points[hit, x], points[hit, y])
+                out["geometry"] = geometry
+            # the other columns are those of the nearest address
+            for j, c in [(2, "x"), (3, "y")]:
+                if c in out.columns:
+                    values = out[c].values.copy()
+                    values[hit] = points[hit, j]
+                    out[c] = values
+            if any(c in out.columns for c in CELL_COLS):
+                cells = cell_columns(*points[hit].T)
+                for c in CELL_COLS:
+                    if c in out.columns:
+                        values = out[c].array.copy()
+                        values[hit] = cells[c]
+                        out[c] = values
+        out["house_nr_match"] = pd.Categorical.from_codes(
+            codes, categories=HOUSE_NR_MATCHES
+        )
+        return out
+
+    def _query_cached(
+        self,
+        keys: List[str],
+        resolve: Callable[[np.ndarray], Tuple[np.ndarray, Optional[np.ndarray]]],
+        cache: ResultCache,
+        fallback: bool,
+    ) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """Resolves queries through a result cache, only misses are resolved.
+
+        :param keys: normalized query of each row
+        :type keys: List[str]
+        :param resolve: resolves the queries of the given rows
+        :type resolve: Callable[[np.ndarray], Tuple[np.ndarray, Optional[np.ndarray]]]
+        :param cache: result cache
+        :type cache: ResultCache
+        :param fallback: return centroid positions
+        :type fallback: bool
+        :return: registry position and, when falling back, centroid position
+                 of each row
+        :rtype: Tuple[np.ndarray, Optional[np.ndarray]]
+        """
+        codes, uniques = pd.factorize(np.asarray(keys, dtype=object))
+        uniques = list(uniques)
+        found, positions, centroids = cache.get(
+            self.registry_version, self.version, uniques
+        )
+        miss = np.flatnonzero(~found)
+        if len(miss):
+            # the first row of each missing query
+            first = np.empty(len(uniques), dtype=np.int64)
+            first[codes[::-1]] = np.arange(len(codes) - 1, -1, -1)
+            pos, cen = resolve(first[miss])
+            positions[miss] = pos
+            if cen is not None:
+                centroids[miss] = cen
+            cache.put(
+                self.registry_version,
+                self.version,
+                [uniques[i] for i in miss],
+                positions[miss],
+                centroids[miss],
+            )
+        return positions[codes], centroids[codes] if fallback else None
+
+    def query_dataframe(
+        self,
+        q: pd.DataFrame,
+        region: Optional[str] = None,
+        fallback: bool = False,
+        cache: Optional[ResultCache] = None,
+        crs: Optional[Any] = None,
+        house_nr_fallback: Optional[str] = None,
+    ) -> pd.DataFrame:
+        """Queries a data frame containing structued data,
+        columns [postcode, house_nr, street/street_nominative] are
+        required, [municipality] is optional. ``q`` is not modified.
+
+        :param q: query dataframe
+        :type q: pd.DataFrame
+        :param region: limit partial matches to addresses in this region
+        :type region: Optional[str]
+        :param fallback: locate unmatched queries at the centroid of their
+                         street, postcode or municipality and add a
+                         "precision" column, defaults to False
+        :type fallback: bool
+        :param cache: cache to look results up in and store them to
+        :type cache: Optional[ResultCache]
+        :param crs: crs of the result geometry, defaults to the registry's
+                    WGS84. 3057 returns the native ISN93 coordinates without
+                    a transform.
+        :type crs: Optional[Any]
+        :param house_nr_fallback: approximate house numbers which aren't in
+                                  the registry from the addresses on the same
+                                  side of the street, "nearest" takes the
+                                  closest number and "interpolate" places the
+                                  query between its neighbours. Adds a
+                                  "house_nr_match" column.
+        :type house_nr_fallback: Optional[str]
+        :return: query dataframe with additional address columns
+        :rtype: pd.DataFrame
+        """
+        q = self._structured_frame(q)
+        if cache is None:
+            return self._query_vector_dataframe(
+                q,
+                region=region,
+                fallback=fallback,
+                crs=crs,
+                house_nr_fallback=house_nr_fallback,
+            )
+
+        prefix = _cache_prefix("structured", region, fallback)
+        positions, centroids = self._query_cached(
+            [prefix + "\x1f".join(t) for t in q.index],
+            lambda rows: self._resolve(q.index[rows], region, fallback),
+            cache,
+            fallback,
+        )
+        house_nrs = None
+        if house_nr_fallback is not None:
+            positions, *house_nrs = self._approximate_house_nrs(
+                positions, house_nr_fallback, lambda rows: q.index[rows]
+            )
+        return self._result(q, positions, centroids, crs, house_nrs)
+
+    def query(
+        self,
+        text: Union[str, List[str], np.ndarray],
+        region: Optional[str] = None,
+        fallback: bool = False,
+        cache: Optional[ResultCache] = None,
+        crs: Optional[Any] = None,
+        house_nr_fallback: Optional[str] = None,
+    ) -> geopandas.GeoDataFrame:
+        """Given text input, returns a dataframe with matching addresses
+
+        :param text: string containing a single address or an iterator
+                     containing multiple addresses.
+        :type text: Union[str, List[str], np.ndarray]
+        :param region: limit partial matches to addresses in this region, e.g.
+                       "Höfuðborgarsvæðið". Exact matches are returned regardless.
+        :type region: Optional[str]
+        :param fallback: locate unmatched queries at the centroid of their
+                         street, postcode or municipality and add a
+                         "precision" column, defaults to False
+        :type fallback: bool
+        :param cache: cache to look results up in and store them to, cached
+                      queries aren't parsed
+        :type cache: Optional[ResultCache]
+        :param crs: crs of the result geometry, defaults to the registry's
+                    WGS84. 3057 returns the native ISN93 coordinates without
+                    a transform.
+        :type crs: Optional[Any]
+        :param house_nr_fallback: approximate house numbers which aren't in
+                                  the registry from the addresses on the same
+                                  side of the street, "nearest" takes the
+                                  closest number and "interpolate" places the
+                                  query between its neighbours. Adds a
+                                  "house_nr_match" column.
+        :type house_nr_fallback: Optional[str]
+        :return: Data frame containg addresses
+        :rtype: geopandas.GeoDataFrame
+        """
+        if cache is None:
+            return self._query_vector_dataframe(
+                self._text_frame(text, keep_house_nr=house_nr_fallback is not None),
+                region=region,
+                fallback=fallback,
+                crs=crs,
+                house_nr_fallback=house_nr_fallback,
+            )
+
+        q = self._text_frame(text, parse=False)
+        texts = q["query"].values
+        prefix = _cache_prefix("text", region, fallback)
+        positions, centroids = self._query_cached(
+            [prefix + t for t in texts],
+            lambda rows: self._resolve(
+                self._text_frame(texts[rows]).index, region, fallback
+            ),
+            cache,
+            fallback,
+        )
+        house_nrs = None
+        if house_nr_fallback is not None:
+            positions, *house_nrs = self._approximate_house_nrs(
+                positions,
+                house_nr_fallback,
+                lambda rows: self._text_frame(texts[rows], keep_house_nr=True).index,
+            )
+        return self._result(q, positions, centroids, crs, house_nrs)
+
+    def validate(
+        self,
+        data: Union[str, List[str], np.ndarray, pd.DataFrame],
+        region: Optional[str] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Checks whether addresses exist and returns their ``fid``, without
+        building a result frame.
+
+        :param data: address strings, or a data frame of structured data
+        :type data: Union[str, List[str], np.ndarray, pd.DataFrame]
+        :param region: limit partial matches to addresses in this region
+        :type region: Optional[str]
+        :raises ValueError: if the registry was loaded without "fid"
+        :return: status of each query, an index into ``MATCH_STATUSES``, and
+                 the fid of the matched address, None if there is no match
+        :rtype: Tuple[np.ndarray, np.ndarray]
+        """
+        if not self._has_column("fid"):
+            raise ValueError("The registry was loaded without the fid column")
+        if isinstance(data, pd.DataFrame):
+            index = self._structured_frame(data).index
+        else:
+            index = self._text_frame(data).index
+        positions, status = self._match_index(index, region)
+
+        fid = np.full(len(positions), None, dtype=object)
+        matched = positions >= 0
+        fid[matched] = self._take_column("fid", positions[matched])
+        return status, fid
+
+    def match_tuples(
+        self, index: pd.MultiIndex, region: Optional[str] = None, native: bool = False
+    ) -> Tuple[pd.DataFrame, np.ndarray]:
+        """Matches parsed address tuples, as a shard of a ``ShardedLookup``.
+
+        :param index: [municipality, postcode, street_nominative, house_nr] of
+                      each query
+        :type index: pd.MultiIndex
+        :param region: limit partial matches to addresses in this region
+        :type region: Optional[str]
+        :param native: take the geometry in ISN93, built from the native
+                       "x"/"y" coordinates
+        :type native: bool
+        :return: registry row of each query, missing values if not found, and
+                 its status, an index into ``MATCH_STATUSES``
+        :rtype: Tuple[pd.DataFrame, np.ndarray]
+        """
+        positions, status = self._match_index(index, region)
+        return self._take(positions, native=native and self._has_column("x")), status
+
+    def locate(
+        self,
+        lon: Union[List[float], np.ndarray],
+        lat: Union[List[float], np.ndarray],
+    ) -> pd.DataFrame:
+        """Assigns points to the postcode and municipality whose service area
+        they're in, without searching for the nearest address.
+
+        :param lon: longitude of each point
+        :type lon: Union[List[float], np.ndarray]
+        :param lat: latitude of each point
+        :type lat: Union[List[float], np.ndarray]
+        :return: [municipality, postcode, municipality_code] of each point,
+                 empty strings and a missing code outside every area
+        :rtype: pd.DataFrame
+        """
+        index = self.service_area_index
+        positions = index.locate(lon, lat)
+        out = pd.DataFrame(
+            {
+                c: pd.api.extensions.take(a.array, positions, allow_fill=True)
+                for c, a in index.table.items()
+            }
+        )
+        out[["municipality", "postcode"]] = out[["municipality", "postcode"]].fillna(
+            value=""
+        )
+        return out
+
+    def query_house_range(self, query: str) -> pd.DataFrame:
+        """Returns the addresses in a range of house numbers on a street,
+        e.g. "Laugavegur 10-30, 101 Reykjavík".
+
+        :param query: address string with a range or a single house number
+        :type query: str
+        :return: addresses on both sides of the street, ordered by house number
+        :rtype: pd.DataFrame
+        """
+        return self.query_house_ranges([query]).drop("qidx", axis=1)
+
+    def query_house_ranges(self, queries: Union[List[str], np.ndarray]) -> pd.DataFrame:
+        """Returns the addresses in a range of house numbers for each of many
+        queries. A street without a postcode is only found if it's in a
+        single postcode.
+
+        :param queries: address strings with a range or a single house number
+        :type queries: Union[List[str], np.ndarray]
+        :return: addresses with a "qidx" (query index) column, ordered by
+                 query and house number
+        :rtype: pd.DataFrame
+        """
+        postcode, street, lo, hi = [], [], [], []
+        for text in queries:
+            text = text or ""
+            _, p, s, h = self.text_to_vec(text)
+            bounds = next(
+                filter(None, (parse_house_range(w) for w in text.split(" "))), None
+            )
+            if bounds is None:
+                number = parse_house_nrs([h])[0][0]
+                bounds = (number, number) if s and number >= 0 else (0, -1)
+            postcode.append(p)
+            street.append(s)
+            lo.append(bounds[0])
+            hi.append(bounds[1])
+        index, rows = self._street_house_nrs(np.array(street, dtype=object))
+        qidx, positions = index.within_range(postcode, street, lo, hi)
+        if rows is not None:
+            positions = rows[positions]
+        out = self._take(positions)
+        out["qidx"] = qidx
+        return out
+
+    def query_many(
+        self,
+        data: Union[List[str], np.ndarray, pd.DataFrame],
+        executor: Optional[Executor] = None,
+        chunk_size: int = 10000,
+        region: Optional[str] = None,
+        fallback: bool = False,
+        crs: Optional[Any] = None,
+        house_nr_fallback: Optional[str] = None,
+    ) -> pd.DataFrame:
+        """Queries address strings or structured data in chunks on an executor.
+
+        The input is parsed once, matching is then split into chunks of
+        ``chunk_size`` queries which are run with ``executor.map``. The result
+        is the same as from ``query``/``query_dataframe``.
+
+        :param data: address strings, or a data frame of structured data
+        :type data: Union[List[str], np.ndarray, pd.DataFrame]
+        :param executor: executor to run the chunks on, defaults to a
+                         ``ThreadPoolExecutor`` created for the call
+        :type executor: Optional[Executor]
+        :param chunk_size: number of queries in each chunk, defaults to 10000
+        :type chunk_size: int
+        :param region: limit partial matches to addresses in this region
+        :type region: Optional[str]
+        :param fallback: locate unmatched queries at the centroid of their
+                         street, postcode or municipality
+        :type fallback: bool
+        :param crs: crs of the result geometry, defaults to the registry's
+        :type crs: Optional[Any]
+        :param house_nr_fallback: approximate house numbers which aren't in
+                                  the registry, "nearest" or "interpolate"
+        :type house_nr_fallback: Optional[str]
+        :return: Data frame containg addresses
+        :rtype: pd.DataFrame
+        """
+        if isinstance(data, pd.DataFrame):
+            q = self._structured_frame(data)
+        else:
+            q = self._text_frame(data)
+
+        chunks = [q.iloc[i : i + chunk_size] for i in range(0, len(q), chunk_size)]
+        func = functools.partial(
+            self._query_vector_dataframe,
+            region=region,
+            fallback=fallback,
+            crs=crs,
+            house_nr_fallback=house_nr_fallback,
+        )
+        if executor is None:
+            with ThreadPoolExecutor() as pool:
+                results = list(pool.map(func, chunks or [q]))
+        else:
+            results = list(executor.map(func, chunks or [q]))
+        return pd.concat(results, ignore_index=True)
+
+    def query_text_body(
+        self, text: Union[str, IO, Iterable[Union[str, bytes]]]
+    ) -> pd.DataFrame:
+        """Queries a body of text.
+
+        This is a special case API for parsing multiple addresses from
+        a block of text. See ``iter_text_body`` for text which does not fit
+        in memory.
+
+        :param text: block of text, a file object or an iterator of chunks
+        :type text: Union[str, IO, Iterable[Union[str, bytes]]]
+        :return: Data frame containg addresses
+        :rtype: pd.DataFrame
+        """
+        results = list(self.iter_text_body(text))
+        if not results:
+            return self.query_dataframe(pd.DataFrame([], columns=MATCH_COLS))
+        return pd.concat(results, ignore_index=True)
+
+    def query_text_bodies(
+        self, texts: Union[Sequence[str], pd.Series], region: Optional[str] = None
+    ) -> pd.DataFrame:
+        """Queries many bodies of text at once.
+
+        Matches are extracted from every document and resolved in a single
+        lookup. The result has one row per match, with the "document" it was
+        found in, the index label for a series and the position otherwise, and
+        its ordinal within the document in "match". Documents which are not
+        strings have no matches.
+
+        :param texts: documents
+        :type texts: Union[Sequence[str], pd.Series]
+        :param region: limit partial matches to addresses in this region
+        :type region: Optional[str]
+        :return: Data frame containg addresses
+        :rtype: pd.DataFrame
+        """
+        if isinstance(texts, pd.Series):
+            documents = texts.index
+            texts = texts.values
+        else:
+            documents = pd.RangeIndex(len(texts))
+
+        # columns are built directly, converting many dataclasses is slow
+        columns = {c: [] for c in MATCH_COLS}
+        positions = []
+        ordinals = []
+        for i, text in enumerate(texts):
+            if not isinstance(text, str):
+                continue
+            for j, m in enumerate(iter_matches(text, self.landmarks)):
+                for c in MATCH_COLS:
+                    columns[c].append(getattr(m, c))
+                positions.append(i)
+                ordinals.append(j)
+
+        res = self.query_dataframe(pd.DataFrame(columns), region=region)
+        res.insert(0, "document", documents.take(positions).values)
+        res.insert(1, "match", np.array(ordinals, dtype=np.int64))
+        return res
+
+    def iter_text_body(
+        self,
+        source: Union[str, IO, Iterable[Union[str, bytes]]],
+        batch_size: int = 10000,
+        region: Optional[str] = None,
+        chunk_size: int = 1 << 20,
+        encoding: str = "utf-8",
+    ) -> Iterator[pd.DataFrame]:
+        """Queries a stream of text, yielding the addresses found in batches.
+
+        The text is read ``chunk_size`` at a time and matched every
+        ``batch_size`` address candidates, so memory use does not grow with
+        the size of the text. Addresses spanning chunks are found as if the
+        text was read in one piece. The "order" column counts candidates from
+        the start of the text, "qidx" is local to each batch.
+
+        :param source: text, a file object opened in text or binary mode, or
+                       an iterator of str or bytes chunks
+        :type source: Union[str, IO, Iterable[Union[str, bytes]]]
+        :param batch_size: number of candidates in each batch, defaults to 10000
+        :type batch_size: int
+        :param region: limit partial matches to addresses in this region
+        :type region: Optional[str]
+        :param chunk_size: characters or bytes to read from a file at a time
+        :type chunk_size: int
+        :param encoding: encoding of bytes, defaults to "utf-8"
+        :type encoding: str
+        :return: data frames containg addresses, one per batch
+        :rtype: Iterator[pd.DataFrame]
+        """
+        batch = []
+        offset = 0
+        for m in iter_stream_matches(source, chunk_size, encoding, self.landmarks):
+            batch.append(m)
+            if len(batch) >= batch_size:
+                yield self._query_batch(batch, offset, region)
+                offset += len(batch)
+                batch = []
+        if batch:
+            yield self._query_batch(batch, offset, region)
+
+    def _query_batch(
+        self, batch: List[Match], offset: int, region: Optional[str]
+    ) -> pd.DataFrame:
+        res = self.query_dataframe(pd.DataFrame(batch), region=region)
+        res["order"] += offset
+        return res
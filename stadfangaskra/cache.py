@@ -0,0 +1,151 @@
+import sqlite3
+import threading
+from typing import List, Set, Tuple
+
+import numpy as np
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    registry TEXT NOT NULL,
+    lookup TEXT NOT NULL,
+    key TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    centroid INTEGER NOT NULL,
+    PRIMARY KEY (lookup, key)
+) WITHOUT ROWID
+"""
+
+
+class ResultCache:
+    """
+    Persistent cache of query results in a SQLite file.
+
+    How it works:
+    - A query is resolved to a registry row and, when falling back, a
+      centroid. Only these positions are stored, keyed by the version of the
+      lookup and the normalized query.
+    - Keys are looked up in bulk, they're written to a temporary table which
+      is joined with the results in a single statement.
+    - Entries of other registry versions are deleted the first time a new
+      registry version is used, so a registry release invalidates the cache.
+
+    A cache can be shared between threads.
+    """
+
+    path: str
+    _conn: sqlite3.Connection
+    _lock: threading.Lock
+    _registries: Set[str]
+
+    def __init__(self, path: str) -> "ResultCache":
+        """
+        :param path: SQLite file, created if it doesn't exist
+        :type path: str
+        """
+        self.path = str(path)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._registries = set()
+        with self._lock, self._conn:
+            self._conn.execute(_SCHEMA)
+            self._conn.execute(
+                "CREATE TEMP TABLE query_keys (i INTEGER PRIMARY KEY, key TEXT)"
+            )
+
+    def _invalidate(self, registry: str) -> None:
+        # called with the lock held, once per registry version
+        if registry not in self._registries:
+            self._conn.execute("DELETE FROM results WHERE registry != ?", (registry,))
+            self._registries.add(registry)
+
+    def get(
+        self, registry: str, lookup: str, keys: List[str]
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Looks up query results.
+
+        :param registry: registry version of the lookup
+        :type registry: str
+        :param lookup: version of the lookup
+        :type lookup: str
+        :param keys: normalized queries
+        :type keys: List[str]
+        :return: whether each key was found, its registry position and its
+                 centroid position
+        :rtype: Tuple[np.ndarray, np.ndarray, np.ndarray]
+        """
+        found = np.zeros(len(keys), dtype=bool)
+        positions = np.full(len(keys), -1, dtype=np.int64)
+        centroids = np.full(len(keys), -1, dtype=np.int64)
+        if not keys:
+            return found, positions, centroids
+        with self._lock, self._conn:
+            self._invalidate(registry)
+            self._conn.execute("DELETE FROM query_keys")
+            self._conn.executemany(
+                "INSERT INTO query_keys VALUES (?, ?)", enumerate(keys)
+            )
+            rows = self._conn.execute(
+                "SELECT q.i, r.position, r.centroid FROM query_keys q "
+                "JOIN results r ON r.lookup = ? AND r.key = q.key",
+                (lookup,),
+            ).fetchall()
+        if rows:
+            idx, pos, cen = np.array(rows, dtype=np.int64).T
+            found[idx] = True
+            positions[idx] = pos
+            centroids[idx] = cen
+        return found, positions, centroids
+
+    def put(
+        self,
+        registry: str,
+        lookup: str,
+        keys: List[str],
+        positions: np.ndarray,
+        centroids: np.ndarray,
+    ) -> None:
+        """Stores query results.
+
+        :param registry: registry version of the lookup
+        :type registry: str
+        :param lookup: version of the lookup
+        :type lookup: str
+        :param keys: normalized queries
+        :type keys: List[str]
+        :param positions: registry position of each query, -1 if not found
+        :type positions: np.ndarray
+        :param centroids: centroid position of each query, -1 if not found
+        :type centroids: np.ndarray
+        """
+        rows = zip(
+            [registry] * len(keys),
+            [lookup] * len(keys),
+            keys,
+            np.asarray(positions).tolist(),
+            np.asarray(centroids).tolist(),
+        )
+        with self._lock, self._conn:
+            self._invalidate(registry)
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)", rows
+            )
+
+    def clear(self) -> None:
+        """Deletes all entries."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM results")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def close(self) -> None:
+        """Closes the database connection."""
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self) -> "ResultCache":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
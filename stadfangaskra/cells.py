@@ -0,0 +1,94 @@
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+# zoom levels of the Web Mercator quadkeys stored on the registry
+QUADKEY_ZOOMS = [12, 15, 18]
+
+# sizes in meters of the square ISN93 grid cells stored on the registry
+GRID_SIZES = [100, 1000]
+
+# grid cell key columns of the registry, built by ``preprocess``
+CELL_COLS = [f"quadkey_{z}" for z in QUADKEY_ZOOMS] + [f"grid_{s}m" for s in GRID_SIZES]
+
+# latitudes beyond this aren't covered by Web Mercator tiles
+_MAX_LATITUDE = 85.05112878
+
+
+def quadkeys(
+    lon: np.ndarray, lat: np.ndarray, zoom: int
+) -> pd.api.extensions.ExtensionArray:
+    """Web Mercator quadkeys of points as integers, the base 4 number of the
+    quadkey's digits. Keys are only comparable within a zoom level.
+
+    :param lon: longitude of each point
+    :type lon: np.ndarray
+    :param lat: latitude of each point
+    :type lat: np.ndarray
+    :param zoom: zoom level, at most 31
+    :type zoom: int
+    :return: quadkey of each point, missing for points without coordinates
+    :rtype: pd.api.extensions.ExtensionArray
+    """
+    lon = np.asarray(lon, dtype=np.float64)
+    lat = np.radians(
+        np.clip(np.asarray(lat, dtype=np.float64), -_MAX_LATITUDE, _MAX_LATITUDE)
+    )
+    n = 1 << zoom
+    valid = np.isfinite(lon) & np.isfinite(lat)
+    with np.errstate(invalid="ignore"):
+        tx = np.floor((lon + 180) / 360 * n)
+        ty = np.floor((1 - np.arcsinh(np.tan(lat)) / np.pi) / 2 * n)
+    tx = np.clip(np.where(valid, tx, 0), 0, n - 1).astype(np.int64)
+    ty = np.clip(np.where(valid, ty, 0), 0, n - 1).astype(np.int64)
+    # each digit is a y bit followed by an x bit
+    keys = np.zeros(len(lon), dtype=np.int64)
+    for i in range(zoom):
+        keys |= ((tx >> i) & 1) << (2 * i)
+        keys |= ((ty >> i) & 1) << (2 * i + 1)
+    return pd.arrays.IntegerArray(keys, ~valid)
+
+
+def grid_cells(
+    x: np.ndarray, y: np.ndarray, size: int
+) -> pd.api.extensions.ExtensionArray:
+    """Keys of the square ISN93 grid cells of points. A key is the lower
+    left corner of the cell in meters, ``x * 10**7 + y``.
+
+    :param x: ISN93 x of each point
+    :type x: np.ndarray
+    :param y: ISN93 y of each point
+    :type y: np.ndarray
+    :param size: cell size in meters
+    :type size: int
+    :return: cell key of each point, missing for points without coordinates
+    :rtype: pd.api.extensions.ExtensionArray
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    valid = np.isfinite(x) & np.isfinite(y)
+    x0 = np.floor(np.where(valid, x, 0) / size).astype(np.int64) * size
+    y0 = np.floor(np.where(valid, y, 0) / size).astype(np.int64) * size
+    return pd.arrays.IntegerArray(x0 * 10**7 + y0, ~valid)
+
+
+def cell_columns(
+    lon: np.ndarray, lat: np.ndarray, x: np.ndarray, y: np.ndarray
+) -> Dict[str, pd.api.extensions.ExtensionArray]:
+    """Grid cell keys of points at every resolution in ``CELL_COLS``.
+
+    :param lon: longitude of each point
+    :type lon: np.ndarray
+    :param lat: latitude of each point
+    :type lat: np.ndarray
+    :param x: ISN93 x of each point
+    :type x: np.ndarray
+    :param y: ISN93 y of each point
+    :type y: np.ndarray
+    :return: cell keys by column name
+    :rtype: Dict[str, pd.api.extensions.ExtensionArray]
+    """
+    cells = {f"quadkey_{z}": quadkeys(lon, lat, z) for z in QUADKEY_ZOOMS}
+    cells.update({f"grid_{s}m": grid_cells(x, y, s) for s in GRID_SIZES})
+    return cells
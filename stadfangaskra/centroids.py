@@ -0,0 +1,77 @@
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# precision of a query result, from finest to coarsest
+PRECISIONS = ["address", "street", "postcode", "municipality"]
+
+KEY_COLS = ["municipality", "postcode", "street_nominative"]
+
+
+class CentroidIndex:
+    """
+    Hash index over the street, postcode and municipality centroids built by
+    ``preprocess``.
+
+    How it works:
+    - Every centroid is keyed by a (municipality, postcode, street) tuple with
+      the parts finer than its level left empty, a street without a postcode
+      is keyed by (municipality, "", street).
+    - A query is looked up at street, postcode and municipality level in turn
+      with one vectorized hash lookup per level, the finest match wins.
+    """
+
+    index: pd.MultiIndex
+    level: np.ndarray
+    lon: np.ndarray
+    lat: np.ndarray
+    bbox: np.ndarray
+    x: Optional[np.ndarray] = None
+    y: Optional[np.ndarray] = None
+
+    def __init__(self, table: pd.DataFrame) -> "CentroidIndex":
+        """
+        :param table: centroid table with columns [level, municipality,
+                      postcode, street_nominative, lon, lat, minx, miny,
+                      maxx, maxy] and optionally the ISN93 [x, y]
+        :type table: pd.DataFrame
+        """
+        self.index = pd.MultiIndex.from_frame(table[KEY_COLS].astype(str))
+        self.level = pd.Categorical(table["level"], categories=PRECISIONS).codes
+        self.lon = table["lon"].values.astype(np.float64)
+        self.lat = table["lat"].values.astype(np.float64)
+        self.bbox = table[["minx", "miny", "maxx", "maxy"]].values.astype(np.float64)
+        if "x" in table.columns:
+            self.x = table["x"].values.astype(np.float64)
+            self.y = table["y"].values.astype(np.float64)
+
+    def locate(
+        self, municipality: np.ndarray, postcode: np.ndarray, street: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Finds the finest centroid of each query.
+
+        :param municipality: municipality of each query, "" if unknown
+        :type municipality: np.ndarray
+        :param postcode: postcode of each query, "" if unknown
+        :type postcode: np.ndarray
+        :param street: nominative street name of each query, "" if unknown
+        :type street: np.ndarray
+        :return: position of the centroid of each query, -1 if there is none,
+                 and its precision code, an index into ``PRECISIONS``
+        :rtype: Tuple[np.ndarray, np.ndarray]
+        """
+        empty = np.full(len(municipality), "", dtype=object)
+        positions = np.full(len(municipality), -1, dtype=np.int64)
+        for key in [
+            (municipality, postcode, street),
+            (municipality, postcode, empty),
+            (municipality, empty, empty),
+        ]:
+            missing = positions < 0
+            if not missing.any():
+                break
+            idx = pd.MultiIndex.from_arrays([np.asarray(k)[missing] for k in key])
+            positions[missing] = self.index.get_indexer(idx)
+        level = np.where(positions >= 0, self.level[positions], -1)
+        return positions, level
@@ -0,0 +1,222 @@
+"""Lookup tables derived from a registry data frame.
+
+``preprocess`` writes them next to the registry, ``Lookup.from_dataframe``
+derives them from the data frame it's given.
+"""
+
+import geopandas
+import numpy as np
+import pandas as pd
+import shapely
+
+from .areas import AREA_COLS
+from .landmarks import LANDMARK_COLS
+from .spatial import epsg_code
+from .static import CRS, INDEX_COLS, NATIVE_CRS
+
+# Service areas reach at most this many meters from the nearest address, so
+# points out at sea or in the highlands aren't assigned to a postcode
+SERVICE_AREA_RADIUS = 10_000
+
+# Service area edges are split into segments of at most this many meters
+# before being transformed to WGS84, so they stay close to the ISN93 edges
+SERVICE_AREA_SEGMENT_LENGTH = 1_000
+
+
+def registry_source(df: pd.DataFrame) -> pd.DataFrame:
+    """Flat registry data frame of a custom registry, see
+    ``Lookup.from_dataframe``.
+
+    :param df: registry data frame with the index columns, as columns or as
+               its index, and "lon"/"lat" columns or a "geometry" column
+    :type df: pd.DataFrame
+    :raises ValueError: if an index column or the coordinates are missing
+    :return: registry with "lon"/"lat" and "x"/"y" columns, one row per address
+    :rtype: pd.DataFrame
+    """
+    indexed = [c for c in INDEX_COLS if c in df.index.names and c not in df.columns]
+    if indexed:
+        df = df.reset_index(level=indexed)
+    df = df.reset_index(drop=True)
+    missing = [c for c in INDEX_COLS if c not in df.columns]
+    if missing:
+        raise ValueError(f"Missing registry columns: {', '.join(missing)}")
+    if "lon" not in df.columns and "geometry" in df.columns:
+        geometry = geopandas.GeoSeries(df["geometry"])
+        if geometry.crs is not None and epsg_code(geometry.crs) != CRS:
+            geometry = geometry.to_crs(CRS)
+        df = df.drop("geometry", axis=1).assign(
+            lon=geometry.x.values, lat=geometry.y.values
+        )
+    if "lon" not in df.columns:
+        raise ValueError("Missing registry coordinates: lon/lat or geometry")
+    if "x" not in df.columns:
+        native = geopandas.GeoSeries(
+            geopandas.points_from_xy(df["lon"], df["lat"]), crs=CRS
+        ).to_crs(NATIVE_CRS)
+        df = df.assign(x=native.x.values, y=native.y.values)
+    df = df.astype({c: str for c in INDEX_COLS})
+    return df.drop_duplicates(subset=INDEX_COLS, keep="first").reset_index(drop=True)
+
+
+def build_street_postcodes(df: pd.DataFrame) -> pd.DataFrame:
+    """Builds a lookup table of
+
+    (municipality, street) => postcode
+
+    for both the nominative and dative street names. Non unique matches,
+    i.e. a street name spanning more than a single postcode are dropped.
+
+    :param df: registry data frame
+    :type df: pd.DataFrame
+    :return: data frame with columns [municipality, street, postcode]
+    :rtype: pd.DataFrame
+    """
+    columns = ["municipality", "street", "postcode"]
+    out = pd.concat(
+        [
+            df[["municipality", c, "postcode"]].set_axis(columns, axis=1)
+            for c in ["street_nominative", "street_dative"]
+        ]
+    ).drop_duplicates()
+    out = out[~out.duplicated(["municipality", "street"], keep=False)]
+    return out.sort_values(columns).reset_index(drop=True)
+
+
+def build_street_dative(df: pd.DataFrame) -> pd.DataFrame:
+    """Builds a lookup table of dative => nominative street names.
+
+    :param df: registry data frame
+    :type df: pd.DataFrame
+    :return: data frame with columns [street_dative, street_nominative]
+    :rtype: pd.DataFrame
+    """
+    return (
+        df.sort_values(INDEX_COLS, kind="mergesort")[
+            ["street_dative", "street_nominative"]
+        ]
+        .drop_duplicates("street_dative", keep="last")
+        .reset_index(drop=True)
+    )
+
+
+def build_special_names(df: pd.DataFrame) -> pd.DataFrame:
+    """Builds a lookup table of special names, landmarks and named buildings,
+    => address, for the addresses which have one. Names which are also street
+    names are left out, they're parsed as streets.
+
+    :param df: registry data frame
+    :type df: pd.DataFrame
+    :return: data frame with columns [special_name, municipality, postcode,
+             street_nominative, house_nr]
+    :rtype: pd.DataFrame
+    """
+    out = df.loc[:, LANDMARK_COLS].assign(special_name=df["special_name"].str.strip())
+    streets = pd.concat([df["street_nominative"], df["street_dative"]]).str.casefold()
+    out = out[
+        (out["special_name"] != "")
+        & ~out["special_name"].str.casefold().isin(set(streets))
+    ]
+    return out.sort_values(LANDMARK_COLS).reset_index(drop=True)
+
+
+def build_service_areas(df: pd.DataFrame) -> pd.DataFrame:
+    """Builds the service area of every postcode and municipality code pair,
+    used to locate points without searching for the nearest address.
+
+    Every address point gets its Voronoi cell in ISN93, clipped to
+    ``SERVICE_AREA_RADIUS`` around the point, and the cells are dissolved by
+    (postcode, municipality_code). The areas don't overlap.
+
+    :param df: registry data frame
+    :type df: pd.DataFrame
+    :return: data frame with columns [municipality, postcode,
+             municipality_code, geometry], geometry as WKB in WGS84
+    :rtype: pd.DataFrame
+    """
+    df = df[df["postcode"] != "0"].dropna(subset=["x", "y", "municipality_code"])
+    # addresses sharing a point share its cell
+    df = df.drop_duplicates(subset=["x", "y"]).reset_index(drop=True)
+    points = shapely.points(df["x"].values, df["y"].values)
+    envelope = shapely.envelope(shapely.multipoints(points))
+    cells = shapely.get_parts(
+        shapely.voronoi_polygons(
+            shapely.multipoints(points),
+            extend_to=shapely.buffer(envelope, SERVICE_AREA_RADIUS),
+        )
+    )
+    # the cells come out in no particular order, each contains its point
+    cell, point = shapely.STRtree(points).query(cells, predicate="contains")
+    owner = np.empty(len(cells), dtype=np.int64)
+    owner[cell] = point
+    cells = shapely.intersection(
+        cells, shapely.buffer(points[owner], SERVICE_AREA_RADIUS, quad_segs=4)
+    )
+
+    keys = df[AREA_COLS].iloc[owner].reset_index(drop=True)
+    out = (
+        keys.assign(geometry=cells)
+        .groupby(AREA_COLS, sort=True, observed=True)["geometry"]
+        .agg(lambda g: shapely.union_all(g.values))
+        .reset_index()
+    )
+    areas = geopandas.GeoSeries(
+        shapely.segmentize(out["geometry"].values, SERVICE_AREA_SEGMENT_LENGTH),
+        crs=NATIVE_CRS,
+    ).to_crs(CRS)
+    return out.assign(geometry=shapely.to_wkb(np.asarray(areas)))
+
+
+def build_centroids(df: pd.DataFrame) -> pd.DataFrame:
+    """Builds the centroid and bounding box of every street, postcode and
+    municipality, used when a query can only be resolved to one of them.
+
+    Streets are keyed by (municipality, postcode, street) and, for queries
+    without a postcode, by (municipality, "", street). Postcodes are keyed by
+    (municipality, postcode, "") and municipalities by (municipality, "", "").
+
+    :param df: registry data frame
+    :type df: pd.DataFrame
+    :return: data frame with columns [level, municipality, postcode,
+             street_nominative, lon, lat, minx, miny, maxx, maxy, x, y,
+             count], x and y in ISN93
+    :rtype: pd.DataFrame
+    """
+    keys = ["municipality", "postcode", "street_nominative"]
+    df = df[keys + ["lon", "lat", "x", "y"]].dropna(subset=["lon", "lat"])
+    has_street = df["street_nominative"] != ""
+    has_municipality = df["municipality"] != ""
+    levels = [
+        ("street", df[has_street]),
+        ("street", df[has_street & has_municipality].assign(postcode="")),
+        ("postcode", df[df["postcode"] != "0"].assign(street_nominative="")),
+        (
+            "municipality",
+            df[has_municipality].assign(postcode="", street_nominative=""),
+        ),
+    ]
+    out = pd.concat(
+        [
+            d.groupby(keys, sort=True)
+            .agg(
+                lon=("lon", "mean"),
+                lat=("lat", "mean"),
+                minx=("lon", "min"),
+                miny=("lat", "min"),
+                maxx=("lon", "max"),
+                maxy=("lat", "max"),
+                x=("x", "mean"),
+                y=("y", "mean"),
+                count=("lon", "size"),
+            )
+            .reset_index()
+            .assign(level=level)
+            for level, d in levels
+        ],
+        ignore_index=True,
+    )
+    # float32 is precise to within a meter, at half the size
+    coordinates = ["lon", "lat", "minx", "miny", "maxx", "maxy", "x", "y"]
+    out[coordinates] = out[coordinates].astype(np.float32)
+    out["count"] = out["count"].astype(np.int32)
+    return out[["level"] + [c for c in out.columns if c != "level"]]
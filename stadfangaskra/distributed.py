@@ -0,0 +1,191 @@
+"""Dask integration, requires the ``dask`` extra.
+
+Importing this module registers a ``stadfangaskra`` accessor on dask data
+frames, mirroring the pandas accessor.
+"""
+
+from typing import Any, Optional
+
+import dask
+import dask.dataframe as dd
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from .cells import CELL_COLS
+from .centroids import PRECISIONS
+from .static import INDEX_COLS, data_path, registry_frame
+from .tree import Lookup, is_structured
+
+# address columns added to text queries, see ``SDFAccessor.hydrate``
+ADDRESS_COLS = [
+    "municipality",
+    "postcode",
+    "street_nominative",
+    "street_dative",
+    "house_nr",
+    "geometry",
+]
+
+
+def _hydrate_partition(
+    df: pd.DataFrame,
+    lookup: Optional[Lookup],
+    query_column: str,
+    region: Optional[str],
+    fallback: bool,
+    crs: Optional[Any],
+    cells: bool,
+) -> pd.DataFrame:
+    # without a lookup the default one is used, built once per worker process
+    out = df.stadfangaskra.hydrate(
+        query_column=query_column,
+        region=region,
+        lookup=lookup,
+        fallback=fallback,
+        crs=crs,
+        cells=cells,
+    )
+    if not df.index.name:
+        # one row for each input row, keeping the index keeps the divisions valid
+        out.index = df.index
+    return out
+
+
+def _hydrate_meta(
+    df: pd.DataFrame,
+    lookup: Optional[Lookup],
+    fallback: bool,
+    crs: Optional[Any],
+    cells: bool,
+) -> pd.DataFrame:
+    """Empty frame with the columns and dtypes of a hydrated partition, built
+    without querying so the default lookup isn't loaded on the client.
+
+    :param df: empty partition
+    :type df: pd.DataFrame
+    :param lookup: lookup the partitions are hydrated with, None for the
+                   default one
+    :type lookup: Optional[Lookup]
+    :param fallback: a "precision" column is added
+    :type fallback: bool
+    :param crs: crs of the geometry
+    :type crs: Optional[Any]
+    :param cells: the grid cell key columns are kept
+    :type cells: bool
+    :return: empty hydrated partition
+    :rtype: pd.DataFrame
+    """
+    if lookup is None:
+        # the stored schema gives the columns of the default registry
+        registry = registry_frame(pq.read_schema(data_path).empty_table())
+    else:
+        registry = lookup._take(  # pylint: disable=protected-access
+            np.empty(0, dtype=np.int64)
+        )
+    registry = registry.reset_index(drop=True)
+    if crs is not None:
+        registry = registry.set_crs(crs, allow_override=True)
+    if fallback:
+        registry["precision"] = pd.Categorical([], categories=PRECISIONS)
+
+    if not is_structured(df.columns):
+        address_cols = [
+            c for c in ADDRESS_COLS + ["precision"] if c in registry.columns
+        ]
+        if cells:
+            address_cols += [c for c in CELL_COLS if c in registry.columns]
+        return df.assign(**{c: registry[c].values for c in address_cols})
+
+    # registry columns first, then the query columns which aren't in the index
+    index_name = df.index.name
+    q = df.reset_index() if index_name else df
+    if "street" in q.columns and "street_nominative" not in q.columns:
+        q = q.drop("street", axis=1)
+    out = registry.drop(
+        ["fid"] + ([] if cells else [c for c in CELL_COLS if c in registry.columns]),
+        axis=1,
+    )
+    for c in q.columns:
+        if c not in INDEX_COLS:
+            out[c] = q[c].values
+    out["qidx"] = np.empty(0, dtype=np.int64)
+    out["order"] = np.empty(0, dtype=np.int64)
+    if index_name:
+        return out.set_index(index_name)
+    out.index = df.index
+    return out
+
+
+def hydrate_dask(
+    ddf: dd.DataFrame,
+    query_column: str = "address",
+    region: Optional[str] = None,
+    lookup: Optional[Lookup] = None,
+    fallback: bool = False,
+    crs: Optional[Any] = None,
+    cells: bool = False,
+) -> dd.DataFrame:
+    """Hydrates a dask data frame of free text or structured addresses.
+
+    :param ddf: dask data frame with an address column or structured
+                [postcode, street/street_nominative, house_nr] columns
+    :type ddf: dd.DataFrame
+    :param query_column: column holding address strings, defaults to "address"
+    :type query_column: str
+    :param region: limit partial matches to addresses in this region
+    :type region: Optional[str]
+    :param lookup: lookup to use instead of the default one, it's sent to each
+                   worker once rather than with every partition
+    :type lookup: Optional[Lookup]
+    :param fallback: locate unmatched rows at the centroid of their street,
+                     postcode or municipality
+    :type fallback: bool
+    :param crs: crs of the geometry, 3057 returns the native ISN93 coordinates
+    :type crs: Optional[Any]
+    :param cells: add the grid cell key columns of each address
+    :type cells: bool
+    :return: hydrated dask data frame
+    :rtype: dd.DataFrame
+    """
+    meta = _hydrate_meta(
+        ddf._meta, lookup, fallback, crs, cells  # pylint: disable=protected-access
+    )
+    if lookup is not None:
+        # a single task holding the lookup, workers fetch it once
+        lookup = dask.delayed(lookup, pure=True)
+    return ddf.map_partitions(
+        _hydrate_partition,
+        lookup,
+        query_column,
+        region,
+        fallback,
+        crs,
+        cells,
+        meta=meta,
+    )
+
+
+@dd.extensions.register_dataframe_accessor("stadfangaskra")
+class DaskAccessor:  # pylint: disable=too-few-public-methods
+    def __init__(self, dask_obj):
+        self._obj = dask_obj
+
+    def hydrate(
+        self,
+        query_column: str = "address",
+        region: Optional[str] = None,
+        lookup: Optional[Lookup] = None,
+        fallback: bool = False,
+        crs: Optional[Any] = None,
+        cells: bool = False,
+    ) -> dd.DataFrame:
+        return hydrate_dask(
+            self._obj,
+            query_column=query_column,
+            region=region,
+            lookup=lookup,
+            fallback=fallback,
+            crs=crs,
+            cells=cells,
+        )
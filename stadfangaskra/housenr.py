@@ -0,0 +1,325 @@
+import re
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .spatial import _expand_ranges
+
+# how the house number of a query result was found, "nearest" and
+# "interpolated" are approximations of a house number not in the registry
+HOUSE_NR_MATCHES = ["exact", "nearest", "interpolated"]
+
+# values of the ``house_nr_fallback`` query option
+HOUSE_NR_FALLBACKS = ["nearest", "interpolate"]
+
+# a number and an optional letter suffix, "22" or "22B"
+RE_HOUSE_NUMBER = re.compile(r"^(\d+)([^\W\d_]*)$")
+
+# a range of house numbers, "10-30"
+RE_HOUSE_RANGE = re.compile(r"^(\d+)[^\W\d_]*-(\d+)[^\W\d_]*$")
+
+
+def parse_house_nrs(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Parses house numbers into a number and a letter suffix.
+
+    :param values: house numbers, e.g. "22B"
+    :type values: np.ndarray
+    :return: number of each house number, -1 if it can't be parsed, and its
+             upper case suffix
+    :rtype: Tuple[np.ndarray, np.ndarray]
+    """
+    parts = (
+        pd.Series(np.asarray(values, dtype=object))
+        .astype(str)
+        .str.upper()
+        .str.extract(RE_HOUSE_NUMBER.pattern)
+    )
+    number = pd.to_numeric(parts[0]).fillna(-1).values.astype(np.int64)
+    suffix = parts[1].fillna("").values.astype(object)
+    return number, suffix
+
+
+def parse_house_range(word: str) -> Optional[Tuple[int, int]]:
+    """Parses a range of house numbers.
+
+    :param word: e.g. "10-30"
+    :type word: str
+    :return: lowest and highest number, None if ``word`` isn't a range
+    :rtype: Optional[Tuple[int, int]]
+    """
+    m = RE_HOUSE_RANGE.match(word.strip(",."))
+    if m is None:
+        return None
+    lo, hi = int(m.group(1)), int(m.group(2))
+    return min(lo, hi), max(lo, hi)
+
+
+class HouseNumberIndex:
+    """
+    Sorted house numbers of every street, to approximate house numbers which
+    aren't in the registry and to find ranges of house numbers.
+
+    How it works:
+    - House numbers are parsed into a number and a letter suffix. Addresses
+      are grouped by (postcode, street, side of the street), the side being
+      the parity of the number as streets are numbered odd on one side and
+      even on the other.
+    - Every address gets a packed int64 key of its group, number and suffix,
+      the keys are sorted so each group is a contiguous run ordered by house
+      number.
+    - A query is packed the same way and found with a binary search, the
+      addresses before and after it in its group are its neighbours on the
+      same side of the street. Streets numbered on one side only are searched
+      on that side, queries without a postcode are searched in the postcode of
+      their street if it's in only one.
+    """
+
+    groups: pd.MultiIndex
+    street_postcodes: Dict[str, str]
+    suffixes: np.ndarray
+    stride: int
+    keys: np.ndarray
+    order: np.ndarray
+    numbers: np.ndarray
+    lon: np.ndarray
+    lat: np.ndarray
+    x: Optional[np.ndarray] = None
+    y: Optional[np.ndarray] = None
+
+    def __init__(
+        self,
+        postcode: np.ndarray,
+        street: np.ndarray,
+        house_nr: np.ndarray,
+        lon: np.ndarray,
+        lat: np.ndarray,
+        x: Optional[np.ndarray] = None,
+        y: Optional[np.ndarray] = None,
+    ) -> "HouseNumberIndex":
+        """
+        :param postcode: postcode of each address
+        :type postcode: np.ndarray
+        :param street: nominative street name of each address
+        :type street: np.ndarray
+        :param house_nr: house number of each address
+        :type house_nr: np.ndarray
+        :param lon: longitude of each address
+        :type lon: np.ndarray
+        :param lat: latitude of each address
+        :type lat: np.ndarray
+        :param x: ISN93 x of each address
+        :type x: Optional[np.ndarray]
+        :param y: ISN93 y of each address
+        :type y: Optional[np.ndarray]
+        """
+        number, suffix = parse_house_nrs(house_nr)
+        valid = np.flatnonzero(number >= 0)
+        self.suffixes = np.array(sorted(set(suffix[valid])), dtype=object)
+        self.groups, group = self._group_index(
+            np.asarray(postcode, dtype=object)[valid],
+            np.asarray(street, dtype=object)[valid],
+            number[valid] % 2,
+        )
+        streets = pd.DataFrame(
+            {
+                "street": self.groups.get_level_values(1),
+                "postcode": self.groups.get_level_values(0),
+            }
+        ).drop_duplicates()
+        streets = streets[~streets.duplicated("street", keep=False)]
+        self.street_postcodes = dict(zip(streets["street"], streets["postcode"]))
+        # one key per (group, number, suffix), numbers past the highest one in
+        # the registry stay within their group
+        self.stride = (int(number.max(initial=0)) + 2) * (len(self.suffixes) + 1)
+        keys = self._pack(
+            group, number[valid], np.searchsorted(self.suffixes, suffix[valid])
+        )
+        sort = np.argsort(keys, kind="stable")
+        self.keys = keys[sort]
+        self.order = valid[sort]
+        self.numbers = number[self.order]
+        self.lon = np.asarray(lon, dtype=np.float64)
+        self.lat = np.asarray(lat, dtype=np.float64)
+        if x is not None:
+            self.x = np.asarray(x, dtype=np.float64)
+            self.y = np.asarray(y, dtype=np.float64)
+
+    @staticmethod
+    def _group_index(
+        postcode: np.ndarray, street: np.ndarray, side: np.ndarray
+    ) -> Tuple[pd.MultiIndex, np.ndarray]:
+        codes, groups = pd.MultiIndex.from_arrays(
+            [postcode.astype(str), street.astype(str), side]
+        ).factorize()
+        return groups, codes
+
+    def _pack(self, group: np.ndarray, number: np.ndarray, suffix: np.ndarray):
+        number = np.minimum(number, self.stride // (len(self.suffixes) + 1) - 1)
+        return group * self.stride + number * (len(self.suffixes) + 1) + suffix
+
+    def _group_bounds(self, group: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        lo = np.searchsorted(self.keys, group * self.stride, side="left")
+        hi = np.searchsorted(self.keys, (group + 1) * self.stride, side="left")
+        return lo, hi
+
+    def _postcodes(
+        self, postcode: np.ndarray, street: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Postcode and street of each query, the postcode of the street if
+        none is given and the street is in only one."""
+        street = np.asarray(street, dtype=object).astype(str)
+        postcode = np.array(
+            [
+                p or self.street_postcodes.get(s, "")
+                for p, s in zip(np.asarray(postcode, dtype=object).astype(str), street)
+            ],
+            dtype=object,
+        )
+        return postcode, street
+
+    def _find_group(
+        self, postcode: np.ndarray, street: np.ndarray, side: np.ndarray
+    ) -> np.ndarray:
+        """Group of each query on its side of the street, or the other side
+        if its side has no numbers, -1 if the street isn't found."""
+        postcode, street = self._postcodes(postcode, street)
+        group = self.groups.get_indexer(
+            pd.MultiIndex.from_arrays([postcode, street, side])
+        )
+        other = self.groups.get_indexer(
+            pd.MultiIndex.from_arrays([postcode, street, 1 - side])
+        )
+        return np.where(group >= 0, group, other)
+
+    def search(
+        self, postcode: np.ndarray, street: np.ndarray, house_nr: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Finds the addresses next to each house number on its side of the
+        street.
+
+        :param postcode: postcode of each query
+        :type postcode: np.ndarray
+        :param street: nominative street name of each query
+        :type street: np.ndarray
+        :param house_nr: house number of each query
+        :type house_nr: np.ndarray
+        :return: registry position of the address before and of the address
+                 after each query, -1 if there is none, and how far the
+                 query's number is from the one before to the one after, NaN
+                 unless both are found and their numbers differ
+        :rtype: Tuple[np.ndarray, np.ndarray, np.ndarray]
+        """
+        number, suffix = parse_house_nrs(house_nr)
+        group = self._find_group(postcode, street, np.maximum(number, 0) % 2)
+        group = np.where(number >= 0, group, -1)
+        found = group >= 0
+        lo, hi = self._group_bounds(np.maximum(group, 0))
+        # unknown suffixes sort between the known ones
+        keys = self._pack(
+            np.maximum(group, 0), number, np.searchsorted(self.suffixes, suffix)
+        )
+        i = np.searchsorted(self.keys, keys, side="left")
+
+        before = np.where(found & (i > lo), i - 1, -1)
+        after = np.where(found & (i < hi), i, -1)
+        before_nr = self.numbers[np.maximum(before, 0)]
+        after_nr = self.numbers[np.maximum(after, 0)]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            t = np.where(
+                (before >= 0) & (after >= 0) & (after_nr > before_nr),
+                (number - before_nr) / (after_nr - before_nr),
+                np.nan,
+            )
+        before = np.where(before >= 0, self.order[np.maximum(before, 0)], -1)
+        after = np.where(after >= 0, self.order[np.maximum(after, 0)], -1)
+        return before, after, t
+
+    def approximate(
+        self,
+        postcode: np.ndarray,
+        street: np.ndarray,
+        house_nr: np.ndarray,
+        mode: str = "nearest",
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Approximates house numbers from their neighbours on the same side
+        of the street.
+
+        :param postcode: postcode of each query
+        :type postcode: np.ndarray
+        :param street: nominative street name of each query
+        :type street: np.ndarray
+        :param house_nr: house number of each query
+        :type house_nr: np.ndarray
+        :param mode: "nearest" takes the address with the closest number,
+                     "interpolate" also places the query between the
+                     addresses before and after it
+        :type mode: str
+        :raises ValueError: if the mode is unknown
+        :return: registry position of the nearest address, -1 if there is
+                 none, how it was found, an index into ``HOUSE_NR_MATCHES``,
+                 and the [lon, lat, x, y] of interpolated queries, NaN for
+                 the others
+        :rtype: Tuple[np.ndarray, np.ndarray, np.ndarray]
+        """
+        if mode not in HOUSE_NR_FALLBACKS:
+            raise ValueError(f"Unknown house number fallback: {mode}")
+        before, after, t = self.search(postcode, street, house_nr)
+        nearest = np.where(
+            (after >= 0) & ((before < 0) | (t > 0.5)), after, before
+        ).astype(np.int64)
+        codes = np.where(nearest >= 0, 1, -1).astype(np.int8)
+        points = np.full((len(nearest), 4), np.nan)
+        if mode == "interpolate":
+            # a query on the number before it is placed there, as nearest
+            inner = np.flatnonzero((t > 0) & (t < 1))
+            codes[inner] = 2
+            a, b, w = before[inner], after[inner], t[inner]
+            coordinates = [self.lon, self.lat]
+            if self.x is not None:
+                coordinates += [self.x, self.y]
+            for j, c in enumerate(coordinates):
+                points[inner, j] = c[a] + w * (c[b] - c[a])
+        return nearest, codes, points
+
+    def within_range(
+        self, postcode: np.ndarray, street: np.ndarray, lo: np.ndarray, hi: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Finds the addresses numbered from ``lo`` to ``hi`` on both sides of
+        each street.
+
+        :param postcode: postcode of each range
+        :type postcode: np.ndarray
+        :param street: nominative street name of each range
+        :type street: np.ndarray
+        :param lo: lowest number of each range
+        :type lo: np.ndarray
+        :param hi: highest number of each range, inclusive
+        :type hi: np.ndarray
+        :return: range index and registry position of each address, ordered
+                 by range, number and suffix
+        :rtype: Tuple[np.ndarray, np.ndarray]
+        """
+        postcode, street = self._postcodes(postcode, street)
+        lo = np.asarray(lo, dtype=np.int64)
+        hi = np.asarray(hi, dtype=np.int64)
+        owners, positions = [], []
+        for side in [0, 1]:
+            group = self.groups.get_indexer(
+                pd.MultiIndex.from_arrays(
+                    [postcode, street, np.full(len(postcode), side)]
+                )
+            )
+            found = np.flatnonzero(group >= 0)
+            start = np.searchsorted(self.keys, self._pack(group[found], lo[found], 0))
+            stop = np.searchsorted(
+                self.keys, self._pack(group[found], hi[found] + 1, 0)
+            )
+            owner, pos = _expand_ranges(start, stop)
+            owners.append(found[owner])
+            positions.append(pos)
+        owner = np.concatenate(owners)
+        pos = np.concatenate(positions)
+        # both sides of the street merged, by number and suffix
+        sort = np.lexsort((self.keys[pos] % self.stride, owner))
+        return owner[sort], self.order[pos[sort]]
@@ -0,0 +1,193 @@
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from .static import INDEX_COLS
+
+# status of a match, "ambiguous" if a partial address matches more than one
+MATCH_STATUSES = ["exact", "partial", "ambiguous", "none"]
+EXACT, PARTIAL, AMBIGUOUS, NONE = range(len(MATCH_STATUSES))
+
+
+def merge_tuples(
+    sq: Tuple[
+        Union[str, slice], Union[str, slice], Union[str, slice], Union[str, slice]
+    ],
+    res: pd.MultiIndex,
+) -> Tuple[str, str, str, str]:
+    """Replace tuple values where the index is an empty slice.
+
+    Behaviour change in pandas 1.4, in previous versions the full index was returned.
+    Post 1.4, pandas returns only the missing levels.
+
+    :param sq: query tuple
+    :type sq: Tuple[ Union[str, slice], Union[str, slice], Union[str, slice], Union[str, slice] ]
+    :param res: index part
+    :type res: Tuple
+    :return: Full lookup value
+    :rtype: Tuple[str, str, str, str]
+    """
+    out = list(sq)
+    for n in res.names:
+        idx = INDEX_COLS.index(n)
+        out[idx] = res.get_level_values(n)[0]
+    return tuple(out)
+
+
+class KeyIndex:
+    """Exact and partial matching of address tuples against the registry
+    index.
+
+    The codes of the [municipality, postcode, street_nominative, house_nr]
+    index levels are packed into a single sorted int64 key per address,
+    queries are packed the same way and matched with a binary search.
+    """
+
+    def __init__(self, index: pd.MultiIndex):
+        """
+        :param index: sorted registry index
+        :type index: pd.MultiIndex
+        """
+        self.levels = index.levels
+        keys = np.zeros(len(index), dtype=np.int64)
+        for level, codes in zip(index.levels, index.codes):
+            keys = keys * len(level) + codes
+        self._order = np.argsort(keys, kind="stable")
+        self._keys = keys[self._order]
+        # partial matches are selected on the index, the rows need no columns
+        self._rows = pd.DataFrame(index=index)
+
+    def encode(self, index: pd.MultiIndex) -> np.ndarray:
+        """Packs [municipality, postcode, street_nominative, house_nr] values
+        into int64 keys using the codes of the registry index levels.
+
+        :param index: index of address tuples
+        :type index: pd.MultiIndex
+        :return: keys, -1 where a value isn't in the registry
+        :rtype: np.ndarray
+        """
+        keys = np.zeros(len(index), dtype=np.int64)
+        valid = np.ones(len(index), dtype=bool)
+        for i, level in enumerate(self.levels):
+            codes = level.get_indexer(index.get_level_values(i))
+            valid &= codes >= 0
+            keys = keys * len(level) + codes
+        return np.where(valid, keys, -1)
+
+    def match(self, keys: np.ndarray) -> np.ndarray:
+        """Finds the registry rows of packed keys.
+
+        :param keys: keys built by ``encode``
+        :type keys: np.ndarray
+        :return: registry positions, -1 where there's no match
+        :rtype: np.ndarray
+        """
+        if self._keys.size == 0:
+            return np.full(len(keys), -1, dtype=np.int64)
+        pos = np.minimum(np.searchsorted(self._keys, keys), len(self._keys) - 1)
+        hit = (keys >= 0) & (self._keys[pos] == keys)
+        return np.where(hit, self._order[pos], -1)
+
+    def match_index(
+        self, index: pd.MultiIndex, postcodes: Optional[List[str]] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Matches address tuples exactly, and partially when they're
+        incomplete.
+
+        :param index: [municipality, postcode, street_nominative, house_nr] of
+                      each query
+        :type index: pd.MultiIndex
+        :param postcodes: only accept partial matches in these postcodes
+        :type postcodes: Optional[List[str]]
+        :return: registry position of each query, -1 if not found, and its
+                 status, an index into ``MATCH_STATUSES``
+        :rtype: Tuple[np.ndarray, np.ndarray]
+        """
+        # exact matches, by packed key
+        positions = self.match(self.encode(index))
+        status = np.where(positions >= 0, EXACT, NONE).astype(np.int8)
+
+        # find queries which couldn't be found, these could be empty queries
+        # or partial matches.
+        missing = positions < 0
+        if missing.any():
+            miss = index[missing]
+            # get unique set of valid missing queries
+            miss_unique = miss.unique()
+            given = [miss_unique.get_level_values(i).values != "" for i in range(4)]
+            known = [
+                ~given[i] | miss_unique.get_level_values(i).isin(self.levels[i])
+                for i in range(4)
+            ]
+            # a query can't match partially if one of its values isn't in the
+            # registry, or if it's complete and wasn't matched exactly
+            miss_unique = miss_unique[
+                (given[0] | given[1] | given[2])
+                & ~np.logical_and.reduce(given)
+                & np.logical_and.reduce(known)
+            ]
+
+            # as the address dataframe is fairly large, constrict the search
+            # space to the records loosely matching what's being queried for. For
+            # large datasets, this speeds up querying considerably.
+            search_space = self._rows.iloc[:0]
+            if len(miss_unique):
+                # an empty value matches anything in its level
+                search_selector = [
+                    slice(None) if "" in i else i
+                    for i in [
+                        i.values.tolist()
+                        for i in miss_unique.remove_unused_levels().levels
+                    ]
+                ]
+                try:
+                    search_space = self._rows.loc[tuple(search_selector), :]
+                except KeyError:
+                    # none of the values are in a filtered registry
+                    pass
+            if postcodes is not None:
+                # a partial match is only accepted if it's unique within the region
+                search_space = search_space[
+                    search_space.index.get_level_values(1).isin(postcodes)
+                ]
+
+            partial = {}
+            ambiguous = []
+            for tvec in miss_unique:
+                # the index is 4 levels, [municipality, postcode, street, house_nr],
+                # all of these values are allowed to be an empty string, except at
+                # this point it is clear that a key with an empty string could not
+                # be found in the index.
+                # Replace all empty strings with a None slice and query the address dataframe
+                sq = tuple((i or slice(None) for i in tvec))
+                # NOTE: Author has not founded a vectorized approach to querying the
+                # source dataframe and matching the query index back with the result.
+                try:
+                    res = search_space.loc[sq]
+                except KeyError:
+                    continue
+
+                # a partial match is only accepted if it's unique
+                if len(res) == 1:
+                    partial[tvec] = merge_tuples(sq, res.index)
+                elif len(res) > 1:
+                    ambiguous.append(tvec)
+
+                # NOTE: here there are multiple matches, theoretically possible to train
+                # a model which would give higher priority to a generic address determined
+                # by its frequency over a corpus.
+
+            if partial:
+                matched = self.match(
+                    self.encode(pd.MultiIndex.from_tuples(list(partial.values())))
+                )
+                # position of each missing query in the partial matches
+                idx = pd.MultiIndex.from_tuples(list(partial)).get_indexer(miss)
+                positions[missing] = np.where(idx >= 0, matched[idx], -1)
+                status[missing] = np.where(idx >= 0, PARTIAL, NONE)
+            if ambiguous:
+                idx = pd.MultiIndex.from_tuples(ambiguous).get_indexer(miss)
+                status[np.flatnonzero(missing)[idx >= 0]] = AMBIGUOUS
+
+        return positions, status
@@ -0,0 +1,136 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+# columns of the special name table built by ``preprocess``
+LANDMARK_COLS = [
+    "special_name",
+    "municipality",
+    "postcode",
+    "street_nominative",
+    "house_nr",
+]
+
+
+def normalize_name(name: str) -> str:
+    """Normalizes a special name for lookups, case and whitespace are ignored.
+
+    :param name: special name, e.g. "Ráðhús Reykjavíkur"
+    :type name: str
+    :return: normalized name
+    :rtype: str
+    """
+    return " ".join(w.strip(",.") for w in name.casefold().split())
+
+
+class LandmarkIndex:
+    """
+    Hash index over the special names of addresses, landmarks and named
+    buildings such as "Smáralind".
+
+    How it works:
+    - Names are normalized and mapped to the
+      [municipality, postcode, street_nominative, house_nr] tuples of the
+      addresses carrying them, a name may belong to more than one address.
+    - A sequence of words is looked up one run of words at a time, longest
+      runs first. A name resolves if it belongs to a single address, after
+      leaving out addresses in another municipality or postcode than given.
+    """
+
+    names: Dict[str, List[Tuple[str, str, str, str]]]
+    max_words: int
+
+    def __init__(self, table: pd.DataFrame) -> "LandmarkIndex":
+        """
+        :param table: special name table with columns ``LANDMARK_COLS``
+        :type table: pd.DataFrame
+        """
+        self.names = {}
+        columns = [table[c].astype(str).tolist() for c in LANDMARK_COLS]
+        for name, *address in zip(*columns):
+            self.names.setdefault(normalize_name(name), []).append(tuple(address))
+        self.max_words = max((len(n.split(" ")) for n in self.names), default=0)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def to_frame(self) -> pd.DataFrame:
+        """Special name table of the index, with normalized names.
+
+        :return: data frame with columns ``LANDMARK_COLS``
+        :rtype: pd.DataFrame
+        """
+        rows = [
+            (name, *address)
+            for name, addresses in self.names.items()
+            for address in addresses
+        ]
+        return pd.DataFrame(rows, columns=LANDMARK_COLS)
+
+    def get(
+        self, name: str, municipality: str = "", postcode: str = ""
+    ) -> Optional[Tuple[str, str, str, str]]:
+        """Finds the address of a special name.
+
+        :param name: normalized special name
+        :type name: str
+        :param municipality: only consider addresses in this municipality
+        :type municipality: str
+        :param postcode: only consider addresses in this postcode
+        :type postcode: str
+        :return: address tuple, None if the name isn't found or is ambiguous
+        :rtype: Optional[Tuple[str, str, str, str]]
+        """
+        candidates = [
+            a
+            for a in self.names.get(name, [])
+            if (not municipality or a[0] == municipality)
+            and (not postcode or a[1] == postcode)
+        ]
+        return candidates[0] if len(candidates) == 1 else None
+
+    def resolve(
+        self, words: Sequence[str], municipality: str = "", postcode: str = ""
+    ) -> Optional[Tuple[str, str, str, str]]:
+        """Finds the address of a special name in a sequence of words.
+
+        :param words: words of an address query
+        :type words: Sequence[str]
+        :param municipality: only consider addresses in this municipality
+        :type municipality: str
+        :param postcode: only consider addresses in this postcode
+        :type postcode: str
+        :return: address tuple of the longest resolved name, None if there
+                 is none
+        :rtype: Optional[Tuple[str, str, str, str]]
+        """
+        words = [normalize_name(w) for w in words]
+        words = [w for w in words if w]
+        for n in range(min(self.max_words, len(words)), 0, -1):
+            for i in range(len(words) - n + 1):
+                address = self.get(" ".join(words[i : i + n]), municipality, postcode)
+                if address is not None:
+                    return address
+        return None
+
+    def resolve_suffix(
+        self, words: Sequence[str]
+    ) -> Optional[Tuple[str, str, str, str]]:
+        """Finds a capitalized special name ending with the last of ``words``,
+        used when scanning text.
+
+        :param words: the latest words of a text, at most ``max_words`` are used
+        :type words: Sequence[str]
+        :return: address tuple of the longest resolved name, None if there
+                 is none
+        :rtype: Optional[Tuple[str, str, str, str]]
+        """
+        words = list(words)[-self.max_words :] if self.max_words else []
+        for i, word in enumerate(words):
+            # names are proper nouns, lower case words in text are left alone
+            if not word[:1].isupper():
+                continue
+            address = self.get(normalize_name(" ".join(words[i:])))
+            if address is not None:
+                return address
+        return None
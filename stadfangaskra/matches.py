@@ -1,7 +1,11 @@
 # pylint: disable=too-many-boolean-expressions
-from dataclasses import dataclass
-from typing import Iterator, Optional
+import codecs
+import re
+from collections import deque
+from dataclasses import dataclass, fields
+from typing import IO, Iterable, Iterator, Optional, Union
 
+from .landmarks import LandmarkIndex
 from .static import RE_HOUSE_NR, RE_POSTCODE, RE_STREET_ENDING
 
 
@@ -12,7 +16,19 @@ class Match:
     house_nr: Optional[str]
 
 
-def iter_matches(text: str) -> Iterator[Match]:
+# columns of a data frame of matches
+MATCH_COLS = [f.name for f in fields(Match)]
+
+# longest word carried over to the next chunk, longer words can't be part of
+# an address and are split instead of being held in memory
+MAX_WORD_LENGTH = 1024
+
+RE_WHITESPACE = re.compile(r"\s+")
+
+
+def iter_matches(
+    text: str, landmarks: Optional[LandmarkIndex] = None
+) -> Iterator[Match]:
     """
     Finds address match candidates in text. The parsing algorithm
     assumes that addresses are written in a common format, e.g.
@@ -23,10 +39,92 @@ def iter_matches(text: str) -> Iterator[Match]:
     variation in existence.
 
     :param text: source text
+    :param landmarks: special names to find as well, e.g. "Smáralind",
+                      matched as the address carrying the name
+    """
+    return _iter_word_matches(text.split(), landmarks)
+
+
+def iter_chunks(
+    source: Union[str, IO, Iterable[Union[str, bytes]]],
+    chunk_size: int = 1 << 20,
+    encoding: str = "utf-8",
+) -> Iterator[str]:
+    """Reads text in chunks from a string, a file object or an iterator of
+    text chunks. Bytes are decoded incrementally, so characters split between
+    chunks are decoded correctly.
+
+    :param source: text, file object opened in text or binary mode, or an
+                   iterator of str or bytes chunks
+    :param chunk_size: characters or bytes to read from a file at a time
+    :param encoding: encoding of bytes
+    """
+    if isinstance(source, str):
+        source = [source]
+    elif hasattr(source, "read"):
+        f = source
+        source = iter(lambda: f.read(chunk_size), f.read(0))
+
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    for chunk in source:
+        if isinstance(chunk, bytes):
+            chunk = decoder.decode(chunk)
+        if chunk:
+            yield chunk
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+def iter_words(chunks: Iterable[str]) -> Iterator[str]:
+    """Splits text chunks into words on any whitespace, words split between
+    chunks are joined. Words longer than ``MAX_WORD_LENGTH`` are split.
+
+    :param chunks: text chunks
+    """
+    carry = ""
+    for chunk in chunks:
+        words = RE_WHITESPACE.split(carry + chunk)
+        # the last word may continue in the next chunk
+        carry = words.pop()
+        yield from filter(None, words)
+        if len(carry) > MAX_WORD_LENGTH:
+            yield carry
+            carry = ""
+    if carry:
+        yield carry
+
+
+def iter_stream_matches(
+    source: Union[str, IO, Iterable[Union[str, bytes]]],
+    chunk_size: int = 1 << 20,
+    encoding: str = "utf-8",
+    landmarks: Optional[LandmarkIndex] = None,
+) -> Iterator[Match]:
+    """
+    Finds address match candidates in a stream of text, see ``iter_matches``.
+    Only the current word and match are held in memory, addresses spanning
+    chunks are found as if the text was read in one piece.
+
+    :param source: text, file object opened in text or binary mode, or an
+                   iterator of str or bytes chunks
+    :param chunk_size: characters or bytes to read from a file at a time
+    :param encoding: encoding of bytes
+    :param landmarks: special names to find as well, see ``iter_matches``
     """
+    return _iter_word_matches(
+        iter_words(iter_chunks(source, chunk_size, encoding)), landmarks
+    )
+
+
+def _iter_word_matches(
+    words: Iterable[str], landmarks: Optional[LandmarkIndex] = None
+) -> Iterator[Match]:
     postcode = None
     street = None
     house_nr = None
+    # the latest words, the longest special name is looked up among them
+    recent = deque(maxlen=landmarks.max_words if landmarks else 1)
 
     def reset():
         nonlocal postcode
@@ -35,8 +133,9 @@ def iter_matches(text: str) -> Iterator[Match]:
         postcode = None
         street = None
         house_nr = None
+        recent.clear()
 
-    for w in text.split(" "):
+    for w in words:
         w = w.strip(",.")
         if RE_STREET_ENDING.search(w):
             street = w
@@ -44,6 +143,13 @@ def iter_matches(text: str) -> Iterator[Match]:
             postcode = int(w)
         elif RE_HOUSE_NR.match(w):
             house_nr = w
+        if landmarks and w:
+            recent.append(w)
+            address = landmarks.resolve_suffix(recent)
+            if address is not None:
+                reset()
+                yield Match(int(address[1]), address[2], address[3])
+                continue
         if (postcode and street and house_nr) or (postcode and street) or postcode:
             yield Match(postcode, street, house_nr)
             reset()
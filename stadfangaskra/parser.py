@@ -0,0 +1,232 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from .housenr import RE_HOUSE_NUMBER
+from .landmarks import LandmarkIndex
+from .static import ADMINISTRATIVE_DIVISIONS, INDEX_COLS, POSTCODE_MUNICIPALITY_LOOKUP
+
+
+def is_structured(cols: List[str]) -> bool:
+    return (
+        "postcode" in cols
+        and ("street" in cols or "street_nominative" in cols)
+        and "house_nr" in cols
+    )
+
+
+def is_valid_idx(x: Tuple[str, str, str, str]):
+    if not x[0] and not x[1] and not x[2]:
+        return False
+    return True
+
+
+def _map_unique(s: pd.Series, func: Callable[[Any], Any]) -> pd.Series:
+    # applies ``func`` once per distinct value rather than once per row
+    uniques = pd.unique(s.values)
+    return s.map(dict(zip(uniques, map(func, uniques))))
+
+
+class QueryParser:
+    """
+    Parses address strings and structured data into
+    [municipality, postcode, street_nominative, house_nr] tuples.
+
+    The vocabulary the tuples are built from is set by subclasses, a
+    ``Lookup`` uses the values of its registry index. Inputs without a street,
+    e.g. "Smáralind", are looked up by the special name of an address in
+    ``landmarks``.
+    """
+
+    town_street_to_postcode: Dict[Tuple[str, str], str]
+    streets: List[str]
+    house_nrs: List[str]
+    postcodes: List[str]
+    municipalities: List[str]
+    street_dative: Dict[str, str]
+    landmarks: Optional[LandmarkIndex] = None
+
+    def text_to_vec(  # pylint: disable=too-many-branches
+        self, s: str, keep_house_nr: bool = False
+    ) -> Tuple[str, str, str, str]:
+        """Builds a tuple out of an address string.
+
+        * index 0, category value of the "municipality" category.
+        * index 1, category value of the "postcode" category.
+        * index 2, category value of the "street_nominative" category.
+        * index 3, category value of the "house_nr" category.
+
+        :param s: string containing address
+        :type s: str
+        :param keep_house_nr: keep a house number which isn't in the registry
+                              if a street and postcode are found, for
+                              ``house_nr_fallback``. Defaults to False.
+        :type keep_house_nr: bool
+        :return: Address tuple
+        :rtype: Tuple[str, str, str, str]
+        """
+        municipality = ""
+        postcode = ""
+        street = ""
+        house_nr = ""
+        admin_unit = ""
+        # first number after the street which isn't in the registry
+        number = ""
+
+        # Exit early if the string is empty
+        if not s:
+            return ("", "", "", "")
+
+        for w in s.split(" "):
+            w = w.strip(",.")
+
+            if not street and w in self.streets:
+                street = w
+
+            if (
+                not house_nr
+                and not number
+                and (w.upper() in self.house_nrs or "-" in w)
+            ):
+                house_nr = w
+            elif (
+                keep_house_nr
+                and not house_nr
+                and not number
+                and street
+                and w not in self.postcodes
+                and RE_HOUSE_NUMBER.match(w)
+            ):
+                number = w
+
+            if not postcode and w in self.postcodes and w != house_nr:
+                postcode = w
+                municipality = POSTCODE_MUNICIPALITY_LOOKUP.get(int(postcode), "")
+
+            if not postcode and not municipality and w in self.municipalities:
+                municipality = w
+            if not municipality and w in ADMINISTRATIVE_DIVISIONS:
+                admin_unit = w
+
+        if not street and self.landmarks is not None:
+            # landmarks and named buildings resolve to their address
+            address = self.landmarks.resolve(s.split(" "), municipality, postcode)
+            if address is not None:
+                return address
+
+        if admin_unit and street:
+            for tn in ADMINISTRATIVE_DIVISIONS[admin_unit]:
+                postcode = self.town_street_to_postcode.get((tn, street), "")
+                if not postcode:
+                    continue
+                municipality = tn
+                break
+
+        # if we have municipality and street but no postcode, try looking it up
+        if municipality and street and not postcode:
+            postcode = self.town_street_to_postcode.get((municipality, street), "")
+            # Álftanes has a special case
+            if not postcode and municipality == "Garðabær":
+                postcode = self.town_street_to_postcode.get(
+                    ("Garðabær (Álftanes)", street)
+                )
+                if postcode:
+                    municipality = "Garðabær (Álftanes)"
+
+        if not house_nr and number and street and postcode:
+            # a number which isn't in the registry, kept for ``house_nr_fallback``
+            house_nr = number
+
+        if house_nr and "-" in house_nr:
+            house_nr = house_nr.split("-")[0]
+
+        return (
+            municipality or "",
+            postcode or "",
+            street or "",
+            (house_nr or "").upper(),
+        )
+
+    def _structured_frame(self, q: pd.DataFrame) -> pd.DataFrame:
+        """Builds the query frame for structured data, ``q`` is left as is.
+
+        :param q: structured data
+        :type q: pd.DataFrame
+        :return: query frame indexed by the address tuple
+        :rtype: pd.DataFrame
+        """
+        cols = q.columns
+        if "street" in cols and "street_nominative" not in cols:
+            q = q.rename(columns={"street": "street_nominative"})
+
+        postcode = q["postcode"].astype(str)
+        q = q.assign(
+            postcode=postcode,
+            house_nr=q["house_nr"].astype(str),
+            street_nominative=_map_unique(
+                q["street_nominative"], lambda v: self.street_dative.get(v, v)
+            ),
+        )
+        if "municipality" not in cols:
+            q = q.assign(
+                municipality=_map_unique(
+                    postcode,
+                    lambda pc: POSTCODE_MUNICIPALITY_LOOKUP.get(
+                        int(pc) if pc.isdigit() else -1, ""
+                    ),
+                )
+            )
+
+        # id of each distinct query
+        q = q.assign(
+            qidx=q.groupby(INDEX_COLS, sort=True, dropna=False).ngroup().values,
+            order=list(range(len(q))),
+        )
+        return q.set_index(keys=INDEX_COLS)
+
+    def _text_frame(
+        self,
+        text: Union[str, List[str], np.ndarray],
+        parse: bool = True,
+        keep_house_nr: bool = False,
+    ) -> pd.DataFrame:
+        """Builds the query frame for address strings.
+
+        :param text: string containing a single address or an iterator
+                     containing multiple addresses.
+        :type text: Union[str, List[str], np.ndarray]
+        :param parse: parse the address tuples, defaults to True
+        :type parse: bool
+        :param keep_house_nr: keep house numbers which aren't in the registry,
+                              see ``text_to_vec``
+        :type keep_house_nr: bool
+        :return: query frame indexed by the address tuple, or with a range
+                 index if not parsed
+        :rtype: pd.DataFrame
+        """
+        if isinstance(text, str):
+            text = [text]
+
+        # strip whitespace from text, missing values are empty queries
+        text = [t.strip() if isinstance(t, str) else "" for t in text]
+
+        # Set original search query and idx of the query
+        q = pd.DataFrame({"query": text})
+        # there might be duplicated values, cast the query as a category
+        # this is used as the id of the query
+        q["qidx"] = q["query"].astype("category").cat.codes
+
+        # keep the original order of the query
+        q["order"] = list(range(len(text)))
+        if not parse:
+            return q
+
+        # tokenize strings into a list of tuples,
+        # [municipality, postcode, street_nominative, house_nr]
+        vecs = [self.text_to_vec(t, keep_house_nr) for t in text]
+
+        # set the tokenized vector of
+        # [municipality, postcode, street_nominative, house_nr] as the index
+        q.index = pd.MultiIndex.from_frame(pd.DataFrame(vecs, columns=INDEX_COLS))
+        return q
@@ -0,0 +1,174 @@
+import re
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+# sorts after any character found in street names and house numbers
+_MAX_CHAR = "\uffff"
+
+
+def house_nr_key(house_nr: str) -> Tuple[int, int, str]:
+    """Natural sort key of a house number, "2" < "2A" < "10".
+
+    :param house_nr: house number
+    :type house_nr: str
+    :return: sort key
+    :rtype: Tuple[int, int, str]
+    """
+    m = re.match(r"\d+", house_nr)
+    if not m:
+        return (1, 0, house_nr)
+    return (0, int(m.group()), house_nr)
+
+
+def _prefix_range(keys: np.ndarray, prefix: str) -> Tuple[int, int]:
+    return (
+        int(np.searchsorted(keys, prefix, side="left")),
+        int(np.searchsorted(keys, prefix + _MAX_CHAR, side="right")),
+    )
+
+
+class PrefixIndex:
+    """
+    Sorted array prefix index over street names and house numbers.
+
+    How it works:
+    - Lower cased street names, nominative and dative, are stored in a sorted
+      array mapping to a street, prefixes are found with a binary search.
+    - Rows are ordered by street and house number so the house numbers of a
+      street are a contiguous, sorted slice which is searched the same way.
+    """
+
+    keys: np.ndarray
+    key_streets: np.ndarray
+    order: np.ndarray
+    street_starts: np.ndarray
+    house_nr: np.ndarray
+    rank: np.ndarray
+    postcode: np.ndarray
+
+    def __init__(
+        self,
+        street: np.ndarray,
+        house_nr: np.ndarray,
+        postcode: np.ndarray,
+        aliases: Optional[Dict[str, str]] = None,
+    ) -> "PrefixIndex":
+        """
+        :param street: nominative street name of each row
+        :type street: np.ndarray
+        :param house_nr: house number of each row
+        :type house_nr: np.ndarray
+        :param postcode: postcode of each row
+        :type postcode: np.ndarray
+        :param aliases: other names of streets, e.g. dative => nominative
+        :type aliases: Optional[Dict[str, str]]
+        """
+        street_codes, streets = pd.factorize(
+            np.asarray(street, dtype=object), sort=True
+        )
+        house_codes, house_nrs = pd.factorize(
+            np.asarray(house_nr, dtype=object), sort=True
+        )
+        postcode_codes, postcodes = pd.factorize(
+            np.asarray(postcode, dtype=object), sort=True
+        )
+        codes = {s: i for i, s in enumerate(streets)}
+
+        names = {(s.lower(), i) for i, s in enumerate(streets) if s}
+        for alias, nominative in (aliases or {}).items():
+            if alias and nominative in codes:
+                names.add((alias.lower(), codes[nominative]))
+        names = sorted(names)
+        self.keys = np.array([n for n, _ in names], dtype=object)
+        self.key_streets = np.array([i for _, i in names], dtype=np.int64)
+
+        natural = sorted(
+            range(len(house_nrs)), key=lambda i: house_nr_key(house_nrs[i])
+        )
+        house_rank = np.empty(len(house_nrs), dtype=np.int64)
+        house_rank[natural] = np.arange(len(house_nrs))
+
+        self.order = np.lexsort((house_codes, street_codes))
+        self.street_starts = np.searchsorted(
+            street_codes[self.order], np.arange(len(streets) + 1)
+        )
+        self.house_nr = np.asarray(house_nrs, dtype=object)[house_codes[self.order]]
+        # completion order, by natural house number and then postcode
+        self.rank = (house_rank[house_codes] * len(postcodes) + postcode_codes)[
+            self.order
+        ]
+        self.postcode = np.asarray(postcodes, dtype=object)[postcode_codes[self.order]]
+
+    def _streets(self, name: str, exact: bool) -> List[int]:
+        if exact:
+            lo = np.searchsorted(self.keys, name, side="left")
+            hi = np.searchsorted(self.keys, name, side="right")
+        else:
+            lo, hi = _prefix_range(self.keys, name)
+        # a street may match on more than one of its names
+        return list(dict.fromkeys(self.key_streets[lo:hi].tolist()))
+
+    def _rows(self, street: int, postcode: Optional[str]) -> np.ndarray:
+        rows = np.arange(self.street_starts[street], self.street_starts[street + 1])
+        if postcode is not None:
+            rows = rows[self.postcode[rows] == postcode]
+        return rows
+
+    def search(
+        self, prefix: str, limit: int = 10, postcode: Optional[Union[int, str]] = None
+    ) -> np.ndarray:
+        """Finds rows matching a partially typed address.
+
+        A street name followed by a space and the start of a house number
+        completes house numbers on that street, anything else completes street
+        names, returning the lowest house number of each street and postcode.
+
+        :param prefix: partially typed address, e.g. "Laugav" or "Laugavegur 2"
+        :type prefix: str
+        :param limit: maximum number of rows, defaults to 10
+        :type limit: int
+        :param postcode: only complete addresses in this postcode
+        :type postcode: Optional[Union[int, str]]
+        :return: positions of the matching rows, in completion order
+        :rtype: np.ndarray
+        """
+        text = " ".join(prefix.lower().split())
+        if not text or limit <= 0:
+            return np.empty(0, dtype=np.int64)
+        if postcode is not None:
+            postcode = str(postcode)
+
+        if prefix[-1].isspace():
+            street_part, house_part = text, ""
+        else:
+            street_part, _, house_part = text.rpartition(" ")
+
+        streets = []
+        if street_part and (not house_part or house_part[0].isdigit()):
+            streets = self._streets(street_part, exact=True)
+
+        if streets:
+            house_part = house_part.upper()
+            rows = []
+            for street in streets:
+                candidates = self._rows(street, None)
+                lo, hi = _prefix_range(self.house_nr[candidates], house_part)
+                rows.append(candidates[lo:hi])
+            rows = np.concatenate(rows)
+            if postcode is not None:
+                rows = rows[self.postcode[rows] == postcode]
+            rows = rows[np.argsort(self.rank[rows], kind="stable")][:limit]
+            return self.order[rows]
+
+        out = []
+        for street in self._streets(text, exact=False):
+            rows = self._rows(street, postcode)
+            rows = rows[np.argsort(self.rank[rows], kind="stable")]
+            # lowest house number in each postcode
+            _, first = np.unique(self.postcode[rows], return_index=True)
+            out.extend(rows[np.sort(first)].tolist())
+            if len(out) >= limit:
+                break
+        return self.order[np.array(out[:limit], dtype=np.int64)]
@@ -0,0 +1,357 @@
+"""Postcode partitioned lookup.
+
+Every shard holds the addresses of a set of postcodes, so a process only
+holds the part of the registry it answers for. Shards are ``Lookup`` instances
+in the router's process by default, ``ProcessShard`` runs each in a worker
+process of its own.
+"""
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple, Union
+
+import geopandas
+import numpy as np
+import pandas as pd
+
+from .base import _add_query_columns
+from .keys import AMBIGUOUS, EXACT, NONE, PARTIAL
+from .landmarks import LandmarkIndex
+from .parser import QueryParser
+from .spatial import epsg_code
+from .static import (
+    CRS,
+    NATIVE_CRS,
+    REGION_POSTCODES,
+    load_special_names,
+    load_street_dative,
+    load_street_postcodes,
+    load_vocabulary,
+    region_postcodes,
+)
+from .tree import Lookup
+
+# lookup of a shard worker process, built by the process initializer
+_worker_lookup: Optional[Lookup] = None
+
+
+def _init_worker(postcodes: List[str], columns: Optional[List[str]]) -> None:
+    global _worker_lookup  # pylint: disable=global-statement
+    _worker_lookup = Lookup(columns=columns, postcodes=postcodes)
+
+
+def _worker_match(
+    index: pd.MultiIndex, region: Optional[str], native: bool
+) -> Tuple[pd.DataFrame, np.ndarray]:
+    return _worker_lookup.match_tuples(index, region, native)
+
+
+class ProcessShard:
+    """
+    Shard running in a worker process of its own, the registry subset is only
+    loaded in the worker.
+    """
+
+    postcodes: List[str]
+    _executor: ProcessPoolExecutor
+
+    def __init__(
+        self,
+        postcodes: Sequence[Union[int, str]],
+        columns: Optional[List[str]] = None,
+        mp_context: Optional[Any] = None,
+    ) -> "ProcessShard":
+        """
+        :param postcodes: postcodes held by the shard
+        :type postcodes: Sequence[Union[int, str]]
+        :param columns: registry columns to load, defaults to all columns
+        :type columns: Optional[List[str]]
+        :param mp_context: multiprocessing context of the worker process,
+                           defaults to the platform default
+        :type mp_context: Optional[Any]
+        """
+        self.postcodes = [str(p) for p in postcodes]
+        self._executor = ProcessPoolExecutor(
+            max_workers=1,
+            mp_context=mp_context,
+            initializer=_init_worker,
+            initargs=(self.postcodes, columns),
+        )
+
+    def match_tuples(
+        self, index: pd.MultiIndex, region: Optional[str] = None, native: bool = False
+    ) -> Tuple[pd.DataFrame, np.ndarray]:
+        """Matches address tuples in the worker process, see
+        ``Lookup.match_tuples``.
+        """
+        return self._executor.submit(_worker_match, index, region, native).result()
+
+    def close(self) -> None:
+        """Stops the worker process."""
+        self._executor.shutdown()
+
+    def __enter__(self) -> "ProcessShard":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def _concat_arrays(arrays: List[Any]) -> Any:
+    if all(isinstance(a, pd.Categorical) for a in arrays):
+        # every shard has categories of its own
+        return pd.api.types.union_categoricals(arrays, sort_categories=True)
+    return pd.concat([pd.Series(a) for a in arrays], ignore_index=True).array
+
+
+class ShardedLookup(QueryParser):
+    """
+    Router over lookups which each hold the addresses of some postcodes.
+
+    How it works:
+    - Queries are parsed by the router, which holds the vocabulary of the
+      whole registry but none of its rows, so they're parsed as a ``Lookup``
+      over the whole registry would.
+    - Each distinct address tuple is sent to the shard owning its postcode,
+      tuples without a postcode are sent to every shard. Shards are queried
+      concurrently.
+    - A tuple sent to more than one shard is matched if exactly one shard
+      matches it, the same partial match a single lookup would find.
+    - Results are merged back in input order.
+    """
+
+    shards: Dict[str, Any]
+    owners: Dict[str, str]
+    columns: Optional[List[str]]
+    _owner_index: pd.Index
+    _owner_shard: np.ndarray
+    _executor: ThreadPoolExecutor
+
+    def __init__(
+        self,
+        partitions: Mapping[str, Sequence[Union[int, str]]],
+        shard_factory: Callable[..., Any] = Lookup,
+        columns: Optional[List[str]] = None,
+    ) -> "ShardedLookup":
+        """
+        :param partitions: postcodes held by each shard, by shard name
+        :type partitions: Mapping[str, Sequence[Union[int, str]]]
+        :param shard_factory: builds a shard, called with ``postcodes`` and
+                              ``columns`` keyword arguments. Defaults to
+                              ``Lookup``, ``ProcessShard`` runs shards in
+                              worker processes.
+        :type shard_factory: Callable[..., Any]
+        :param columns: registry columns to load, defaults to all columns
+        :type columns: Optional[List[str]]
+        :raises ValueError: if there are no partitions or a postcode is in
+                            more than one
+        """
+        if not partitions:
+            raise ValueError("At least one partition is required")
+        self.owners = {}
+        for name, postcodes in partitions.items():
+            for p in postcodes:
+                p = str(p)
+                if p in self.owners:
+                    raise ValueError(f"Postcode {p} is in more than one shard")
+                self.owners[p] = name
+
+        vocabulary = load_vocabulary()
+        self.municipalities = vocabulary["municipality"]
+        self.postcodes = vocabulary["postcode"]
+        self.streets = vocabulary["street_nominative"]
+        self.house_nrs = vocabulary["house_nr"]
+        self.columns = columns
+        self.town_street_to_postcode = load_street_postcodes()
+        self.street_dative = load_street_dative()
+        self.landmarks = LandmarkIndex(load_special_names())
+
+        self.shards = {
+            name: shard_factory(postcodes=[str(p) for p in postcodes], columns=columns)
+            for name, postcodes in partitions.items()
+        }
+        names = list(self.shards)
+        self._owner_index = pd.Index(list(self.owners), dtype=object)
+        self._owner_shard = np.array(
+            [names.index(n) for n in self.owners.values()], dtype=np.int64
+        )
+        self._executor = ThreadPoolExecutor(max_workers=len(self.shards))
+
+    @classmethod
+    def by_region(
+        cls, shard_factory: Callable[..., Any] = Lookup, **kwargs
+    ) -> "ShardedLookup":
+        """Builds one shard per region, see ``REGION_POSTCODES``.
+
+        :param shard_factory: builds a shard, see ``ShardedLookup``
+        :type shard_factory: Callable[..., Any]
+        :return: sharded lookup
+        :rtype: ShardedLookup
+        """
+        return cls(REGION_POSTCODES, shard_factory=shard_factory, **kwargs)
+
+    @classmethod
+    def by_postcode_range(
+        cls,
+        starts: Sequence[int],
+        shard_factory: Callable[..., Any] = Lookup,
+        **kwargs,
+    ) -> "ShardedLookup":
+        """Builds one shard per postcode range, e.g. ``[100, 300, 600]`` gives
+        the shards "100-299", "300-599" and "600-".
+
+        :param starts: first postcode of each range, postcodes below the first
+                       one are in the first range
+        :type starts: Sequence[int]
+        :param shard_factory: builds a shard, see ``ShardedLookup``
+        :type shard_factory: Callable[..., Any]
+        :return: sharded lookup
+        :rtype: ShardedLookup
+        """
+        starts = sorted(starts)
+        names = [f"{a}-{b - 1}" for a, b in zip(starts, starts[1:])]
+        names.append(f"{starts[-1]}-")
+        partitions = {name: [] for name in names}
+        for p in load_vocabulary()["postcode"]:
+            i = max(int(np.searchsorted(starts, int(p), side="right")) - 1, 0)
+            partitions[names[i]].append(p)
+        return cls(partitions, shard_factory=shard_factory, **kwargs)
+
+    def close(self) -> None:
+        """Closes the shards which hold resources, e.g. worker processes."""
+        self._executor.shutdown()
+        for shard in self.shards.values():
+            if hasattr(shard, "close"):
+                shard.close()
+
+    def __enter__(self) -> "ShardedLookup":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def match_tuples(
+        self, index: pd.MultiIndex, region: Optional[str] = None, native: bool = False
+    ) -> Tuple[pd.DataFrame, np.ndarray]:
+        """Matches address tuples on the shards, see ``Lookup.match_tuples``.
+
+        :param index: [municipality, postcode, street_nominative, house_nr] of
+                      each query
+        :type index: pd.MultiIndex
+        :param region: limit partial matches to addresses in this region
+        :type region: Optional[str]
+        :param native: take the geometry in ISN93, built from the native
+                       "x"/"y" coordinates
+        :type native: bool
+        :return: registry row of each query, missing values if not found, and
+                 its status, an index into ``MATCH_STATUSES``
+        :rtype: Tuple[pd.DataFrame, np.ndarray]
+        """
+        if region is not None:
+            # unknown regions raise before querying
+            region_postcodes(region)
+
+        unique = index.unique()
+        codes = unique.get_indexer(index)
+        postcode = unique.get_level_values(1).values
+        names = list(self.shards)
+        idx = self._owner_index.get_indexer(postcode)
+        # rows with a postcode no shard holds can't match
+        owner = np.where(idx >= 0, self._owner_shard[np.maximum(idx, 0)], -1)
+        fan_out = postcode == ""
+
+        rows = [np.flatnonzero((owner == k) | fan_out) for k in range(len(names))]
+        futures = [
+            self._executor.submit(
+                self.shards[name].match_tuples, unique[r], region, native
+            )
+            for name, r in zip(names, rows)
+        ]
+        results = [f.result() for f in futures]
+
+        # fold the shard results, a tuple matched by more than one shard is
+        # ambiguous, as is one which is ambiguous within a shard
+        status = np.full(len(unique), NONE, dtype=np.int8)
+        matches = np.zeros(len(unique), dtype=np.int64)
+        ambiguous = np.zeros(len(unique), dtype=bool)
+        positions = np.full(len(unique), -1, dtype=np.int64)
+        offset = 0
+        for r, (frame, st) in zip(rows, results):
+            hit = (st == EXACT) | (st == PARTIAL)
+            matches[r[hit]] += 1
+            ambiguous[r[st == AMBIGUOUS]] = True
+            status[r] = np.minimum(status[r], st)
+            positions[r[hit]] = offset + np.flatnonzero(hit)
+            offset += len(frame)
+        ambiguous |= matches > 1
+        status[ambiguous] = AMBIGUOUS
+        positions[ambiguous] = -1
+
+        frames = [frame for frame, _ in results]
+        columns = {
+            c: pd.api.extensions.take(
+                _concat_arrays([f[c].array for f in frames]),
+                positions[codes],
+                allow_fill=True,
+            )
+            for c in frames[0].columns
+        }
+        out = pd.DataFrame(columns, index=range(len(index)))
+        if "geometry" in out.columns:
+            out = geopandas.GeoDataFrame(out, geometry="geometry", crs=frames[0].crs)
+        return out, status[codes]
+
+    def _query_frame(
+        self, q: pd.DataFrame, region: Optional[str], crs: Optional[Any]
+    ) -> pd.DataFrame:
+        # ISN93 is taken from the native coordinates, anything else is transformed
+        native = epsg_code(crs) == NATIVE_CRS and (
+            self.columns is None or "x" in self.columns
+        )
+        out, _ = self.match_tuples(q.index, region, native=native)
+        if crs is not None and not native and "geometry" in out.columns:
+            if epsg_code(crs) != CRS:
+                out = out.to_crs(crs)
+        return _add_query_columns(out, q)
+
+    def query(
+        self,
+        text: Union[str, List[str], np.ndarray],
+        region: Optional[str] = None,
+        crs: Optional[Any] = None,
+    ) -> geopandas.GeoDataFrame:
+        """Given text input, returns a dataframe with matching addresses, see
+        ``Lookup.query``. Centroid and house number fallbacks and result
+        caches aren't supported.
+
+        :param text: string containing a single address or an iterator
+                     containing multiple addresses.
+        :type text: Union[str, List[str], np.ndarray]
+        :param region: limit partial matches to addresses in this region
+        :type region: Optional[str]
+        :param crs: crs of the result geometry, defaults to the registry's
+        :type crs: Optional[Any]
+        :return: Data frame containg addresses
+        :rtype: geopandas.GeoDataFrame
+        """
+        return self._query_frame(self._text_frame(text), region, crs)
+
+    def query_dataframe(
+        self,
+        q: pd.DataFrame,
+        region: Optional[str] = None,
+        crs: Optional[Any] = None,
+    ) -> pd.DataFrame:
+        """Queries a data frame containing structured data, see
+        ``Lookup.query_dataframe``. Centroid and house number fallbacks and
+        result caches aren't supported.
+
+        :param q: query dataframe
+        :type q: pd.DataFrame
+        :param region: limit partial matches to addresses in this region
+        :type region: Optional[str]
+        :param crs: crs of the result geometry, defaults to the registry's
+        :type crs: Optional[Any]
+        :return: query dataframe with additional address columns
+        :rtype: pd.DataFrame
+        """
+        return self._query_frame(self._structured_frame(q), region, crs)
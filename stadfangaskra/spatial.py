@@ -0,0 +1,240 @@
+from typing import Any, Optional, Tuple
+
+import geopandas
+import numpy as np
+import pandas as pd
+
+# mean earth radius in meters
+EARTH_RADIUS = 6371008.8
+METERS_PER_DEGREE = EARTH_RADIUS * np.pi / 180
+
+
+def epsg_code(crs: Any) -> Optional[int]:
+    """EPSG code of a crs given as a code, an "EPSG:<code>" string or a
+    pyproj CRS.
+
+    :param crs: crs
+    :type crs: Any
+    :return: EPSG code, None if the crs has none
+    :rtype: Optional[int]
+    """
+    if hasattr(crs, "to_epsg"):
+        return crs.to_epsg()
+    code = str(crs).upper()
+    if code.startswith("EPSG:"):
+        code = code[5:]
+    return int(code) if code.isdigit() else None
+
+
+def take_points(
+    positions: np.ndarray, x: np.ndarray, y: np.ndarray, crs: Any
+) -> pd.api.extensions.ExtensionArray:
+    """Points of the rows at ``positions``.
+
+    :param positions: row positions, -1 gives a missing point
+    :type positions: np.ndarray
+    :param x: x coordinate of each row
+    :type x: np.ndarray
+    :param y: y coordinate of each row
+    :type y: np.ndarray
+    :param crs: crs of the coordinates
+    :type crs: Any
+    :return: geometry array
+    :rtype: pd.api.extensions.ExtensionArray
+    """
+    found = positions >= 0
+    geometry = np.full(len(positions), None, dtype=object)
+    geometry[found] = np.asarray(
+        geopandas.points_from_xy(x[positions[found]], y[positions[found]]),
+        dtype=object,
+    )
+    return geopandas.array.from_shapely(geometry, crs=crs)
+
+
+def haversine(
+    lon1: np.ndarray, lat1: np.ndarray, lon2: np.ndarray, lat2: np.ndarray
+) -> np.ndarray:
+    """Great circle distance in meters between points given in degrees.
+
+    :param lon1: longitude of the first points
+    :type lon1: np.ndarray
+    :param lat1: latitude of the first points
+    :type lat1: np.ndarray
+    :param lon2: longitude of the second points
+    :type lon2: np.ndarray
+    :param lat2: latitude of the second points
+    :type lat2: np.ndarray
+    :return: distances in meters
+    :rtype: np.ndarray
+    """
+    lon1, lat1, lon2, lat2 = map(np.radians, (lon1, lat1, lon2, lat2))
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def _expand_ranges(
+    starts: np.ndarray, stops: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Expands [start, stop) ranges into the positions they cover.
+
+    :param starts: range starts
+    :type starts: np.ndarray
+    :param stops: range stops, exclusive
+    :type stops: np.ndarray
+    :return: index of the range each position belongs to, and the positions
+    :rtype: Tuple[np.ndarray, np.ndarray]
+    """
+    lengths = np.maximum(stops - starts, 0)
+    owners = np.repeat(np.arange(len(starts)), lengths)
+    offsets = np.cumsum(lengths) - lengths
+    positions = np.arange(lengths.sum()) + np.repeat(starts - offsets, lengths)
+    return owners, positions
+
+
+class GridIndex:
+    """
+    Packed grid index over point coordinates.
+
+    How it works:
+    - Points are bucketed into cells of ``cell_size`` degrees and sorted by
+      cell key, row by row, so the points of a row of cells are contiguous.
+    - A query window is translated to one key range per row of cells which is
+      found with a binary search, the candidates are then filtered exactly.
+    """
+
+    cell_size: float
+    x0: float
+    y0: float
+    ncols: int
+    nrows: int
+    order: np.ndarray
+    keys: np.ndarray
+    lon: np.ndarray
+    lat: np.ndarray
+
+    def __init__(
+        self, lon: np.ndarray, lat: np.ndarray, cell_size: float = 0.01
+    ) -> "GridIndex":
+        """
+        :param lon: point longitudes
+        :type lon: np.ndarray
+        :param lat: point latitudes
+        :type lat: np.ndarray
+        :param cell_size: cell size in degrees, defaults to 0.01
+        :type cell_size: float
+        """
+        lon = np.asarray(lon, dtype=np.float64)
+        lat = np.asarray(lat, dtype=np.float64)
+        self.cell_size = cell_size
+        self.x0 = float(lon.min()) if len(lon) else 0.0
+        self.y0 = float(lat.min()) if len(lat) else 0.0
+        cx = self._cells(lon, self.x0)
+        cy = self._cells(lat, self.y0)
+        self.ncols = int(cx.max()) + 1 if len(cx) else 1
+        self.nrows = int(cy.max()) + 1 if len(cy) else 1
+
+        keys = cy * self.ncols + cx
+        self.order = np.argsort(keys, kind="stable")
+        self.keys = keys[self.order]
+        self.lon = lon[self.order]
+        self.lat = lat[self.order]
+
+    def _cells(self, v: np.ndarray, origin: float) -> np.ndarray:
+        return np.floor((np.asarray(v) - origin) / self.cell_size).astype(np.int64)
+
+    def _candidates(
+        self, minx: np.ndarray, miny: np.ndarray, maxx: np.ndarray, maxy: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the points in the cells overlapping each window.
+
+        :return: window index and sorted position of each candidate
+        :rtype: Tuple[np.ndarray, np.ndarray]
+        """
+        cx0 = np.clip(self._cells(minx, self.x0), 0, self.ncols - 1)
+        cx1 = np.clip(self._cells(maxx, self.x0), 0, self.ncols - 1)
+        cy0 = np.clip(self._cells(miny, self.y0), 0, self.nrows - 1)
+        cy1 = np.clip(self._cells(maxy, self.y0), 0, self.nrows - 1)
+
+        # one key range per window and row of cells
+        window, offset = _expand_ranges(np.zeros_like(cy0), cy1 - cy0 + 1)
+        row = cy0[window] + offset
+        lo = np.searchsorted(self.keys, row * self.ncols + cx0[window], side="left")
+        hi = np.searchsorted(self.keys, row * self.ncols + cx1[window], side="right")
+
+        owner, positions = _expand_ranges(lo, hi)
+        return window[owner], positions
+
+    def within_bbox(
+        self, minx: np.ndarray, miny: np.ndarray, maxx: np.ndarray, maxy: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Finds the points inside each bounding box, edges included.
+
+        :param minx: minimum longitude of each box
+        :type minx: np.ndarray
+        :param miny: minimum latitude of each box
+        :type miny: np.ndarray
+        :param maxx: maximum longitude of each box
+        :type maxx: np.ndarray
+        :param maxy: maximum latitude of each box
+        :type maxy: np.ndarray
+        :return: box index and point position of each match, ordered by box
+                 and point position
+        :rtype: Tuple[np.ndarray, np.ndarray]
+        """
+        minx, miny, maxx, maxy = (
+            np.atleast_1d(np.asarray(v, dtype=np.float64))
+            for v in (minx, miny, maxx, maxy)
+        )
+        window, positions = self._candidates(minx, miny, maxx, maxy)
+        lon = self.lon[positions]
+        lat = self.lat[positions]
+        mask = (
+            (lon >= minx[window])
+            & (lon <= maxx[window])
+            & (lat >= miny[window])
+            & (lat <= maxy[window])
+        )
+        window = window[mask]
+        points = self.order[positions[mask]]
+        sort = np.lexsort((points, window))
+        return window[sort], points[sort]
+
+    def within_radius(
+        self, lon: np.ndarray, lat: np.ndarray, meters: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Finds the points within a distance of each center.
+
+        :param lon: longitude of each center
+        :type lon: np.ndarray
+        :param lat: latitude of each center
+        :type lat: np.ndarray
+        :param meters: radius in meters, for each center or a single value
+        :type meters: np.ndarray
+        :return: center index, point position and distance in meters of each
+                 match, ordered by center and distance
+        :rtype: Tuple[np.ndarray, np.ndarray, np.ndarray]
+        """
+        lon = np.atleast_1d(np.asarray(lon, dtype=np.float64))
+        lat = np.atleast_1d(np.asarray(lat, dtype=np.float64))
+        meters = np.broadcast_to(np.asarray(meters, dtype=np.float64), lon.shape)
+
+        dlat = meters / METERS_PER_DEGREE
+        # widen the longitude window at the edge of the box closest to the pole
+        max_lat = np.minimum(np.abs(lat) + dlat, 89.0)
+        dlon = dlat / np.cos(np.radians(max_lat))
+
+        window, positions = self._candidates(
+            lon - dlon, lat - dlat, lon + dlon, lat + dlat
+        )
+        distance = haversine(
+            lon[window], lat[window], self.lon[positions], self.lat[positions]
+        )
+        mask = distance <= meters[window]
+        window = window[mask]
+        distance = distance[mask]
+        points = self.order[positions[mask]]
+        sort = np.lexsort((points, distance, window))
+        return window[sort], points[sort], distance[sort]
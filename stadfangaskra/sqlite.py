@@ -0,0 +1,506 @@
+"""Registry stored in an indexed SQLite file.
+
+``write_sqlite`` exports the registry and the lookups derived from it,
+``SqliteLookup`` answers queries from the file without loading the registry.
+"""
+
+import os
+import pathlib
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import geopandas
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .areas import ServiceAreaIndex
+from .base import BaseLookup
+from .centroids import CentroidIndex
+from .housenr import HouseNumberIndex
+from .keys import AMBIGUOUS, EXACT, NONE, PARTIAL
+from .landmarks import LANDMARK_COLS, LandmarkIndex
+from .spatial import take_points
+from .static import (
+    CRS,
+    INDEX_COLS,
+    NATIVE_CRS,
+    data_file,
+    data_path,
+    load_centroids,
+    load_service_areas,
+    load_special_names,
+    region_postcodes,
+    registry_frame,
+    registry_read_columns,
+    registry_version,
+    tables_version,
+)
+from .tree import MATCHING_VERSION, _digest
+
+# version of the file layout, stored in the "metadata" table
+SQLITE_VERSION = 3
+
+# indexes over the columns given in partial queries, the unique address key
+# covers queries which give the municipality
+_INDEXES = [
+    "CREATE UNIQUE INDEX addresses_key ON addresses "
+    "(municipality, postcode, street_nominative, house_nr)",
+    "CREATE INDEX addresses_street ON addresses (street_nominative, house_nr)",
+    "CREATE INDEX addresses_postcode ON addresses (postcode, street_nominative)",
+]
+
+_QUERY_SCHEMA = [
+    "CREATE TEMP TABLE query_tuples (i INTEGER PRIMARY KEY, "
+    "municipality TEXT, postcode TEXT, street_nominative TEXT, house_nr TEXT)",
+    "CREATE TEMP TABLE positions (position INTEGER PRIMARY KEY)",
+]
+
+_EXACT_MATCH = (
+    "SELECT q.i, a.position FROM query_tuples q JOIN addresses a "
+    "ON a.municipality = q.municipality AND a.postcode = q.postcode "
+    "AND a.street_nominative = q.street_nominative AND a.house_nr = q.house_nr"
+)
+
+
+def _sql_type(t: pa.DataType) -> str:
+    if pa.types.is_dictionary(t):
+        t = t.value_type
+    if pa.types.is_integer(t):
+        return "INTEGER"
+    if pa.types.is_floating(t):
+        return "REAL"
+    if pa.types.is_binary(t) or pa.types.is_large_binary(t):
+        return "BLOB"
+    return "TEXT"
+
+
+def _arrow_type(sql_type: str) -> pa.DataType:
+    return {"INTEGER": pa.int64(), "REAL": pa.float64(), "BLOB": pa.binary()}.get(
+        sql_type, pa.string()
+    )
+
+
+def _write_table(
+    conn: sqlite3.Connection,
+    name: str,
+    df: pd.DataFrame,
+    primary_key: Optional[str] = None,
+) -> None:
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    columns = [
+        f'"{f.name}" {_sql_type(f.type)}'
+        + (" PRIMARY KEY" if f.name == primary_key else "")
+        for f in table.schema
+    ]
+    conn.execute(f'CREATE TABLE "{name}" ({", ".join(columns)})')
+    conn.executemany(
+        f'INSERT INTO "{name}" VALUES ({", ".join("?" * table.num_columns)})',
+        zip(*[c.to_pylist() for c in table.columns]),
+    )
+
+
+def write_sqlite(
+    path: str,
+    registry: pd.DataFrame,
+    street_postcodes: pd.DataFrame,
+    street_dative: pd.DataFrame,
+    centroids: pd.DataFrame,
+    special_names: pd.DataFrame,
+    service_areas: pd.DataFrame,
+    version: str,
+    table_version: Optional[str] = None,
+) -> None:
+    """Writes the registry and its derived lookups to a SQLite file, to be
+    queried with ``SqliteLookup``. An existing file is replaced.
+
+    :param path: SQLite file
+    :type path: str
+    :param registry: registry data frame with the index columns and the
+                     coordinates in "lat"/"lon" columns
+    :type registry: pd.DataFrame
+    :param street_postcodes: (municipality, street) => postcode table
+    :type street_postcodes: pd.DataFrame
+    :param street_dative: dative => nominative street name table
+    :type street_dative: pd.DataFrame
+    :param centroids: street, postcode and municipality centroid table
+    :type centroids: pd.DataFrame
+    :param special_names: special name table, see ``LandmarkIndex``
+    :type special_names: pd.DataFrame
+    :param service_areas: postcode and municipality service area table
+    :type service_areas: pd.DataFrame
+    :param version: registry version, see ``registry_version``
+    :type version: str
+    :param table_version: version of the lookup tables, see ``tables_version``.
+                          Defaults to the registry version.
+    :type table_version: Optional[str]
+    """
+    path = str(path)
+    if os.path.exists(path):
+        os.remove(path)
+    registry = registry.reset_index(drop=True)
+    vocabulary = pd.concat(
+        [
+            pd.DataFrame({"level": c, "value": pd.unique(registry[c].astype(str))})
+            for c in INDEX_COLS
+        ]
+    )
+    metadata = pd.DataFrame(
+        {
+            "key": ["version", "registry_version", "tables_version"],
+            "value": [str(SQLITE_VERSION), version, table_version or version],
+        }
+    )
+    conn = sqlite3.connect(path)
+    try:
+        with conn:
+            _write_table(
+                conn,
+                "addresses",
+                registry.assign(position=np.arange(len(registry)))[
+                    ["position"] + list(registry.columns)
+                ],
+                primary_key="position",
+            )
+            for statement in _INDEXES:
+                conn.execute(statement)
+            _write_table(conn, "vocabulary", vocabulary)
+            _write_table(conn, "street_postcodes", street_postcodes)
+            _write_table(conn, "street_dative", street_dative)
+            _write_table(conn, "centroids", centroids)
+            _write_table(conn, "special_names", special_names[LANDMARK_COLS])
+            _write_table(conn, "service_areas", service_areas)
+            _write_table(conn, "metadata", metadata, primary_key="key")
+        conn.execute("ANALYZE")
+    finally:
+        conn.close()
+
+
+def export_sqlite(path: str) -> None:
+    """Exports the bundled registry to a SQLite file, see ``write_sqlite``.
+
+    :param path: SQLite file
+    :type path: str
+    """
+    write_sqlite(
+        path,
+        pq.read_table(data_path).to_pandas(),
+        pq.read_table(data_file("street_postcodes.parquet")).to_pandas(),
+        pq.read_table(data_file("street_dative.parquet")).to_pandas(),
+        load_centroids(),
+        load_special_names(),
+        load_service_areas(),
+        registry_version(),
+        tables_version(),
+    )
+
+
+class SqliteLookup(BaseLookup):
+    """
+    Lookup over a registry exported with ``write_sqlite``. Only the parser's
+    vocabulary is loaded, addresses are read from the file as they're matched.
+
+    How it works:
+    - The distinct address tuples of the queries are written to a temporary
+      table and matched exactly with a join on the unique address index.
+    - Tuples which weren't matched are matched partially, grouped by which of
+      their values are given, each group is a join on an index over those
+      values. A partial match is accepted if it's unique.
+    - Only the rows of the matched addresses are read.
+
+    Results are the same as from a ``Lookup`` over the same registry. A lookup
+    can be shared between threads, queries are serialized on its connection.
+    """
+
+    path: str
+    columns: Optional[List[str]]
+    _conn: sqlite3.Connection
+    _lock: threading.Lock
+    _read_columns: List[str]
+    _types: Dict[str, pa.DataType]
+    _municipality_codes: Optional[pd.api.extensions.ExtensionArray] = None
+    _centroid_index: Optional[CentroidIndex] = None
+    _service_area_index: Optional[ServiceAreaIndex] = None
+
+    def __init__(
+        self, path: str, columns: Optional[List[str]] = None
+    ) -> "SqliteLookup":
+        """
+        :param path: SQLite file written by ``write_sqlite``
+        :type path: str
+        :param columns: registry columns to return in results, the index
+                        columns are always returned. Defaults to all columns.
+        :type columns: Optional[List[str]]
+        :raises ValueError: if the file isn't of a supported version or a
+                            column isn't in it
+        """
+        self.path = str(path)
+        self.columns = columns
+        self._lock = threading.Lock()
+        uri = pathlib.Path(self.path).resolve().as_uri() + "?mode=ro"
+        self._conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+
+        metadata = dict(self._conn.execute("SELECT key, value FROM metadata"))
+        if metadata["version"] != str(SQLITE_VERSION):
+            raise ValueError(f"Unsupported file version: {metadata['version']}")
+        self.registry_version = metadata["registry_version"]
+        self.version = _digest(
+            MATCHING_VERSION,
+            self.registry_version,
+            metadata.get("tables_version"),
+            "sqlite",
+            sorted(columns) if columns is not None else None,
+        )
+
+        stored = {
+            name: _arrow_type(sql_type)
+            for _, name, sql_type, *_ in self._conn.execute(
+                "PRAGMA table_info(addresses)"
+            )
+            if name != "position"
+        }
+        read_columns = registry_read_columns(columns) or list(stored)
+        unknown = [c for c in read_columns if c not in stored]
+        if unknown:
+            raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+        self._read_columns = read_columns
+        self._types = {c: stored[c] for c in read_columns}
+        if "municipality_code" in read_columns:
+            # categories of the column, as in a ``Lookup`` over the registry
+            self._municipality_codes = pd.array(
+                [
+                    code
+                    for code, in self._conn.execute(
+                        "SELECT DISTINCT municipality_code FROM addresses "
+                        "WHERE municipality_code IS NOT NULL ORDER BY 1"
+                    )
+                ],
+                dtype=pd.Int32Dtype(),
+            )
+
+        vocabulary = {c: [] for c in INDEX_COLS}
+        for level, value in self._conn.execute(
+            "SELECT level, value FROM vocabulary ORDER BY level, value"
+        ):
+            vocabulary[level].append(value)
+        self.municipalities = pd.Index(vocabulary["municipality"], dtype=object)
+        self.postcodes = pd.Index(vocabulary["postcode"], dtype=object)
+        self.streets = pd.Index(vocabulary["street_nominative"], dtype=object)
+        self.house_nrs = pd.Index(vocabulary["house_nr"], dtype=object)
+        self.town_street_to_postcode = {
+            (m, s): p
+            for m, s, p in self._conn.execute(
+                "SELECT municipality, street, postcode FROM street_postcodes"
+            )
+        }
+        self.street_dative = dict(
+            self._conn.execute(
+                "SELECT street_dative, street_nominative FROM street_dative"
+            )
+        )
+        self.landmarks = LandmarkIndex(
+            pd.read_sql_query("SELECT * FROM special_names", self._conn)
+        )
+        for statement in _QUERY_SCHEMA:
+            self._conn.execute(statement)
+
+    def __reduce__(self):
+        return (self.__class__, (self.path, self.columns))
+
+    def close(self) -> None:
+        """Closes the database connection."""
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self) -> "SqliteLookup":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    @property
+    def centroid_index(self) -> CentroidIndex:
+        """Street, postcode and municipality centroids, loaded on first use.
+
+        :return: centroid index
+        :rtype: CentroidIndex
+        """
+        with self._lock:
+            if self._centroid_index is None:
+                self._centroid_index = CentroidIndex(
+                    pd.read_sql_query("SELECT * FROM centroids", self._conn)
+                )
+        return self._centroid_index
+
+    @property
+    def service_area_index(self) -> ServiceAreaIndex:
+        """Postcode and municipality service areas, built on first use.
+
+        :return: service area index
+        :rtype: ServiceAreaIndex
+        """
+        with self._lock:
+            if self._service_area_index is None:
+                self._service_area_index = ServiceAreaIndex(
+                    pd.read_sql_query("SELECT * FROM service_areas", self._conn)
+                )
+        return self._service_area_index
+
+    def _street_house_nrs(
+        self, streets: np.ndarray
+    ) -> Tuple[HouseNumberIndex, Optional[np.ndarray]]:
+        # only the addresses of the queried streets are read, on the index
+        # over street names
+        streets = pd.unique(np.asarray(streets, dtype=object))
+        with self._lock, self._conn:
+            self._insert_tuples(
+                np.arange(len(streets)),
+                [np.full(len(streets), "", dtype=object)] * 2
+                + [streets, np.full(len(streets), "", dtype=object)],
+            )
+            table = pd.read_sql_query(
+                "SELECT position, postcode, street_nominative, house_nr, "
+                "lon, lat, x, y FROM addresses WHERE street_nominative IN "
+                "(SELECT street_nominative FROM query_tuples)",
+                self._conn,
+            )
+        index = HouseNumberIndex(*[table[c].values for c in table.columns[1:]])
+        return index, table["position"].values.astype(np.int64)
+
+    def _match_index(
+        self, index: pd.MultiIndex, region: Optional[str]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        # resolve the region first, unknown regions raise before querying
+        postcodes = region_postcodes(region) if region is not None else None
+
+        unique = index.unique()
+        codes = unique.get_indexer(index)
+        values = [
+            np.asarray(unique.get_level_values(i), dtype=object) for i in range(4)
+        ]
+        positions = np.full(len(unique), -1, dtype=np.int64)
+        status = np.full(len(unique), NONE, dtype=np.int8)
+        given = np.stack([v != "" for v in values])
+        # the values given in each tuple, bit i for level i
+        pattern = (given * (1 << np.arange(4))[:, None]).sum(axis=0)
+
+        with self._lock, self._conn:
+            self._insert_tuples(np.arange(len(unique)), values)
+            rows = self._conn.execute(_EXACT_MATCH).fetchall()
+            if rows:
+                i, position = np.array(rows, dtype=np.int64).T
+                positions[i] = position
+                status[i] = EXACT
+
+            # as in ``Lookup``, a partial query gives part of the key and has
+            # no exact match
+            partial = (positions < 0) & given[:3].any(axis=0) & ~given.all(axis=0)
+            if not partial.any():
+                return positions[codes], status[codes]
+            candidates = np.flatnonzero(partial)
+            self._insert_tuples(candidates, [v[candidates] for v in values])
+
+            region_filter = ""
+            params: List[Any] = []
+            if postcodes is not None:
+                # a partial match is only accepted if it's unique within the region
+                region_filter = (
+                    f" AND a.postcode IN ({', '.join('?' * len(postcodes))})"
+                )
+                params = list(postcodes)
+            for p in np.unique(pattern[candidates]).tolist():
+                on = " AND ".join(
+                    f"a.{c} = q.{c}" for k, c in enumerate(INDEX_COLS) if p >> k & 1
+                )
+                tuples = candidates[pattern[candidates] == p]
+                rows = self._conn.execute(
+                    "SELECT q.i, MIN(a.position), COUNT(*) FROM query_tuples q "
+                    f"JOIN addresses a ON {on}{region_filter} "
+                    f"WHERE q.i IN ({', '.join(map(str, tuples.tolist()))}) "
+                    "GROUP BY q.i",
+                    params,
+                ).fetchall()
+                if rows:
+                    i, position, count = np.array(rows, dtype=np.int64).T
+                    unique_match = count == 1
+                    positions[i[unique_match]] = position[unique_match]
+                    status[i] = np.where(unique_match, PARTIAL, AMBIGUOUS)
+
+        return positions[codes], status[codes]
+
+    def _insert_tuples(self, i: np.ndarray, values: Sequence[np.ndarray]) -> None:
+        # called with the lock held
+        self._conn.execute("DELETE FROM query_tuples")
+        self._conn.executemany(
+            "INSERT INTO query_tuples VALUES (?, ?, ?, ?, ?)",
+            zip(i.tolist(), *[v.tolist() for v in values]),
+        )
+
+    def _fetch(
+        self, positions: np.ndarray, columns: List[str]
+    ) -> Tuple[np.ndarray, pa.Table]:
+        """Reads registry rows.
+
+        :param positions: registry positions, -1 for missing rows
+        :type positions: np.ndarray
+        :param columns: columns to read
+        :type columns: List[str]
+        :return: index of each position in the rows read, -1 if missing, and
+                 the rows read
+        :rtype: Tuple[np.ndarray, pa.Table]
+        """
+        found = np.unique(positions[positions >= 0])
+        select = ", ".join(f'a."{c}"' for c in columns)
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM positions")
+            self._conn.executemany(
+                "INSERT INTO positions VALUES (?)", ((p,) for p in found.tolist())
+            )
+            rows = self._conn.execute(
+                f"SELECT {select} FROM positions p JOIN addresses a "
+                "ON a.position = p.position ORDER BY p.position"
+            ).fetchall()
+        values = list(zip(*rows)) or [[] for _ in columns]
+        table = pa.Table.from_arrays(
+            [pa.array(v, type=self._types[c]) for c, v in zip(columns, values)],
+            names=columns,
+        )
+        idx = np.where(positions >= 0, np.searchsorted(found, positions), -1)
+        return idx, table
+
+    def _take(self, positions: np.ndarray, native: bool = False) -> pd.DataFrame:
+        idx, table = self._fetch(positions, self._read_columns)
+        frame = registry_frame(table)
+        if self._municipality_codes is not None:
+            frame["municipality_code"] = frame["municipality_code"].cat.set_categories(
+                self._municipality_codes
+            )
+        out = pd.DataFrame(
+            {
+                c: pd.api.extensions.take(frame[c].array, idx, allow_fill=True)
+                for c in frame.columns
+                if c != "geometry"
+            }
+        )
+        if "geometry" in frame.columns:
+            if native:
+                out["geometry"] = take_points(
+                    idx, frame["x"].values, frame["y"].values, NATIVE_CRS
+                )
+            else:
+                out["geometry"] = pd.api.extensions.take(
+                    frame.geometry.values, idx, allow_fill=True
+                )
+            out = geopandas.GeoDataFrame(
+                out, geometry="geometry", crs=NATIVE_CRS if native else CRS
+            )
+        return out
+
+    def _has_column(self, name: str) -> bool:
+        return name in self._read_columns
+
+    def _take_column(self, name: str, positions: np.ndarray) -> np.ndarray:
+        idx, table = self._fetch(positions, [name])
+        return np.asarray(table[name].to_pylist(), dtype=object)[idx]
@@ -1,10 +1,19 @@
 # pylint: disable=line-too-long
+import functools
+import hashlib
+import json
 import re
-from typing import Dict, List
+from typing import Dict, Iterable, List, Optional, Tuple, Union
 
 import geopandas
 import pandas as pd
 import pkg_resources
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from .arrow import decode_dictionaries
+from .cells import CELL_COLS
 
 RE_STREET_ENDING = re.compile(
     r"(((hjálei|brin)g|bryggj|kirkj|s(kemm|eyl|tof|íð)|le(ir|ys))[au]|afréttu[mr]|(h(jallu|am(ra|a)|e(iða|lli)|ólmu|óla)|fjörðu|t(jarn|rað)i|(sveig|naut|teig|dal|læk)u|b(org|rún)i|(heim|krók)a|garð[au]|s(kóga|and[au]|tað[iu])|lauga|(graf|flat|sal)i|eyra|mela|aku|kó)r|(brunn|hvamm|stekk|[bk]lett|kamb|lund|reit|núp)(ur|i)|(dran|stí)g(ur|i)|(s((kerj|töp)u|kálu|ö(nd|l)u)|b(org|rún)u|h(eið|ól)u|(bö(kk|l)|g(röf|örð)|hömr)u|laugu|eyru|endu|kofu)m|(f(jöll|löt)|stöð|fold|lönd)um|tjörnum|(brekk|tung)(u[mr]?|a)|h(e(ll(um|a)|iði)|vilft|jall[ai]|amri|úsið|ólm[ai]|óll|öfn)|s(t(einn|api)|k((er|ál)i|ógi)|andi)|(strö|gru)nd|(hverf|stræ[tð]|(ger|s[tv]æ)ð|firð|eng|bæl|mýr|akr)i|((ba(kk|l)|mó)a|s(kál|tap)a|e(yj|nd)a|kofa)r|(grand|geisl|h(öfð|ag)|k(rik|im)|s(kól|már)|tang|múl|fló|rim)[ai]|((heim|krók)u|skógu|melu)[mr]|v(ellir|(an|o)g(ur|i)|ö(tnum|llu[mr]|r)|iður|eg(ur|i)|it[ai]|ík)|(h(úsin|löð)|göt)u|(h(varf|o(lt|f))|s(karð|el)|f(j(all|ós)|ell|oss)|(h(rau|or)|ló|tú)n|(bar|hli)ð|(hál|ne)s|sund|land|torg|vatn|ból|kot|gil)i|b(ja|e)rgi|h(ellu|úsi?|ól)|s(t(ein|að)|k(er|ál))|(ba(kk|l)|mó)a|s(kál|tap)a|sveig|f(jöll|löt)|tjörn|v(elli|ötn|ið)|h(varf|o(lt|f))|s(karð|el)|f(j(all|ós)|ell|oss)|(h(rau|or)|ló|tú)n|b(ja|e)rg|eyris|b(jörg|aki|ær|ót)|braut|(heim|krók)i|garði|(ba(kk|l)|mó)i|(hlað|gat|ald)a|fj(ara|öru)|l(ei(ti|ð)|aut|ind)|(b(rei|ygg|ú)|h(lí|æ)|s[lt]ó)ð|t(orf[au]|r(aða|öð))|jekdu|þ(ingi?|úf(u[mr]?|a))|ey(ri)?|b(org|rún?|ak|æ)|laug|e(yj|nd)a|kofa|naut|teig|stöð|fold|lönd|(bar|hli)ð|(hál|ne)s|sund|land|torg|vatn|endi|k(ofi|inn|lif)|mörk|öldu|mel|dal|læk|ból|kot|gil|ás)$"
@@ -212,47 +221,306 @@ POSTCODE_MUNICIPALITY_LOOKUP: Dict[int, str] = {
 }
 
 
-ADMINISTRATIVE_DIVISIONS: Dict[str, List[str]] = {
-    "Seltjarnarnesbær": ["Seltjarnarnes"],
-    "Ísafjarðarbær": ["Ísafjörður"],
-}
+INDEX_COLS = ["municipality", "postcode", "street_nominative", "house_nr"]
 
-data_path = pkg_resources.resource_filename("stadfangaskra.data", "df.parquet.gzip")
+# crs of the registry geometry, WGS84, and of its native "x"/"y" coordinates, ISN93
+CRS = 4326
+NATIVE_CRS = 3057
 
-_df = pd.read_parquet(data_path)
 
-df = _df = geopandas.GeoDataFrame(
-    _df, geometry=geopandas.points_from_xy(_df.lon, _df.lat), crs=4326
-)
-df = df.drop(["lat", "lon"], axis=1)
+def data_file(name: str) -> str:
+    return pkg_resources.resource_filename("stadfangaskra.data", name)
 
-for c in ["municipality_code"]:
-    df[c] = pd.Categorical(df[c].astype(pd.Int32Dtype()))
 
+data_path = data_file("df.parquet.gzip")
 
-regions = pd.read_parquet(
-    pkg_resources.resource_filename("stadfangaskra.data", "regions.parquet")
-)
+regions = pd.read_parquet(data_file("regions.parquet"))
 
-REGION_MAP = {
-    k: list(v)
-    for (k, v) in regions.groupby("region")["municipality"].unique().to_dict().items()
-}
 
-ADMINISTRATIVE_DIVISIONS = {
-    k: list(v)
-    for (k, v) in regions.groupby("municipality")["name"].unique().to_dict().items()
-}
-del_keys = []
-for k, v in ADMINISTRATIVE_DIVISIONS.items():
-    if len(v) == 1 and k == v[0]:
-        del_keys.append(k)
-for k in del_keys:
-    del ADMINISTRATIVE_DIVISIONS[k]
-ADMINISTRATIVE_DIVISIONS.update(
-    {
-        "Seltjarnarnesbær": ["Seltjarnarnes"],
-        "Ísafjarðarbær": ["Ísafjörður"],
-        "Garðabær": ["Garðabær", "Garðabær (Álftanes)"],
+def _load_divisions() -> Dict[str, Dict[str, List[str]]]:
+    with open(data_file("divisions.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+_divisions = _load_divisions()
+
+REGION_MAP: Dict[str, List[str]] = _divisions["regions"]
+REGION_POSTCODES: Dict[str, List[str]] = _divisions["region_postcodes"]
+ADMINISTRATIVE_DIVISIONS: Dict[str, List[str]] = _divisions["administrative_divisions"]
+
+
+def file_digest(path: str) -> str:
+    """SHA-256 digest of a file.
+
+    :param path: file path
+    :type path: str
+    :return: hex digest
+    :rtype: str
+    """
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+@functools.lru_cache(maxsize=None)
+def registry_version() -> str:
+    """SHA-256 digest of the registry file, changes with every registry release.
+
+    :return: hex digest
+    :rtype: str
+    """
+    return file_digest(data_path)
+
+
+# lookup tables built by ``preprocess`` which the results of a query depend on
+TABLE_FILES = [
+    "centroids.parquet",
+    "street_postcodes.parquet",
+    "street_dative.parquet",
+    "special_names.parquet",
+]
+
+
+@functools.lru_cache(maxsize=None)
+def tables_version() -> str:
+    """SHA-256 digest of the lookup tables in ``TABLE_FILES``, changes when
+    any of them is rebuilt.
+
+    :return: hex digest
+    :rtype: str
+    """
+    h = hashlib.sha256()
+    for name in TABLE_FILES:
+        h.update(file_digest(data_file(name)).encode())
+    return h.hexdigest()
+
+
+def region_postcodes(region: str) -> List[str]:
+    """Returns the postcodes of a region.
+
+    :param region: region name, one of the keys of ``REGION_POSTCODES``
+    :type region: str
+    :raises ValueError: if the region is unknown
+    :return: postcodes in the region
+    :rtype: List[str]
+    """
+    if region not in REGION_POSTCODES:
+        raise ValueError(f"Unknown region: {region}")
+    return REGION_POSTCODES[region]
+
+
+def registry_filters(
+    postcodes: Optional[Iterable[Union[int, str]]] = None,
+    municipalities: Optional[Iterable[str]] = None,
+    region: Optional[str] = None,
+) -> Optional[List[Tuple[str, str, List[str]]]]:
+    """Builds pyarrow filters for loading a subset of the registry.
+
+    :param postcodes: postcodes to load
+    :type postcodes: Optional[Iterable[Union[int, str]]]
+    :param municipalities: municipalities to load
+    :type municipalities: Optional[Iterable[str]]
+    :param region: region to load, one of the keys of ``REGION_POSTCODES``
+    :type region: Optional[str]
+    :return: filters, None if the whole registry should be loaded
+    :rtype: Optional[List[Tuple[str, str, List[str]]]]
+    """
+    filters = []
+    if postcodes is not None:
+        filters.append(("postcode", "in", [str(p) for p in postcodes]))
+    if municipalities is not None:
+        filters.append(("municipality", "in", list(municipalities)))
+    if region is not None:
+        filters.append(("postcode", "in", region_postcodes(region)))
+    return filters or None
+
+
+def registry_read_columns(columns: Optional[List[str]]) -> Optional[List[str]]:
+    """Stored registry columns to read to return ``columns``, the index
+    columns are always read and "geometry" is read from the coordinates.
+
+    :param columns: columns to return, None for all columns
+    :type columns: Optional[List[str]]
+    :return: columns to read, None for all columns
+    :rtype: Optional[List[str]]
+    """
+    if columns is None:
+        return None
+    read_columns = INDEX_COLS + [c for c in columns if c not in INDEX_COLS]
+    if "geometry" in read_columns:
+        read_columns.remove("geometry")
+        read_columns.extend(["lat", "lon", "x", "y"])
+    return read_columns
+
+
+def load_registry(
+    columns: Optional[List[str]] = None,
+    postcodes: Optional[Iterable[Union[int, str]]] = None,
+    municipalities: Optional[Iterable[str]] = None,
+    region: Optional[str] = None,
+    compact: bool = False,
+) -> geopandas.GeoDataFrame:
+    """Loads the registry, or a subset of it.
+
+    The registry is stored sorted by postcode, so the filters are pushed
+    down to pyarrow which skips row groups that can't match.
+
+    :param columns: columns to load in addition to the index columns,
+                    "geometry" loads the coordinates, WGS84 and the native
+                    ISN93 "x"/"y". Defaults to all columns.
+    :type columns: Optional[List[str]]
+    :param postcodes: only load these postcodes
+    :type postcodes: Optional[Iterable[Union[int, str]]]
+    :param municipalities: only load these municipalities
+    :type municipalities: Optional[Iterable[str]]
+    :param region: only load this region
+    :type region: Optional[str]
+    :param compact: load without per-row Python objects, see ``registry_frame``
+    :type compact: bool
+    :return: registry data frame with a
+             [municipality, postcode, street_nominative, house_nr] index
+    :rtype: geopandas.GeoDataFrame
+    """
+    table = pq.read_table(
+        data_path,
+        columns=registry_read_columns(columns),
+        filters=registry_filters(postcodes, municipalities, region),
+    )
+    return registry_frame(table, compact=compact)
+
+
+def registry_frame(table: pa.Table, compact: bool = False) -> geopandas.GeoDataFrame:
+    """Builds the registry data frame from an Arrow table of registry columns,
+    with coordinates in "lat"/"lon" columns. Dictionary encoded index columns
+    are used for the index as is.
+
+    A compact frame holds no Python object per row, so its memory pages stay
+    shared between forked processes. Strings are Arrow backed and the
+    coordinates are kept as float "lon"/"lat" columns instead of points.
+
+    :param table: registry table
+    :type table: pa.Table
+    :param compact: build a compact frame, defaults to False
+    :type compact: bool
+    :return: registry data frame with a
+             [municipality, postcode, street_nominative, house_nr] index,
+             a plain data frame if compact
+    :rtype: geopandas.GeoDataFrame
+    """
+    if all(pa.types.is_dictionary(table.schema.field(c).type) for c in INDEX_COLS):
+        # the dictionaries and their indices make up the index, no hashing needed
+        table = table.unify_dictionaries()
+        arrays = [table[c].combine_chunks() for c in INDEX_COLS]
+        index = pd.MultiIndex(
+            levels=[a.dictionary.to_pandas() for a in arrays],
+            codes=[a.indices.to_numpy() for a in arrays],
+            names=INDEX_COLS,
+            verify_integrity=False,
+        )
+        out = decode_dictionaries(table).to_pandas()
+        out.index = index
+    else:
+        out = table.to_pandas()
+        out = out.set_index(pd.MultiIndex.from_frame(out[INDEX_COLS]))
+
+    if compact:
+        for c in out.columns:
+            if out[c].dtype == object:
+                out[c] = out[c].astype(pd.StringDtype("pyarrow"))
+        if "lat" in out.columns:
+            # last, where the geometry column is otherwise
+            coordinates = ["lon", "lat"]
+            out = out[[c for c in out.columns if c not in coordinates] + coordinates]
+    elif "lat" in out.columns:
+        out = geopandas.GeoDataFrame(
+            out, geometry=geopandas.points_from_xy(out.lon, out.lat), crs=CRS
+        )
+        out = out.drop(["lat", "lon"], axis=1)
+
+    if "municipality_code" in out.columns:
+        out["municipality_code"] = pd.Categorical(
+            out["municipality_code"].astype(pd.Int32Dtype())
+        )
+    for c in CELL_COLS:
+        if c in out.columns:
+            # nullable, so unmatched rows of a query result stay integers
+            out[c] = out[c].astype(pd.Int64Dtype())
+    return out
+
+
+@functools.lru_cache(maxsize=None)
+def _load_df() -> geopandas.GeoDataFrame:
+    return load_registry()
+
+
+def __getattr__(name: str):
+    # the full registry is loaded on first access of ``df``
+    if name == "df":
+        return _load_df()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def load_street_postcodes() -> Dict[Tuple[str, str], str]:
+    """Loads the (municipality, street) => postcode lookup built by ``preprocess``.
+
+    :return: postcode lookup
+    :rtype: Dict[Tuple[str, str], str]
+    """
+    t = pq.read_table(data_file("street_postcodes.parquet")).to_pydict()
+    return dict(zip(zip(t["municipality"], t["street"]), t["postcode"]))
+
+
+def load_street_dative() -> Dict[str, str]:
+    """Loads the dative => nominative street name lookup built by ``preprocess``.
+
+    :return: street name lookup
+    :rtype: Dict[str, str]
+    """
+    t = pq.read_table(data_file("street_dative.parquet")).to_pydict()
+    return dict(zip(t["street_dative"], t["street_nominative"]))
+
+
+def load_centroids() -> pd.DataFrame:
+    """Loads the street, postcode and municipality centroids built by
+    ``preprocess``.
+
+    :return: centroid table
+    :rtype: pd.DataFrame
+    """
+    return pq.read_table(data_file("centroids.parquet")).to_pandas()
+
+
+def load_service_areas() -> pd.DataFrame:
+    """Loads the postcode and municipality service areas built by
+    ``preprocess``.
+
+    :return: service area table, polygons as WKB in WGS84
+    :rtype: pd.DataFrame
+    """
+    return pq.read_table(data_file("service_areas.parquet")).to_pandas()
+
+
+def load_special_names() -> pd.DataFrame:
+    """Loads the special name => address table built by ``preprocess``.
+
+    :return: special name table
+    :rtype: pd.DataFrame
+    """
+    return pq.read_table(data_file("special_names.parquet")).to_pandas()
+
+
+def load_vocabulary() -> Dict[str, pd.Index]:
+    """Loads the distinct values of the index columns, without loading the
+    rest of the registry.
+
+    :return: sorted distinct values of each of
+             [municipality, postcode, street_nominative, house_nr]
+    :rtype: Dict[str, pd.Index]
+    """
+    table = pq.read_table(data_path, columns=INDEX_COLS)
+    return {
+        c: pd.Index(sorted(pc.unique(table[c]).to_pylist()), dtype=object)
+        for c in INDEX_COLS
     }
-)
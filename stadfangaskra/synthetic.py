@@ -0,0 +1,176 @@
+"""Synthetic registries of any size, for testing and for measuring how a
+``Lookup`` scales with the number of addresses, e.g.
+
+    Lookup.from_dataframe(synthetic_registry(10_000_000))
+"""
+
+from typing import Tuple
+
+import geopandas
+import numpy as np
+import pandas as pd
+
+from .cells import cell_columns
+from .static import CRS, NATIVE_CRS, POSTCODE_MUNICIPALITY_LOOKUP
+
+# street name endings and their dative forms
+STREET_ENDINGS = {
+    "gata": "götu",
+    "vegur": "vegi",
+    "stræti": "stræti",
+    "braut": "braut",
+    "stígur": "stíg",
+    "holt": "holti",
+    "tún": "túni",
+    "lind": "lind",
+    "bakki": "bakka",
+    "hæð": "hæð",
+}
+
+# no syllable is the prefix of another or of an ending, so every street gets
+# a distinct name
+_SYLLABLES = [
+    "ás",
+    "berg",
+    "birki",
+    "blá",
+    "borg",
+    "dal",
+    "eik",
+    "fjall",
+    "foss",
+    "gil",
+    "grá",
+    "hlíð",
+    "hraun",
+    "hvamm",
+    "jökul",
+    "kletta",
+    "lauga",
+    "lyng",
+    "mel",
+    "mó",
+    "reyni",
+    "sand",
+    "sel",
+    "skóg",
+    "sól",
+    "stein",
+    "storm",
+    "tjarnar",
+    "vík",
+    "víði",
+    "þver",
+    "ösp",
+]
+
+# bounds of the postcode centers in ISN93, roughly the inhabited parts of
+# the country
+_BOUNDS = (300_000.0, 350_000.0, 700_000.0, 650_000.0)
+
+
+def _street_names(i: int) -> Tuple[str, str]:
+    """Nominative and dative name of the i-th street."""
+    endings = list(STREET_ENDINGS)
+    i, ending = divmod(i, len(endings))
+    stem = []
+    while i or len(stem) < 2:
+        i, digit = divmod(i, len(_SYLLABLES))
+        stem.append(_SYLLABLES[digit])
+    stem = "".join(reversed(stem)).capitalize()
+    return stem + endings[ending], stem + STREET_ENDINGS[endings[ending]]
+
+
+def synthetic_registry(
+    size: int,
+    seed: int = 0,
+    addresses_per_street: float = 25.0,
+    suffix_rate: float = 0.05,
+    special_name_rate: float = 0.002,
+) -> pd.DataFrame:
+    """Generates a registry with the schema of the real one.
+
+    Streets get distinct Icelandic sounding names and a random postcode,
+    their addresses are numbered from 1 along a line, odd numbers on one side
+    and even on the other.
+
+    :param size: number of addresses
+    :type size: int
+    :param seed: random seed, the same seed gives the same registry
+    :type seed: int
+    :param addresses_per_street: mean number of addresses on a street
+    :type addresses_per_street: float
+    :param suffix_rate: share of house numbers with a letter suffix, e.g. "12A"
+    :type suffix_rate: float
+    :param special_name_rate: share of addresses with a special name
+    :type special_name_rate: float
+    :return: registry data frame, for ``Lookup.from_dataframe``
+    :rtype: pd.DataFrame
+    """
+    rng = np.random.default_rng(seed)
+    lengths = []
+    total = 0
+    while total < size:
+        batch = rng.geometric(1 / addresses_per_street, size=1024)
+        lengths.append(batch)
+        total += int(batch.sum())
+    lengths = np.concatenate(lengths)
+    lengths = lengths[: np.searchsorted(np.cumsum(lengths), size) + 1]
+    street = np.repeat(np.arange(len(lengths)), lengths)[:size]
+    starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    number = np.arange(size) - starts[street] + 1
+
+    names, dative = zip(*(_street_names(i) for i in range(len(lengths))))
+    postcodes = sorted(POSTCODE_MUNICIPALITY_LOOKUP)
+    postcode = rng.integers(0, len(postcodes), size=len(lengths))
+    municipalities = [POSTCODE_MUNICIPALITY_LOOKUP[p] for p in postcodes]
+    municipality_codes, _ = pd.factorize(pd.Series(municipalities))
+
+    # postcode centers, streets around them and houses along the streets
+    minx, miny, maxx, maxy = _BOUNDS
+    centers = rng.uniform([minx, miny], [maxx, maxy], size=(len(postcodes), 2))
+    origin = centers[postcode] + rng.normal(0, 3_000, size=(len(lengths), 2))
+    angle = rng.uniform(0, 2 * np.pi, size=len(lengths))
+    direction = np.column_stack([np.cos(angle), np.sin(angle)])
+    side = np.where(number % 2, 1.0, -1.0)[:, None]
+    normal = direction[street][:, ::-1] * [1.0, -1.0]
+    native = (
+        origin[street]
+        + direction[street] * (number // 2 * 15.0)[:, None]
+        + normal * side * 10.0
+    )
+    points = geopandas.GeoSeries(
+        geopandas.points_from_xy(native[:, 0], native[:, 1]), crs=NATIVE_CRS
+    ).to_crs(CRS)
+    lon, lat = points.x.values, points.y.values
+
+    house_nr = number.astype(str).astype(object)
+    suffixed = rng.random(size) < suffix_rate
+    house_nr[suffixed] = house_nr[suffixed] + "A"
+    special_name = np.full(size, "", dtype=object)
+    named = np.flatnonzero(rng.random(size) < special_name_rate)
+    special_name[named] = [f"Skáli {i}" for i in named]
+
+    names = np.array(names, dtype=object)
+    dative = np.array(dative, dtype=object)
+    postcode = postcode[street]
+    df = pd.DataFrame(
+        {
+            "municipality_code": pd.array(
+                municipality_codes[postcode], dtype=pd.Int32Dtype()
+            ),
+            "street_nominative": names[street],
+            "street_dative": dative[street],
+            "house_nr": house_nr,
+            "special_name": special_name,
+            "municipality": np.array(municipalities, dtype=object)[postcode],
+            "postcode": np.array(postcodes).astype(str).astype(object)[postcode],
+            "lat": lat,
+            "lon": lon,
+            "x": native[:, 0],
+            "y": native[:, 1],
+        }
+    )
+    df = df.assign(**cell_columns(lon, lat, native[:, 0], native[:, 1]))
+    df["fid"] = np.char.add("S", np.arange(size).astype(str)).astype(object)
+    return df
@@ -1,405 +1,701 @@
-from typing import Dict, List, Tuple, Union
+import gc
+import hashlib
+import json
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple, Union
 
 import geopandas
 import numpy as np
 import pandas as pd
-
-from .matches import iter_matches
-from .static import ADMINISTRATIVE_DIVISIONS, POSTCODE_MUNICIPALITY_LOOKUP
-from .static import df as STATIC_DF
-
-INDEX_COLS = ["municipality", "postcode", "street_nominative", "house_nr"]
-
-
-def is_valid_idx(x: Tuple[str, str, str, str]):
-    if not x[0] and not x[1] and not x[2]:
-        return False
-    return True
-
-
-def merge_tuples(
-    sq: Tuple[
-        Union[str, slice], Union[str, slice], Union[str, slice], Union[str, slice]
-    ],
-    res: pd.MultiIndex,
-) -> Tuple[str, str, str, str]:
-    """Replace tuple values where the index is an empty slice.
-
-    Behaviour change in pandas 1.4, in previous versions the full index was returned.
-    Post 1.4, pandas returns only the missing levels.
-
-    :param sq: query tuple
-    :type sq: Tuple[ Union[str, slice], Union[str, slice], Union[str, slice], Union[str, slice] ]
-    :param res: index part
-    :type res: Tuple
-    :return: Full lookup value
-    :rtype: Tuple[str, str, str, str]
-    """
-    out = list(sq)
-    for n in res.names:
-        idx = INDEX_COLS.index(n)
-        out[idx] = res.get_level_values(n)[0]
-    return tuple(out)
-
-
-def _build_municipality_street_to_postcode(
-    df: pd.DataFrame,
-) -> Dict[Tuple[str, str], str]:
-    """Builds a lookup table of
-
-    (municipality, street) => postcode
-
-    Non unique matches, i.e. a street spanning more than a single postcode are dropped.
-
-    :param df: [description]
-    :type df: pd.DataFrame
-    :return: [description]
-    :rtype: Dict[Tuple[str, str], str]
-    """
-    out = {}
-    delete_list = []
-    for t, sn, sd, pc in (
-        df[["municipality", "street_nominative", "street_dative", "postcode"]]
-        .drop_duplicates()
-        .values
-    ):
-        if (t, sn) in out and out[(t, sn)] != str(pc):
-            delete_list.append((t, sn))
-            continue
-        out[(t, sn)] = str(pc)
-        out[(t, sd)] = str(pc)
-    for k in delete_list:
-        out.pop(k, None)
-    return out
-
-
-class Lookup:
+import pyarrow as pa
+
+from .areas import ServiceAreaIndex
+from .arrow import (
+    GEOMETRY_FORMATS,
+    decode_dictionaries,
+    encode_structured,
+    encode_text,
+    read_ipc,
+    registry_table,
+    snapshot_state,
+    structured_columns,
+    table_digest,
+    take_matches,
+    with_snapshot_state,
+    write_ipc,
+)
+from .base import BaseLookup
+from .centroids import CentroidIndex
+from .derived import (
+    build_centroids,
+    build_service_areas,
+    build_special_names,
+    build_street_dative,
+    build_street_postcodes,
+    registry_source,
+)
+from .housenr import HouseNumberIndex
+from .keys import KeyIndex, merge_tuples  # pylint: disable=unused-import
+from .landmarks import LANDMARK_COLS, LandmarkIndex
+from .parser import is_structured, is_valid_idx  # pylint: disable=unused-import
+from .prefix import PrefixIndex
+from .spatial import GridIndex, take_points
+from .static import (
+    CRS,
+    NATIVE_CRS,
+    load_centroids,
+    load_registry,
+    load_service_areas,
+    load_special_names,
+    load_street_dative,
+    load_street_postcodes,
+    region_postcodes,
+    registry_frame,
+    registry_version,
+    tables_version,
+)
+
+# version of the matching logic, part of every lookup version so that results
+# cached by an older release aren't reused. Bump it with every change to how
+# queries are parsed or matched.
+MATCHING_VERSION = 1
+
+
+def _digest(*parts) -> str:
+    return hashlib.sha256(
+        json.dumps(parts, ensure_ascii=False, sort_keys=True).encode()
+    ).hexdigest()
+
+
+def _load_snapshot(data: bytes, compact: bool = False) -> "Lookup":
+    # pylint: disable=protected-access
+    return Lookup._from_snapshot(read_ipc(data), compact=compact)
+
+
+class Lookup(BaseLookup):
     """
     Utility class for doing reverse geocoding lookups from the dataframe.
 
     How it works:
-    - The dataframe has a few categorical columns whose code values are used
-      for constructing a multidimensional search tree.
+    - The dataframe is indexed by [municipality, postcode, street_nominative,
+      house_nr], the codes of the index levels are packed into a single sorted
+      int64 key per address.
     - When querying, a best-effort approach is used to translate the
-      input string into a vector to query the tree.
+      input string into a vector which is packed the same way and matched
+      with a binary search, falling back to partial matching on the index.
+
+    Querying doesn't modify the lookup or the input data, a single instance can
+    be shared between threads. Indexes built on first use are guarded by a lock.
+
+    A compact lookup holds no Python object per address, points are built for
+    the rows of each result. Loaded before forking, e.g. in the master of a
+    prefork server, its memory stays shared with the workers.
     """
 
     df: pd.DataFrame
-    town_street_to_postcode: Dict[Tuple[str, str], str]
-    streets: List[str]
-    house_nrs: List[str]
-    postcodes: List[str]
-    municipalities: List[str]
-    street_dative: Dict[str, str]
-
-    def __init__(self) -> "Lookup":
-        self.df = STATIC_DF.copy().sort_index()
-        self.town_street_to_postcode = _build_municipality_street_to_postcode(self.df)
+    compact: bool = False
+    _columns: Dict[str, pd.api.extensions.ExtensionArray]
+    _coordinates: Optional[Tuple[np.ndarray, np.ndarray]] = None
+    _key_index: KeyIndex
+    _lock: threading.Lock
+    _spatial_index: Optional[GridIndex] = None
+    _prefix_index: Optional[PrefixIndex] = None
+    _arrow_tables: Optional[Dict[str, pa.Table]] = None
+    _centroid_index: Optional[CentroidIndex] = None
+    _service_area_index: Optional[ServiceAreaIndex] = None
+    _house_nr_index: Optional[HouseNumberIndex] = None
+    _native_points: Optional[pd.api.extensions.ExtensionArray] = None
+    # lookup tables are derived from the registry rather than loaded
+    _derived: bool = False
+
+    def __init__(
+        self,
+        columns: Optional[List[str]] = None,
+        postcodes: Optional[Iterable[Union[int, str]]] = None,
+        municipalities: Optional[Iterable[str]] = None,
+        region: Optional[str] = None,
+        compact: bool = False,
+    ) -> "Lookup":
+        """
+        :param columns: registry columns to load and return in results, the
+                        index columns are always loaded. Defaults to all columns.
+        :type columns: Optional[List[str]]
+        :param postcodes: only load addresses in these postcodes
+        :type postcodes: Optional[Iterable[Union[int, str]]]
+        :param municipalities: only load addresses in these municipalities
+        :type municipalities: Optional[Iterable[str]]
+        :param region: only load addresses in this region, e.g. "Höfuðborgarsvæðið"
+        :type region: Optional[str]
+        :param compact: hold no Python object per address, for sharing the
+                        lookup with forked processes, see ``prepare_fork``.
+                        Defaults to False.
+        :type compact: bool
+        """
+        self._setup(
+            load_registry(
+                columns=columns,
+                postcodes=postcodes,
+                municipalities=municipalities,
+                region=region,
+                compact=compact,
+            ),
+            load_street_postcodes(),
+            load_street_dative(),
+            landmarks=LandmarkIndex(load_special_names()),
+            compact=compact,
+        )
+        # identifies the results of this lookup, e.g. in a ``ResultCache``
+        self.registry_version = registry_version()
+        self.version = _digest(
+            MATCHING_VERSION,
+            self.registry_version,
+            tables_version(),
+            sorted(columns) if columns is not None else None,
+            sorted(str(p) for p in postcodes) if postcodes is not None else None,
+            sorted(municipalities) if municipalities is not None else None,
+            region,
+        )
+
+    def _setup(
+        self,
+        df: pd.DataFrame,
+        town_street_to_postcode: Dict[Tuple[str, str], str],
+        street_dative: Dict[str, str],
+        landmarks: Optional[LandmarkIndex] = None,
+        compact: bool = False,
+    ) -> None:
+        self.df = df.sort_index()
+        self.compact = compact
+        self.town_street_to_postcode = town_street_to_postcode
         self.streets = self.df.index.levels[2]
         self.house_nrs = self.df.index.levels[3]
         self.postcodes = self.df.index.levels[1]
         self.municipalities = self.df.index.levels[0]
-        self.street_dative = dict(
-            self.df[["street_dative", "street_nominative"]]
-            .reset_index(drop=True)
-            .values
-        )
+        self.street_dative = street_dative
+        self.landmarks = landmarks
+        # guards the indexes which are built on first use
+        self._lock = threading.Lock()
+        self._columns = {c: self.df[c].array for c in self.df.columns}
+        if compact and "lon" in self._columns:
+            self._coordinates = tuple(
+                np.asarray(self._columns.pop(c), dtype=np.float64)
+                for c in ["lon", "lat"]
+            )
 
-    def text_to_vec(  # pylint: disable=too-many-branches
-        self, s: str
-    ) -> Tuple[str, str, str, str]:
-        """Builds a tuple out of an address string.
+        # every address packed into a single int64 key of its index level codes
+        self._key_index = KeyIndex(self.df.index)
 
-        * index 0, category value of the "municipality" category.
-        * index 1, category value of the "postcode" category.
-        * index 2, category value of the "street_nominative" category.
-        * index 3, category value of the "house_nr" category.
+    def prepare_fork(self) -> None:
+        """Prepares the process for forking workers which share the lookup,
+        e.g. from the ``pre_fork`` hook of a gunicorn server.
 
-        :param s: string containing address
-        :type s: str
-        :return: Address tuple
-        :rtype: Tuple[str, str, str, str]
+        The objects of the process, including indexes built on first use, are
+        frozen with ``gc.freeze`` and memory the Arrow pool keeps for reuse is
+        released, so workers don't write to pages they share with the parent.
+        A collection in a forked process writes to every object it visits,
+        frozen objects are left alone. Freezing affects every object of the
+        process, not only the lookup, so it is left to the caller.
         """
-        municipality = ""
-        postcode = ""
-        street = ""
-        house_nr = ""
-        admin_unit = ""
-
-        # Exit early if the string is empty
-        if not s:
-            return ("", "", "", "")
-
-        for w in s.split(" "):
-            w = w.strip(",.")
-
-            if not street and w in self.streets:
-                street = w
-
-            if not house_nr and (w.upper() in self.house_nrs or "-" in w):
-                house_nr = w
-
-            if not postcode and w in self.postcodes and w != house_nr:
-                postcode = w
-                municipality = POSTCODE_MUNICIPALITY_LOOKUP.get(int(postcode), "")
-
-            if not postcode and not municipality and w in self.municipalities:
-                municipality = w
-            if not municipality and w in ADMINISTRATIVE_DIVISIONS:
-                admin_unit = w
-
-        if admin_unit and street:
-            for tn in ADMINISTRATIVE_DIVISIONS[admin_unit]:
-                postcode = self.town_street_to_postcode.get((tn, street), "")
-                if not postcode:
-                    continue
-                municipality = tn
-                break
-
-        # if we have municipality and street but no postcode, try looking it up
-        if municipality and street and not postcode:
-            postcode = self.town_street_to_postcode.get((municipality, street), "")
-            # Álftanes has a special case
-            if not postcode and municipality == "Garðabær":
-                postcode = self.town_street_to_postcode.get(
-                    ("Garðabær (Álftanes)", street)
-                )
-                if postcode:
-                    municipality = "Garðabær (Álftanes)"
-
-        if house_nr and "-" in house_nr:
-            house_nr = house_nr.split("-")[0]
-
-        return (
-            municipality or "",
-            postcode or "",
-            street or "",
-            (house_nr or "").upper(),
+        gc.collect()
+        gc.freeze()
+        pa.default_memory_pool().release_unused()
+
+    def _snapshot(self) -> pa.Table:
+        """Arrow table of the registry with the derived lookups in its metadata."""
+        state = {
+            # stored column-wise, it's considerably faster to parse
+            "town_street_to_postcode": [
+                [k[0] for k in self.town_street_to_postcode],
+                [k[1] for k in self.town_street_to_postcode],
+                list(self.town_street_to_postcode.values()),
+            ],
+            "street_dative": self.street_dative,
+            "special_names": (
+                self.landmarks.to_frame().values.tolist() if self.landmarks else []
+            ),
+            "registry_version": self.registry_version,
+            "lookup_version": self.version,
+            "matching_version": MATCHING_VERSION,
+            "derived": self._derived,
+        }
+        return with_snapshot_state(self.registry_table("coordinates"), state)
+
+    @classmethod
+    def _from_snapshot(cls, table: pa.Table, compact: bool = False) -> "Lookup":
+        state = snapshot_state(table)
+        towns, streets, postcodes = state["town_street_to_postcode"]
+        lookup = cls.__new__(cls)
+        lookup._setup(
+            registry_frame(table, compact=compact),
+            dict(zip(zip(towns, streets), postcodes)),
+            state["street_dative"],
+            landmarks=LandmarkIndex(
+                pd.DataFrame(state.get("special_names", []), columns=LANDMARK_COLS)
+            ),
+            compact=compact,
         )
-
-    def __query_vector_dataframe(self, q: pd.DataFrame) -> pd.DataFrame:
-        """Given a data frame with index:
-          [municipality, postcode, street_nominative, house_nr]
-        and columns "qidx" (query index) and "order", matches exact and
-        partial matches to the address dataframe.
-
-        :param q: query dataframe
-        :type q: pd.DataFrame
-        :return: query dataframe with additional address columns
-        :rtype: pd.DataFrame
+        # snapshots saved before versions were stored are versioned by content
+        digest = state.get("lookup_version") or table_digest(table)
+        lookup.registry_version = state.get("registry_version", digest)
+        if state.get("matching_version") != MATCHING_VERSION:
+            # saved by a release which matched differently
+            digest = _digest(MATCHING_VERSION, digest)
+        lookup.version = digest
+        lookup._derived = state.get("derived", False)
+        return lookup
+
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame, compact: bool = False) -> "Lookup":
+        """Builds a lookup over a custom registry, e.g. a filtered or patched
+        copy of the registry or one from ``synthetic_registry``.
+
+        The lookup tables are derived from ``df`` instead of being loaded,
+        the centroids and service areas on first use. Duplicated addresses
+        are dropped, keeping the first, as ``preprocess`` does.
+
+        :param df: registry data frame with the index columns, as columns or
+                   as its index, and "lon"/"lat" columns or a "geometry"
+                   column. The other registry columns are optional, the
+                   ISN93 "x"/"y" are transformed from WGS84 if missing.
+        :type df: pd.DataFrame
+        :param compact: hold no Python object per address, see ``Lookup``
+        :type compact: bool
+        :raises ValueError: if an index column or the coordinates are missing
+        :return: lookup over ``df``
+        :rtype: Lookup
         """
-
-        # get intersecting indexes
-        found = self.df.index.intersection(q.index)
-
-        idx_names = self.df.index.names
-
-        # find indexes in the query dataframe which couldn't be found,
-        # these could be empty queries or partial matches.
-        missing = q.index.difference(found).unique()
-
-        if len(missing):
-            # create a set of the found values, the purpose is to have a mutable
-            # data structure to work with.
-            found_missing = set(found.values)
-            # get unique set of missing queries
-            miss_df = q.loc[missing].drop_duplicates()
-
-            # keep track of query idx that have not been found
-            not_found_qidx = set()
-
-            missing_data = []
-
-            miss_df = miss_df.loc[miss_df.index.map(is_valid_idx)]
-
-            # as the address dataframe is fairly large, constrict the search
-            # space to the records loosely matching what's being queried for. For
-            # large datasets, this speeds up querying considerably.
-            search_selector = [
-                slice(None) if (i[0] == "" and len(i) == 1) else i
-                for i in [
-                    i.values.tolist()
-                    for i in miss_df.index.remove_unused_levels().levels
-                ]
-            ]
-
-            search_space = self.df.loc[tuple(search_selector), :]
-
-            # iterate rows of valid missing indexes
-            for tvec, row in miss_df.iterrows():
-                qidx = row["qidx"]
-
-                # the index is 4 levels, [municipality, postcode, street, house_nr],
-                # all of these values are allowed to be an empty string, except at
-                # this point it is clear that a key with an empty string could not
-                # be found in the index.
-                # Replace all empty strings with a None slice and query the address dataframe
-                sq = tuple((i or slice(None) for i in tvec))
-                # NOTE: Author has not founded a vectorized approach to querying the
-                # source dataframe and matching the query index back with the result.
-                try:
-                    res = search_space.loc[sq]
-                except KeyError:
-                    continue
-
-                # if an exact match could be found, assign it as the value of the query
-                # dataframe for the given index. In case there are duplicates, check
-                # if it's already been found
-                if len(res) == 1:
-                    # mark the returned tuple for addition to the found indexes
-                    res_val = merge_tuples(sq, res.index)
-                    found_missing.add(res_val)
-                    # create a new row for the missing data
-                    missing_data.append(res_val + tuple(row))
-
-                    # mark old data query index for deletion
-                    not_found_qidx.add(qidx)
-
-                # NOTE: here there are multiple matches, theoretically possible to train
-                # a model which would give higher priority to a generic address determined
-                # by its frequency over a corpus.
-
-            # delete found qidx from the original query frame
-            q = q[~q["qidx"].isin(not_found_qidx)]
-            # concat the missing data found with the query data frame
-            q = pd.concat(
-                [
-                    q,
-                    pd.DataFrame(
-                        missing_data, columns=idx_names + q.columns.tolist()
-                    ).set_index(idx_names),
-                ]
-            )
-            # rebuild the multiindex after mutating it
-            found = pd.MultiIndex.from_tuples(list(found_missing), names=idx_names)
-
-        # select indexable records, right join with the query dataframe
-        # and sort by the original query order.
-        out = self.df.loc[found].join(q, how="right").sort_values("order")
-
-        # fill NaN string values
-        out[
-            [
-                "municipality",
-                "postcode",
-                "special_name",
-                "house_nr",
-                "street_dative",
-                "street_nominative",
-            ]
-        ] = out[
-            [
-                "municipality",
-                "postcode",
-                "special_name",
-                "house_nr",
-                "street_dative",
-                "street_nominative",
-            ]
-        ].fillna(
-            value=""
+        source = registry_source(df)
+        table = pa.Table.from_pandas(source, preserve_index=False)
+        # the lookup tables need both street name forms and the special names
+        source = source.assign(
+            street_dative=source.get("street_dative", source["street_nominative"]),
+            special_name=source.get("special_name", ""),
         )
-
-        out.reset_index(level=[0, 1, 2, 3], drop=True, inplace=True)
-        return out
-
-    def query_dataframe(
-        self,
-        q: pd.DataFrame,
-    ) -> pd.DataFrame:
-        """Queries a data frame containing structued data,
-        columns [postcode, house_nr, street/street_nominative] are
-        required, [municipality] is optional.
-
-        :param q: query dataframe
-        :type q: pd.DataFrame
-        :return: query dataframe with additional address columns
-        :rtype: pd.DataFrame
-        """
-
-        cols = q.columns
-        q["postcode"] = q["postcode"].astype(str)
-        if "municipality" not in cols:
-            q["municipality"] = q["postcode"].apply(
-                lambda pc: POSTCODE_MUNICIPALITY_LOOKUP.get(
-                    int(pc) if pc.isdigit() else -1, ""
+        street_postcodes = build_street_postcodes(source)
+        street_dative = build_street_dative(source)
+        lookup = cls.__new__(cls)
+        lookup._setup(
+            registry_frame(table, compact=compact),
+            dict(
+                zip(
+                    zip(street_postcodes["municipality"], street_postcodes["street"]),
+                    street_postcodes["postcode"],
                 )
-            )
-        q["house_nr"] = q["house_nr"].astype(str)
-        if "street" in cols and "street_nominative" not in cols:
-            q = q.rename(columns={"street": "street_nominative"})
-
-        q["street_nominative"] = q["street_nominative"].apply(
-            lambda v: self.street_dative.get(v, v)
+            ),
+            dict(
+                zip(street_dative["street_dative"], street_dative["street_nominative"])
+            ),
+            landmarks=LandmarkIndex(build_special_names(source)),
+            compact=compact,
         )
+        lookup._derived = True
+        lookup.registry_version = table_digest(table)
+        lookup.version = _digest(MATCHING_VERSION, lookup.registry_version)
+        return lookup
+
+    def save(self, path: str, compression: Optional[str] = "zstd") -> None:
+        """Saves a snapshot of the lookup, to be restored with ``Lookup.load``.
+
+        The snapshot is an Arrow IPC file of the registry columns, with
+        dictionary encoded strings and coordinates, the derived lookups are
+        stored in its metadata. Indexes built on first use aren't included.
+
+        :param path: file path
+        :type path: str
+        :param compression: "zstd", "lz4" or None, defaults to "zstd"
+        :type compression: Optional[str]
+        """
+        write_ipc(self._snapshot(), str(path), compression=compression)
+
+    @classmethod
+    def load(cls, path: str, compact: bool = False) -> "Lookup":
+        """Loads a snapshot saved with ``Lookup.save``.
+
+        :param path: file path
+        :type path: str
+        :param compact: load a compact lookup, see ``Lookup``
+        :type compact: bool
+        :raises ValueError: if the file isn't a snapshot of a supported version
+        :return: lookup
+        :rtype: Lookup
+        """
+        return cls._from_snapshot(read_ipc(str(path)), compact=compact)
 
-        q["qidx"] = pd.Categorical(
-            q[self.df.index.names].apply(
-                lambda x: "/".join(x.dropna().astype(str).values), axis=1
-            )
-        ).codes
-        q["order"] = list(range(len(q)))
+    def __reduce__(self):
+        # pickle into the compact snapshot rather than the data frames
+        sink = pa.BufferOutputStream()
+        write_ipc(self._snapshot(), sink)
+        return (_load_snapshot, (sink.getvalue().to_pybytes(), self.compact))
 
-        q = q.set_index(keys=self.df.index.names)
+    @property
+    def spatial_index(self) -> GridIndex:
+        """Grid index over the registry coordinates, built on first use.
 
-        return self.__query_vector_dataframe(q)
+        :raises ValueError: if the registry was loaded without geometry
+        :return: spatial index, positions refer to rows of ``df``
+        :rtype: GridIndex
+        """
+        if not self._has_geometry:
+            raise ValueError("Spatial queries require the geometry column")
+        with self._lock:
+            if self._spatial_index is None:
+                if self._coordinates is not None:
+                    self._spatial_index = GridIndex(*self._coordinates)
+                else:
+                    geometry = self.df.geometry
+                    self._spatial_index = GridIndex(
+                        geometry.x.values, geometry.y.values
+                    )
+        return self._spatial_index
+
+    @property
+    def _has_geometry(self) -> bool:
+        return "geometry" in self._columns or self._coordinates is not None
+
+    def within_radius(
+        self, lon: float, lat: float, meters: float
+    ) -> geopandas.GeoDataFrame:
+        """Returns the addresses within a distance of a point.
+
+        :param lon: longitude of the center
+        :type lon: float
+        :param lat: latitude of the center
+        :type lat: float
+        :param meters: radius in meters
+        :type meters: float
+        :return: addresses with a "distance_m" column in meters, nearest first
+        :rtype: geopandas.GeoDataFrame
+        """
+        return self.within_radius_many([lon], [lat], meters).drop("qidx", axis=1)
 
-    def query(  # pylint: disable=too-many-locals
-        self, text: Union[str, List[str], np.ndarray]
+    def within_radius_many(
+        self,
+        lon: Union[List[float], np.ndarray],
+        lat: Union[List[float], np.ndarray],
+        meters: Union[float, List[float], np.ndarray],
     ) -> geopandas.GeoDataFrame:
-        """Given text input, returns a dataframe with matching addresses
+        """Returns the addresses within a distance of each of many points.
+
+        :param lon: longitude of each center
+        :type lon: Union[List[float], np.ndarray]
+        :param lat: latitude of each center
+        :type lat: Union[List[float], np.ndarray]
+        :param meters: radius in meters, for each center or a single value
+        :type meters: Union[float, List[float], np.ndarray]
+        :return: addresses with "qidx" (center index) and "distance_m" columns,
+                 ordered by center and distance
+        :rtype: geopandas.GeoDataFrame
+        """
+        qidx, positions, distance = self.spatial_index.within_radius(lon, lat, meters)
+        out = self._take(positions)
+        out["qidx"] = qidx
+        out["distance_m"] = distance
+        return out
 
-        :param text: string containing a single address or an iterator
-                     containing multiple addresses.
-        :type text: Union[str, List[str], np.ndarray]
-        :return: Data frame containg addresses
+    def within_bbox(
+        self, minx: float, miny: float, maxx: float, maxy: float
+    ) -> geopandas.GeoDataFrame:
+        """Returns the addresses inside a bounding box.
+
+        :param minx: minimum longitude
+        :type minx: float
+        :param miny: minimum latitude
+        :type miny: float
+        :param maxx: maximum longitude
+        :type maxx: float
+        :param maxy: maximum latitude
+        :type maxy: float
+        :return: addresses inside the box
         :rtype: geopandas.GeoDataFrame
         """
-        if isinstance(text, str):
-            text = [text]
+        return self.within_bbox_many([(minx, miny, maxx, maxy)]).drop("qidx", axis=1)
 
-        # strip whitespace from text
-        text = [t.strip() for t in text]
+    def within_bbox_many(
+        self, bboxes: Union[List[Tuple[float, float, float, float]], np.ndarray]
+    ) -> geopandas.GeoDataFrame:
+        """Returns the addresses inside each of many bounding boxes.
 
-        # tokenize strings into a list of tuples,
-        # [municipality, postcode, street_nominative, house_nr]
-        vecs = [self.text_to_vec(t) for t in text]
+        :param bboxes: (minx, miny, maxx, maxy) of each box
+        :type bboxes: Union[List[Tuple[float, float, float, float]], np.ndarray]
+        :return: addresses with a "qidx" (box index) column, ordered by box
+        :rtype: geopandas.GeoDataFrame
+        """
+        bboxes = np.asarray(bboxes, dtype=np.float64).reshape(-1, 4)
+        qidx, positions = self.spatial_index.within_bbox(*bboxes.T)
+        out = self._take(positions)
+        out["qidx"] = qidx
+        return out
 
-        # construct dataframe from parsed results
-        q = pd.DataFrame(vecs, columns=self.df.index.names)
+    @property
+    def prefix_index(self) -> PrefixIndex:
+        """Prefix index over street names and house numbers, built on first use.
 
-        # Set original search query and idx of the query
-        q["query"] = text
-        # there might be duplicated values, cast the query as a category
-        # this is used as the id of the query
-        q["qidx"] = q["query"].astype("category").cat.codes
+        :return: prefix index, positions refer to rows of ``df``
+        :rtype: PrefixIndex
+        """
+        with self._lock:
+            if self._prefix_index is None:
+                idx = self.df.index
+                self._prefix_index = PrefixIndex(
+                    idx.get_level_values(2).values,
+                    idx.get_level_values(3).values,
+                    idx.get_level_values(1).values,
+                    aliases=self.street_dative,
+                )
+        return self._prefix_index
 
-        # keep the original order of the query
-        q["order"] = list(range(len(text)))
+    @property
+    def centroid_index(self) -> CentroidIndex:
+        """Street, postcode and municipality centroids, loaded on first use.
 
-        # set the tokenized vector of
-        # [municipality, postcode, street_nominative, house_nr] as the index
-        q = q.set_index(keys=self.df.index.names)
-        return self.__query_vector_dataframe(q)
+        :return: centroid index
+        :rtype: CentroidIndex
+        """
+        with self._lock:
+            if self._centroid_index is None:
+                self._centroid_index = CentroidIndex(
+                    build_centroids(self._derive_source())
+                    if self._derived
+                    else load_centroids()
+                )
+        return self._centroid_index
 
-    def query_text_body(self, text: str) -> pd.DataFrame:
-        """Queries a body of text.
+    @property
+    def service_area_index(self) -> ServiceAreaIndex:
+        """Postcode and municipality service areas, built on first use.
 
-        This is a special case API for parsing multiple addresses from
-        a block of text.
+        :return: service area index
+        :rtype: ServiceAreaIndex
+        """
+        with self._lock:
+            if self._service_area_index is None:
+                self._service_area_index = ServiceAreaIndex(
+                    build_service_areas(self._derive_source())
+                    if self._derived
+                    else load_service_areas()
+                )
+        return self._service_area_index
+
+    def _derive_source(self) -> pd.DataFrame:
+        """Flat registry with "lon"/"lat" coordinates, to derive the lookup
+        tables of a custom registry from. Called under the lock, so the
+        table isn't cached."""
+        df = decode_dictionaries(registry_table(self.df, "coordinates")).to_pandas()
+        if "municipality_code" not in df.columns:
+            df["municipality_code"] = pd.array([None] * len(df), dtype=pd.Int32Dtype())
+        return df
+
+    @property
+    def house_nr_index(self) -> HouseNumberIndex:
+        """Sorted house numbers of every street, built on first use.
+
+        :return: house number index, positions refer to rows of ``df``
+        :rtype: HouseNumberIndex
+        """
+        with self._lock:
+            if self._house_nr_index is None:
+                idx = self.df.index
+                if self._coordinates is not None:
+                    lon, lat = self._coordinates
+                elif "geometry" in self._columns:
+                    lon, lat = self.df.geometry.x.values, self.df.geometry.y.values
+                else:
+                    lon = lat = np.full(len(self.df), np.nan)
+                native = [self.df[c].values for c in ["x", "y"] if c in self._columns]
+                self._house_nr_index = HouseNumberIndex(
+                    idx.get_level_values(1).values,
+                    idx.get_level_values(2).values,
+                    idx.get_level_values(3).values,
+                    lon,
+                    lat,
+                    *native,
+                )
+        return self._house_nr_index
 
-        :param text: block of text
-        :type text: str
-        :return: Data frame containg addresses
+    def _street_house_nrs(
+        self, streets: np.ndarray
+    ) -> Tuple[HouseNumberIndex, Optional[np.ndarray]]:
+        return self.house_nr_index, None
+
+    def complete(
+        self, prefix: str, limit: int = 10, postcode: Optional[Union[int, str]] = None
+    ) -> pd.DataFrame:
+        """Completes a partially typed address.
+
+        Street names are completed in either grammatical case, "Laugav" or
+        "Laugavegi". Once a street name is followed by a space, house numbers
+        on that street are completed, "Laugavegur 2" returns 2, 2A, 20...
+
+        :param prefix: partially typed address
+        :type prefix: str
+        :param limit: maximum number of addresses, defaults to 10
+        :type limit: int
+        :param postcode: only complete addresses in this postcode
+        :type postcode: Optional[Union[int, str]]
+        :return: matching addresses, for street name completions the lowest
+                 house number of each street and postcode
         :rtype: pd.DataFrame
         """
+        positions = self.prefix_index.search(prefix, limit=limit, postcode=postcode)
+        # building a frame from column arrays is cheaper than ``df.iloc``
+        out = {c: a.take(positions) for c, a in self._columns.items()}
+        if self._coordinates is not None:
+            out["geometry"] = take_points(positions, *self._coordinates, CRS)
+        return pd.DataFrame(out)
+
+    def _take(self, positions: np.ndarray, native: bool = False) -> pd.DataFrame:
+        """Selects registry rows by position, -1 gives a row of missing values.
+
+        :param positions: positions in ``df``
+        :type positions: np.ndarray
+        :param native: take the geometry in ISN93, built from the native
+                       "x"/"y" coordinates
+        :type native: bool
+        :return: registry rows
+        :rtype: pd.DataFrame
+        """
+        crs = NATIVE_CRS if native else CRS
+        geometry = None
+        if self._coordinates is not None:
+            # compact, points are only built for the selected rows
+            x, y = (
+                (np.asarray(self._columns[c], dtype=np.float64) for c in ["x", "y"])
+                if native
+                else self._coordinates
+            )
+            geometry = take_points(positions, x, y, crs)
+        elif native and "geometry" in self._columns:
+            geometry = pd.api.extensions.take(
+                self._native_geometry(), positions, allow_fill=True
+            )
+        out = pd.DataFrame(
+            {
+                c: pd.api.extensions.take(a, positions, allow_fill=True)
+                for c, a in self._columns.items()
+                if c != "geometry" or geometry is None
+            }
+        )
+        if geometry is not None:
+            out["geometry"] = geometry
+        if "geometry" in out.columns:
+            out = geopandas.GeoDataFrame(out, geometry="geometry", crs=crs)
+        return out
 
-        arr = []
+    def _has_column(self, name: str) -> bool:
+        return name in self._columns
 
-        for m in iter_matches(text):
-            if not m:  # pragma: no cover
-                break
-            arr.append(m)
+    def _take_column(self, name: str, positions: np.ndarray) -> np.ndarray:
+        return np.asarray(self._columns[name].take(positions), dtype=object)
 
-        df = pd.DataFrame(arr)
-        return self.query_dataframe(df)
+    def _native_geometry(self) -> pd.api.extensions.ExtensionArray:
+        """Registry points in ISN93, built on first use from the native "x"/"y"
+        coordinates.
+
+        :return: geometry array, in the same order as ``df``
+        :rtype: pd.api.extensions.ExtensionArray
+        """
+        with self._lock:
+            if self._native_points is None:
+                self._native_points = geopandas.points_from_xy(
+                    self.df["x"].values, self.df["y"].values, crs=NATIVE_CRS
+                )
+        return self._native_points
+
+    def _match_index(
+        self, index: pd.MultiIndex, region: Optional[str]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Matches address tuples exactly, and partially when they're
+        incomplete.
+
+        :param index: [municipality, postcode, street_nominative, house_nr] of
+                      each query
+        :type index: pd.MultiIndex
+        :param region: limit partial matches to addresses in this region
+        :type region: Optional[str]
+        :return: registry position of each query, -1 if not found, and its
+                 status, an index into ``MATCH_STATUSES``
+        :rtype: Tuple[np.ndarray, np.ndarray]
+        """
+        # resolve the region first, unknown regions raise before querying
+        postcodes = region_postcodes(region) if region is not None else None
+        return self._key_index.match_index(index, postcodes)
+
+    def registry_table(self, geometry_format: str = "coordinates") -> pa.Table:
+        """Returns the registry as an Arrow table, built once per format.
+
+        :param geometry_format: "coordinates" for float "lon"/"lat" columns or
+                                "wkb" for a binary "geometry" column
+        :type geometry_format: str
+        :raises ValueError: if the geometry format is unknown
+        :return: registry table, rows in the same order as ``df``
+        :rtype: pa.Table
+        """
+        if geometry_format not in GEOMETRY_FORMATS:
+            raise ValueError(f"Unknown geometry format: {geometry_format}")
+        df = self.df
+        if geometry_format == "wkb" and self._coordinates is not None:
+            # the coordinates of a compact registry are stored as is otherwise
+            df = self._take(np.arange(len(self.df)))
+        with self._lock:
+            if self._arrow_tables is None:
+                self._arrow_tables = {}
+            if geometry_format not in self._arrow_tables:
+                self._arrow_tables[geometry_format] = registry_table(
+                    df, geometry_format
+                )
+            return self._arrow_tables[geometry_format]
+
+    def query_arrow(
+        self,
+        data: Union[pa.Array, pa.ChunkedArray, pa.Table],
+        geometry_format: str = "coordinates",
+        query_column: str = "address",
+        region: Optional[str] = None,
+    ) -> pa.Table:
+        """Queries free text or structured data held in Arrow memory.
+
+        Queries are dictionary encoded so each distinct value is only parsed
+        and matched once, matching rows are then taken from the Arrow registry
+        table without building a data frame or points.
+        String columns of the result are dictionary encoded and can be handed
+        to Polars without copying, e.g. ``polars.from_arrow(res)``.
+
+        :param data: array of address strings, or a table with either
+                     [postcode, street/street_nominative, house_nr] columns
+                     or a ``query_column`` of address strings.
+        :type data: Union[pa.Array, pa.ChunkedArray, pa.Table]
+        :param geometry_format: "coordinates" for float "lon"/"lat" columns or
+                                "wkb" for a binary "geometry" column
+        :type geometry_format: str
+        :param query_column: column holding address strings in a table
+        :type query_column: str
+        :param region: limit partial matches to addresses in this region
+        :type region: Optional[str]
+        :return: the query columns followed by the registry columns, null
+                 where no address was found
+        :rtype: pa.Table
+        """
+        registry = self.registry_table(geometry_format)
+
+        if not isinstance(data, pa.Table):
+            query = pa.table({"query": data})
+            unique, indices = encode_text(data)
+        elif is_structured(data.column_names):
+            query = data
+            unique, indices = encode_structured(
+                data, structured_columns(data.column_names)
+            )
+        elif query_column in data.column_names:
+            query = data
+            unique, indices = encode_text(data[query_column])
+        else:
+            raise AttributeError(f"query column {query_column} missing")
+
+        found = np.empty(0, dtype=np.int64)
+        if len(unique):
+            if isinstance(unique, pa.Table):
+                index = self._structured_frame(unique.to_pandas()).index
+            else:
+                index = self._text_frame(unique).index
+            found, _ = self._match_index(index, region)
+        return take_matches(registry, query, found, indices)
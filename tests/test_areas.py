@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import shapely
+from numpy import testing
+
+from stadfangaskra import lookup
+from stadfangaskra.areas import ServiceAreaIndex
+
+
+def _index(cell_size: float = 0.01) -> ServiceAreaIndex:
+    table = pd.DataFrame(
+        {
+            "municipality": ["Reykjavík", "Kópavogur"],
+            "postcode": ["101", "201"],
+            "municipality_code": [0, 1000],
+            # the second area wraps around the first, with a hole
+            "geometry": shapely.to_wkb(
+                [
+                    shapely.box(0, 0, 0.015, 0.015),
+                    shapely.box(0, 0, 0.05, 0.03).difference(
+                        shapely.box(0, 0, 0.015, 0.015)
+                    ),
+                ]
+            ),
+        }
+    )
+    return ServiceAreaIndex(table, cell_size=cell_size)
+
+
+def test_service_area_index() -> None:
+    lon = np.array([0.001, 0.014, 0.016, 0.04, 0.06, -1, np.nan])
+    lat = np.array([0.001, 0.014, 0.001, 0.02, 0.02, 0.01, 0.01])
+    expected = [0, 0, 1, 1, -1, -1, -1]
+    for cell_size in [0.001, 0.01, 1]:
+        index = _index(cell_size)
+        assert len(index) == 2
+        testing.assert_array_equal(index.locate(lon, lat), expected)
+    # edge and covered cells
+    assert {-2, 0, 1} <= set(_index(0.005).labels)
+
+    empty = ServiceAreaIndex(_index().table.head(0).assign(geometry=[]))
+    testing.assert_array_equal(empty.locate(lon, lat), [-1] * len(lon))
+
+
+def test_locate() -> None:
+    res = lookup.locate([-21.92913, -18.09, -17.0, np.nan], [64.14558, 65.68, 64.8, 0])
+    assert list(res.columns) == ["municipality", "postcode", "municipality_code"]
+    testing.assert_array_equal(res.postcode.values, ["101", "600", "", ""])
+    testing.assert_array_equal(
+        res.municipality.values, ["Reykjavík", "Akureyri", "", ""]
+    )
+    testing.assert_array_equal(res.municipality_code.isna().values, [0, 0, 1, 1])
+
+
+def test_locate_registry_points() -> None:
+    sample = lookup.df.sample(5000, random_state=0)
+    res = lookup.locate(sample.geometry.x.values, sample.geometry.y.values)
+    testing.assert_array_equal(res.postcode.values, sample.postcode.values)
+    testing.assert_array_equal(
+        res.municipality_code.values.astype(int),
+        sample.municipality_code.values.astype(int),
+    )
@@ -0,0 +1,80 @@
+import pyarrow as pa
+import pytest
+from numpy import testing
+from shapely import wkb
+
+import stadfangaskra
+from stadfangaskra import Lookup
+
+
+def test_query_arrow_text(address_df) -> None:
+    addresses = address_df.address.tolist()
+    data = pa.chunked_array([addresses[:5], addresses[5:] + [None]])
+    res = stadfangaskra.lookup.query_arrow(data)
+    assert res.column_names[0] == "query"
+    assert pa.types.is_dictionary(res.schema.field("postcode").type)
+    assert pa.types.is_floating(res.schema.field("lon").type)
+
+    expected = stadfangaskra.lookup.query(addresses)
+    testing.assert_array_equal(
+        res["postcode"].to_pandas().astype(object).fillna("").values[:-1],
+        expected.postcode.values,
+    )
+    assert res["postcode"][len(addresses)].as_py() is None
+
+
+def test_query_arrow_matches_once(monkeypatch, structured_df) -> None:
+    # rows are taken from the Arrow table, no data frame result is built
+    lookup = stadfangaskra.lookup
+    for name in ["query", "query_dataframe", "_take"]:
+        monkeypatch.setattr(lookup, name, None)
+    res = lookup.query_arrow(pa.array(["Funafold 95", None]))
+    assert res["house_nr"].to_pylist() == ["95", None]
+    res = lookup.query_arrow(pa.Table.from_pandas(structured_df))
+    assert res["postcode"].to_pylist() == ["101", "201", "101"]
+
+
+def test_query_arrow_duplicates() -> None:
+    data = pa.array(["Funafold 95", "Hagasmári 1, 201 Kópavogi", "Funafold 95"])
+    res = stadfangaskra.lookup.query_arrow(data)
+    testing.assert_array_equal(res["house_nr"].to_pylist(), ["95", "1", "95"])
+
+
+def test_query_arrow_structured(structured_df) -> None:
+    data = pa.Table.from_pandas(structured_df, preserve_index=False)
+    res = stadfangaskra.lookup.query_arrow(data, geometry_format="wkb")
+    testing.assert_array_equal(
+        res["street_nominative"].to_pylist(), ["Laugavegur", "Hagasmári", "Laugavegur"]
+    )
+    testing.assert_array_equal(res["someother_col"].to_pylist(), ["a", "b", "c"])
+    point = wkb.loads(res["geometry"][0].as_py())
+    assert point.y == pytest.approx(64.1456, abs=1e-3)
+
+
+def test_query_arrow_query_column() -> None:
+    data = pa.table({"id": [1, 2], "address": ["Funafold 95", None]})
+    res = stadfangaskra.lookup.query_arrow(data)
+    testing.assert_array_equal(res["postcode"].to_pylist(), ["112", None])
+    testing.assert_array_equal(res["id"].to_pylist(), [1, 2])
+    with pytest.raises(AttributeError):
+        stadfangaskra.lookup.query_arrow(data, query_column="text")
+
+
+def test_query_arrow_nothing_to_query() -> None:
+    lookup = stadfangaskra.lookup
+    assert lookup.query_arrow(pa.array([None], type=pa.string())).num_rows == 1
+    data = pa.table({"postcode": [None], "street": ["Laugavegur"], "house_nr": ["1"]})
+    assert lookup.query_arrow(data)["fid"].null_count == 1
+
+
+def test_query_arrow_unknown_geometry_format() -> None:
+    with pytest.raises(ValueError):
+        stadfangaskra.lookup.query_arrow(pa.array(["Funafold 95"]), "geojson")
+
+
+def test_query_arrow_without_geometry() -> None:
+    res = Lookup(columns=["fid"], postcodes=[112]).query_arrow(
+        pa.array(["Funafold 95"])
+    )
+    assert "lon" not in res.column_names
+    assert res["fid"][0].as_py()
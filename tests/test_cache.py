@@ -0,0 +1,132 @@
+#  pylint: disable=redefined-outer-name,protected-access
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+from numpy import testing
+
+from stadfangaskra import Lookup, ResultCache, lookup, tree
+from stadfangaskra.arrow import SNAPSHOT_KEY
+from stadfangaskra.tree import MATCHING_VERSION
+
+queries = [
+    "Laugavegur 22, 101 Reykjavík",
+    "Hagasmári 1, 201 Kópavogi",
+    "Laugavegur 22, 101 Reykjavík",
+    "Hagasmári 999, 201 Kópavogi",
+    "Reykjavík",
+    "",
+]
+
+
+@pytest.fixture
+def cache(tmp_path):
+    with ResultCache(tmp_path / "cache.sqlite") as c:
+        yield c
+
+
+def test_query_cached(cache, monkeypatch) -> None:
+    expected = lookup.query(queries)
+    pd.testing.assert_frame_equal(lookup.query(queries, cache=cache), expected)
+    # one entry per distinct query
+    assert len(cache) == 5
+
+    resolved = []
+    resolve = lookup._resolve
+
+    def counting_resolve(index, region, fallback):
+        resolved.append(len(index))
+        return resolve(index, region, fallback)
+
+    monkeypatch.setattr(lookup, "_resolve", counting_resolve)
+    pd.testing.assert_frame_equal(lookup.query(queries, cache=cache), expected)
+    assert not resolved
+
+    # only misses reach the matching engine
+    res = lookup.query(queries + ["Þórsgata 1, 101 Reykjavík"], cache=cache)
+    assert resolved == [1]
+    assert res.street_nominative.iloc[-1] == "Þórsgata"
+
+
+def test_query_cached_options(cache) -> None:
+    for kwargs in [{"fallback": True}, {"region": "Höfuðborgarsvæðið"}]:
+        pd.testing.assert_frame_equal(
+            lookup.query(queries, cache=cache, **kwargs),
+            lookup.query(queries, **kwargs),
+        )
+        pd.testing.assert_frame_equal(
+            lookup.query(queries, cache=cache, **kwargs),
+            lookup.query(queries, **kwargs),
+        )
+    assert len(cache) == 10
+
+
+def test_query_dataframe_cached(cache, structured_df) -> None:
+    expected = lookup.query_dataframe(structured_df, fallback=True)
+    for _ in range(2):
+        pd.testing.assert_frame_equal(
+            lookup.query_dataframe(structured_df, fallback=True, cache=cache),
+            expected,
+        )
+    res = structured_df.stadfangaskra.hydrate(cache=cache)
+    pd.testing.assert_frame_equal(res, structured_df.stadfangaskra.hydrate())
+
+
+def test_cache_persists(tmp_path) -> None:
+    path = tmp_path / "cache.sqlite"
+    with ResultCache(path) as cache:
+        lookup.query(queries, cache=cache)
+    with ResultCache(path) as cache:
+        assert len(cache) == 5
+        cache.clear()
+        assert len(cache) == 0
+
+
+def test_registry_release_invalidates(cache) -> None:
+    keys = ["a", "b"]
+    cache.put("v1", "lookup", keys, np.array([1, 2]), np.array([-1, -1]))
+    found, positions, _ = cache.get("v1", "lookup", ["b", "c"])
+    testing.assert_array_equal(found, [True, False])
+    testing.assert_array_equal(positions, [2, -1])
+
+    assert not cache.get("v1", "lookup", [])[0].size
+
+    found, _, _ = cache.get("v2", "lookup", keys)
+    assert not found.any()
+    assert len(cache) == 0
+
+
+def test_lookup_versions(tmp_path) -> None:
+    region = Lookup(region="Höfuðborgarsvæðið")
+    assert region.registry_version == lookup.registry_version
+    assert region.version != lookup.version
+
+    region.save(tmp_path / "lookup.arrow")
+    loaded = Lookup.load(tmp_path / "lookup.arrow")
+    assert loaded.version == region.version
+    assert loaded.registry_version == region.registry_version
+
+    # snapshots without versions are versioned by their content
+    table = region._snapshot()
+    state = json.loads(table.schema.metadata[SNAPSHOT_KEY.encode()])
+    del state["registry_version"], state["lookup_version"]
+    table = table.replace_schema_metadata({SNAPSHOT_KEY: json.dumps(state)})
+    old = Lookup._from_snapshot(table)
+    assert old.version == Lookup._from_snapshot(table).version
+    assert old.version not in (region.version, lookup.version)
+
+
+def test_lookup_versions_matching(tmp_path, monkeypatch) -> None:
+    small = Lookup(postcodes=["101"])
+    table = small._snapshot()
+    state = json.loads(table.schema.metadata[SNAPSHOT_KEY.encode()])
+    assert state["matching_version"] == MATCHING_VERSION
+
+    # a new matching version or new lookup tables invalidate cached results
+    monkeypatch.setattr(tree, "MATCHING_VERSION", MATCHING_VERSION + 1)
+    assert Lookup(postcodes=["101"]).version != small.version
+    assert Lookup._from_snapshot(table).version != small.version
+    monkeypatch.setattr(tree, "MATCHING_VERSION", MATCHING_VERSION)
+    monkeypatch.setattr(tree, "tables_version", lambda: "rebuilt")
+    assert Lookup(postcodes=["101"]).version != small.version
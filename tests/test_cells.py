@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+from numpy import testing
+
+from stadfangaskra import lookup
+from stadfangaskra.cells import CELL_COLS, cell_columns, grid_cells, quadkeys
+
+
+def test_quadkeys() -> None:
+    keys = quadkeys([-21.92913, 0.0, np.nan], [64.14558, 0.0, 64.0], 12)
+    # quadkey "031102000110" as a base 4 number
+    assert keys[0] == int("031102000110", 4)
+    # the tile to the south east of the origin
+    assert keys[1] == int("3" + "0" * 11, 4)
+    assert keys.isna().tolist() == [False, False, True]
+    # a tile contains its children
+    testing.assert_array_equal(
+        quadkeys([-21.92913], [64.14558], 18).astype(int) >> 12, keys[:1].astype(int)
+    )
+
+
+def test_grid_cells() -> None:
+    cells = grid_cells([357466.0, 357499.9, np.nan], [408051.0, 408099.0, 1.0], 100)
+    testing.assert_array_equal(cells[:2].astype(int), [3574000408000] * 2)
+    assert cells.isna().tolist() == [False, False, True]
+    assert grid_cells([357466.0], [408051.0], 1000)[0] == 3570000408000
+
+
+def test_registry_cells() -> None:
+    sample = lookup.df.sample(1000, random_state=0)
+    cells = cell_columns(
+        sample.geometry.x.values,
+        sample.geometry.y.values,
+        sample.x.values,
+        sample.y.values,
+    )
+    for c in CELL_COLS:
+        assert sample[c].dtype == pd.Int64Dtype()
+        testing.assert_array_equal(sample[c].values, cells[c])
+
+
+def test_hydrate_cells(address_df, structured_df) -> None:
+    res = address_df.stadfangaskra.hydrate(cells=True)
+    assert list(res.columns[-len(CELL_COLS) :]) == CELL_COLS
+    assert not set(CELL_COLS) & set(address_df.stadfangaskra.hydrate().columns)
+    matched = res.street_nominative != ""
+    assert res.loc[matched, CELL_COLS].notna().all().all()
+    assert res.loc[~matched, CELL_COLS].isna().all().all()
+
+    res = structured_df.stadfangaskra.hydrate(cells=True)
+    assert set(CELL_COLS) <= set(res.columns)
+    assert not set(CELL_COLS) & set(structured_df.stadfangaskra.hydrate().columns)
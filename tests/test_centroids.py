@@ -0,0 +1,82 @@
+import pandas as pd
+import pytest
+from numpy import testing
+
+from stadfangaskra import lookup
+from stadfangaskra.centroids import CentroidIndex
+
+
+@pytest.fixture(scope="module")
+def centroids():
+    return CentroidIndex(
+        pd.DataFrame(
+            {
+                "level": ["street", "street", "postcode", "municipality"],
+                "municipality": ["Reykjavík", "Reykjavík", "Reykjavík", "Reykjavík"],
+                "postcode": ["101", "", "101", ""],
+                "street_nominative": ["Laugavegur", "Laugavegur", "", ""],
+                "lon": [1.0, 2.0, 3.0, 4.0],
+                "lat": [1.0, 2.0, 3.0, 4.0],
+                "minx": [0.0] * 4,
+                "miny": [0.0] * 4,
+                "maxx": [5.0] * 4,
+                "maxy": [5.0] * 4,
+            }
+        )
+    )
+
+
+def test_locate(centroids) -> None:
+    positions, level = centroids.locate(
+        ["Reykjavík", "Reykjavík", "Reykjavík", "Reykjavík", "Reykjavík", ""],
+        ["101", "", "101", "105", "", ""],
+        ["Laugavegur", "Laugavegur", "Hverfisgata", "", "", "Laugavegur"],
+    )
+    testing.assert_array_equal(positions, [0, 1, 2, 3, 3, -1])
+    testing.assert_array_equal(level, [1, 1, 2, 3, 3, -1])
+
+
+def test_query_fallback() -> None:
+    queries = [
+        "Laugavegur 22, 101 Reykjavík",
+        "Hagasmári 999, 201 Kópavogi",
+        "Reykjavík",
+        "Hafnarbraut 1",
+        "",
+    ]
+    res = lookup.query(queries, fallback=True)
+    testing.assert_array_equal(res.precision.cat.codes.values, [0, 1, 3, -1, -1])
+    assert res.precision.cat.ordered
+    assert res.geometry.isna().tolist() == [False, False, False, True, True]
+    # only the location is filled in, not the address
+    testing.assert_array_equal(res.street_nominative.values, ["Laugavegur"] + [""] * 4)
+
+    idx = lookup.centroid_index
+    pos = idx.index.get_loc(("Kópavogur", "201", "Hagasmári"))
+    assert res.geometry.iloc[1].x == pytest.approx(idx.lon[pos])
+
+    # the default is unchanged
+    res = lookup.query(queries)
+    assert "precision" not in res.columns
+    assert res.geometry.isna().sum() == 4
+
+
+def test_query_dataframe_fallback() -> None:
+    q = pd.DataFrame(
+        {
+            "postcode": [101, 101, 999],
+            "street": ["Laugavegur", "Laugavegur", "Laugavegur"],
+            "house_nr": ["22", "99999", "1"],
+        }
+    )
+    res = lookup.query_dataframe(q, fallback=True)
+    testing.assert_array_equal(res.precision.cat.codes.values, [0, 1, -1])
+
+
+def test_hydrate_fallback() -> None:
+    df = pd.DataFrame({"address": ["Hagasmári 999, 201 Kópavogi", "Reykjavík"]})
+    res = df.stadfangaskra.hydrate(fallback=True)
+    testing.assert_array_equal(
+        res.precision.astype(object).values, ["street", "municipality"]
+    )
+    assert res.geometry.notna().all()
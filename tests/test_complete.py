@@ -0,0 +1,76 @@
+from numpy import testing
+
+import stadfangaskra
+from stadfangaskra import Lookup
+from stadfangaskra.prefix import PrefixIndex, house_nr_key
+
+
+def test_house_nr_key() -> None:
+    assert sorted(["10", "2A", "", "2", "1"], key=house_nr_key) == [
+        "1",
+        "2",
+        "2A",
+        "10",
+        "",
+    ]
+
+
+def test_complete_street_names() -> None:
+    res = stadfangaskra.lookup.complete("laugav")
+    assert len(res)
+    assert res.street_nominative.str.startswith("Laugav").all()
+    assert "Laugavegur" in set(res.street_nominative)
+    # one address per street and postcode
+    assert not res.duplicated(["street_nominative", "postcode"]).any()
+
+
+def test_complete_dative_street_name() -> None:
+    res = stadfangaskra.lookup.complete("Hagasmára")
+    testing.assert_array_equal(res.street_nominative.values, ["Hagasmári"])
+
+
+def test_complete_house_numbers() -> None:
+    res = stadfangaskra.lookup.complete("Laugavegi 2", limit=5)
+    testing.assert_array_equal(res.house_nr.values, ["2", "20", "20A", "20B", "21"])
+    assert set(res.street_nominative) == {"Laugavegur"}
+
+    res = stadfangaskra.lookup.complete("Laugavegur ", limit=3, postcode=101)
+    testing.assert_array_equal(res.house_nr.values, ["1", "1B", "2"])
+
+
+def test_complete_postcode() -> None:
+    res = stadfangaskra.lookup.complete("Aðalstræti 2", limit=3)
+    testing.assert_array_equal(res.postcode.values, ["101", "470", "600"])
+    res = stadfangaskra.lookup.complete("Aðalstræti 2", limit=3, postcode="600")
+    testing.assert_array_equal(res.house_nr.values, ["2", "2B", "20A"])
+
+
+def test_complete_no_match() -> None:
+    lookup = stadfangaskra.lookup
+    assert len(lookup.complete("")) == 0
+    assert len(lookup.complete("xyzzy")) == 0
+    assert len(lookup.complete("Laugavegur 22", limit=0)) == 0
+
+
+def test_complete_street_names_in_postcode() -> None:
+    res = stadfangaskra.lookup.complete("L", limit=3, postcode=101)
+    assert len(res) == 3
+    assert set(res.postcode) == {"101"}
+
+
+def test_complete_filtered_lookup() -> None:
+    res = Lookup(postcodes=[201]).complete("Haga")
+    assert set(res.postcode) == {"201"}
+
+
+def test_prefix_index() -> None:
+    index = PrefixIndex(
+        ["Aðalgata", "Aðalgata", "Aðalgata", "Bakki"],
+        ["10", "2", "1", ""],
+        ["101", "101", "101", "600"],
+        aliases={"Aðalgötu": "Aðalgata", "Holti": "Holt"},
+    )
+    testing.assert_array_equal(index.search("aðalgötu "), [2, 1, 0])
+    testing.assert_array_equal(index.search("aðalgata 1"), [2, 0])
+    testing.assert_array_equal(index.search("b"), [3])
+    assert len(index.search("holt")) == 0
@@ -0,0 +1,57 @@
+import pandas as pd
+import pytest
+
+dd = pytest.importorskip("dask.dataframe")
+distributed = pytest.importorskip("distributed")
+
+# pylint: disable=wrong-import-position
+import stadfangaskra  # noqa: E402
+from stadfangaskra import Lookup  # noqa: E402
+from stadfangaskra.distributed import hydrate_dask  # noqa: E402
+
+
+def test_hydrate_dask_text(address_df) -> None:
+    ddf = dd.from_pandas(address_df, npartitions=3)
+    res = ddf.stadfangaskra.hydrate()
+    assert list(res.columns) == list(address_df.stadfangaskra.hydrate().columns)
+    pd.testing.assert_frame_equal(
+        res.compute(scheduler="sync"),
+        address_df.stadfangaskra.hydrate(),
+        check_dtype=False,
+    )
+
+
+def test_hydrate_dask_structured(structured_df) -> None:
+    lookup = Lookup(region="Höfuðborgarsvæðið")
+    ddf = dd.from_pandas(structured_df, npartitions=2)
+    res = hydrate_dask(ddf, lookup=lookup).compute(scheduler="sync")
+    expected = structured_df.stadfangaskra.hydrate(lookup=lookup)
+    # qidx and order are numbered within each partition
+    pd.testing.assert_frame_equal(
+        res.drop(["qidx", "order"], axis=1),
+        expected.drop(["qidx", "order"], axis=1),
+        check_dtype=False,
+    )
+
+
+def test_hydrate_dask_meta_without_lookup(address_df) -> None:
+    stadfangaskra.get_lookup.cache_clear()
+    ddf = dd.from_pandas(address_df, npartitions=3)
+    res = ddf.stadfangaskra.hydrate(fallback=True, crs=3057, cells=True)
+    # the default lookup is only built when the partitions are computed
+    assert stadfangaskra.get_lookup.cache_info().currsize == 0
+    expected = address_df.stadfangaskra.hydrate(fallback=True, crs=3057, cells=True)
+    assert list(res.columns) == list(expected.columns)
+    meta = res._meta  # pylint: disable=protected-access
+    assert meta["geometry"].values.crs == expected["geometry"].values.crs
+
+
+def test_hydrate_dask_builds_lookup_once_per_worker(address_df) -> None:
+    ddf = dd.from_pandas(pd.concat([address_df] * 20, ignore_index=True), 8)
+    with distributed.LocalCluster(
+        n_workers=2, threads_per_worker=1, processes=True, dashboard_address=None
+    ) as cluster, distributed.Client(cluster) as client:
+        res = ddf.stadfangaskra.hydrate().compute()
+        builds = client.run(lambda: stadfangaskra.get_lookup.cache_info().misses)
+    assert len(res) == len(address_df) * 20
+    assert all(n == 1 for n in builds.values())
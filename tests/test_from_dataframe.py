@@ -0,0 +1,94 @@
+import pickle
+
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+from numpy import testing
+
+from stadfangaskra import Lookup, lookup, static
+from stadfangaskra.synthetic import synthetic_registry
+
+queries = [
+    "Laugavegur 22, 101 Reykjavík",
+    "Hagasmári 999, 201 Kópavogi",
+    "Smáralind",
+    "Laugavegi 22",
+    "Funafold 95",
+    "Reykjavík",
+    "Heimilisfang vantar",
+]
+
+
+@pytest.fixture(scope="module")
+def synthetic():
+    return synthetic_registry(5000, seed=1)
+
+
+def test_from_dataframe_registry() -> None:
+    custom = Lookup.from_dataframe(pq.read_table(static.data_path).to_pandas())
+    assert custom.town_street_to_postcode == lookup.town_street_to_postcode
+    assert custom.street_dative == lookup.street_dative
+    for kwargs in [{}, {"fallback": True}, {"crs": 3057}]:
+        pd.testing.assert_frame_equal(
+            custom.query(queries, **kwargs), lookup.query(queries, **kwargs)
+        )
+
+
+def test_from_dataframe_inputs() -> None:
+    subset = lookup.df.loc[lookup.df.postcode == "101"]
+    # indexed, with a geometry column
+    custom = Lookup.from_dataframe(subset.drop(["x", "y"], axis=1))
+    res = custom.query(queries[:2])
+    testing.assert_array_equal(res.street_nominative.values, ["Laugavegur", ""])
+    # the native coordinates are transformed from WGS84
+    testing.assert_allclose(custom.df.x.values, subset.x.values, atol=1)
+
+    patched = subset.reset_index(drop=True)
+    patched = pd.concat([patched.iloc[:1], patched]).assign(special_name="")
+    custom = Lookup.from_dataframe(patched, compact=True)
+    assert len(custom.df) == len(subset)
+    assert len(custom.landmarks) == 0
+    assert custom.version != Lookup.from_dataframe(subset).version
+
+    with pytest.raises(ValueError):
+        Lookup.from_dataframe(patched.drop("house_nr", axis=1))
+    with pytest.raises(ValueError):
+        Lookup.from_dataframe(pd.DataFrame(patched[static.INDEX_COLS]))
+
+
+def test_synthetic_registry(synthetic) -> None:
+    assert len(synthetic) == 5000
+    assert not synthetic.duplicated(static.INDEX_COLS).any()
+    pd.testing.assert_frame_equal(synthetic, synthetic_registry(5000, seed=1))
+    assert set(static.load_registry(postcodes=[101]).columns) <= set(
+        synthetic.columns
+    ) | {"geometry"}
+
+
+def test_synthetic_lookup(synthetic) -> None:
+    custom = Lookup.from_dataframe(synthetic)
+    sample = synthetic.sample(500, random_state=0)
+    texts = sample.street_nominative + " " + sample.house_nr + ", " + sample.postcode
+    testing.assert_array_equal(custom.query(texts.tolist()).fid, sample.fid)
+    structured = pd.DataFrame(
+        {
+            "postcode": sample.postcode.values,
+            "street": sample.street_dative.values,
+            "house_nr": sample.house_nr.values,
+        }
+    )
+    testing.assert_array_equal(custom.query_dataframe(structured).fid, sample.fid)
+
+    named = synthetic[synthetic.special_name != ""].iloc[0]
+    assert custom.query([named.special_name]).fid.iloc[0] == named.fid
+
+    res = custom.query(
+        [f"{named.street_nominative} 9999, {named.postcode}"], fallback=True
+    )
+    assert res.precision.iloc[0] == "street"
+    res = custom.locate(sample.lon.values, sample.lat.values)
+    testing.assert_array_equal(res.postcode.values, sample.postcode.values)
+
+    # still derived after a round trip
+    restored = pickle.loads(pickle.dumps(custom))
+    assert restored.centroid_index.index.equals(custom.centroid_index.index)
@@ -0,0 +1,161 @@
+import numpy as np
+import pandas as pd
+import pytest
+from numpy import testing
+
+from stadfangaskra import ResultCache, lookup
+from stadfangaskra.housenr import HouseNumberIndex, parse_house_nrs, parse_house_range
+
+
+def _index() -> HouseNumberIndex:
+    house_nr = ["2", "4", "8", "1", "3", "9", "4B", "2", "4", "1", "1", "X"]
+    number = parse_house_nrs(house_nr)[0].astype(float)
+    return HouseNumberIndex(
+        ["101"] * 9 + ["101", "200", "101"],
+        ["A"] * 7 + ["B", "B", "C", "C", "A"],
+        house_nr,
+        number,
+        -number,
+    )
+
+
+def test_parse_house_nrs() -> None:
+    number, suffix = parse_house_nrs(["22", "22b", "Hús", "", None])
+    testing.assert_array_equal(number, [22, 22, -1, -1, -1])
+    testing.assert_array_equal(suffix, ["", "B", "", "", ""])
+    assert parse_house_range("10-30,") == (10, 30)
+    assert parse_house_range("30-10A") == (10, 30)
+    assert parse_house_range("22") is None
+
+
+def test_house_nr_search() -> None:
+    index = _index()
+    before, after, t = index.search(
+        ["101"] * 4 + ["", ""],
+        ["A", "A", "A", "D", "B", "C"],
+        ["6", "4A", "0", "6", "3", "2"],
+    )
+    # 6 is between 4B and 8, 4A between 4 and 4B, 0 before the first even
+    testing.assert_array_equal(before, [6, 1, -1, -1, 7, -1])
+    testing.assert_array_equal(after, [2, 6, 0, -1, 8, -1])
+    testing.assert_array_equal(t, [0.5, np.nan, np.nan, np.nan, 0.5, np.nan])
+
+
+def test_house_nr_approximate() -> None:
+    index = _index()
+    args = (["101"] * 3 + [""], ["A", "A", "A", "B"], ["7", "10", "3", "3"])
+    pos, codes, points = index.approximate(*args, mode="nearest")
+    testing.assert_array_equal(pos, [5, 2, 4, 7])
+    testing.assert_array_equal(codes, [1, 1, 1, 1])
+    assert np.isnan(points).all()
+
+    pos, codes, points = index.approximate(*args, mode="interpolate")
+    # 7 is 2/3 of the way from 3 to 9, 3 on the even side of B is between 2 and 4
+    testing.assert_array_equal(pos, [5, 2, 4, 7])
+    testing.assert_array_equal(codes, [2, 1, 1, 2])
+    testing.assert_allclose(points[[0, 3], :2], [[7, -7], [3, -3]])
+    assert np.isnan(points[:, 2:]).all()
+
+    with pytest.raises(ValueError):
+        index.approximate(*args, mode="closest")
+
+
+def test_house_nr_within_range() -> None:
+    owner, pos = _index().within_range(
+        ["101", "101", "", "101"], ["A", "A", "B", "D"], [2, 5, 1, 1], [4, 5, 9, 9]
+    )
+    testing.assert_array_equal(owner, [0, 0, 0, 0, 2, 2])
+    testing.assert_array_equal(pos, [0, 4, 1, 6, 7, 8])
+
+
+queries = [
+    "Laugavegur 14, 101 Reykjavík",
+    "Laugavegur 22, 101 Reykjavík",
+    "Laugavegur 22Z, 101 Reykjavík",
+    "Funafold 96",
+    "Laugavegur 999",
+    "Heimilisfang vantar",
+]
+
+
+def test_query_house_nr_fallback() -> None:
+    exact = lookup.query(queries)
+    assert "house_nr_match" not in exact.columns
+
+    res = lookup.query(queries, house_nr_fallback="nearest")
+    testing.assert_array_equal(
+        res.house_nr_match.astype(object).fillna("").values,
+        ["nearest", "exact", "nearest", "nearest", "", ""],
+    )
+    testing.assert_array_equal(res.house_nr.values, ["12B", "22", "22A", "62", "", ""])
+    testing.assert_array_equal(
+        res.postcode.values, ["101", "101", "101", "112", "", ""]
+    )
+
+    res = lookup.query(queries, house_nr_fallback="interpolate", crs=3057)
+    assert res.house_nr_match.values[0] == "interpolated"
+    # placed halfway between 12B and 16
+    neighbours = lookup.query(
+        ["Laugavegur 12B, 101 Reykjavík", "Laugavegur 16, 101 Reykjavík"], crs=3057
+    )
+    testing.assert_allclose(res.x.values[0], neighbours.x.mean())
+    testing.assert_allclose(res.geometry.x.values[0], neighbours.geometry.x.mean())
+    pd.testing.assert_frame_equal(
+        res.drop(["x", "y", "geometry"], axis=1).iloc[1:],
+        lookup.query(queries, house_nr_fallback="nearest", crs=3057)
+        .drop(["x", "y", "geometry"], axis=1)
+        .iloc[1:],
+    )
+
+    with pytest.raises(ValueError):
+        lookup.query(queries, house_nr_fallback="closest")
+
+
+@pytest.mark.parametrize("house_nr_fallback", [None, "nearest"])
+def test_query_without_house_nr(house_nr_fallback) -> None:
+    # postcodes aren't taken for house numbers
+    res = lookup.query(
+        ["Höfði, 621 Dalvík", "Hrauneyjar, 851 Hella"],
+        house_nr_fallback=house_nr_fallback,
+    )
+    testing.assert_array_equal(res.postcode.values, ["621", "851"])
+    testing.assert_array_equal(res.street_nominative.values, ["Höfði", "Hrauneyjar"])
+    assert lookup.text_to_vec("Höfði, 621 Dalvík", True) == (
+        "Dalvík",
+        "621",
+        "Höfði",
+        "",
+    )
+    # postcode only queries are parsed as without the fallback
+    for text in ["101 Reykjavík", "621", "Dalvík 621"]:
+        assert lookup.text_to_vec(text, True) == lookup.text_to_vec(text)
+    assert lookup.text_to_vec("Laugavegur 22Z, 101 Reykjavík", True)[1:] == (
+        "101",
+        "Laugavegur",
+        "22Z",
+    )
+    # without a postcode the number isn't kept
+    assert lookup.text_to_vec("Höfði 9999", True)[3] == ""
+
+
+def test_query_house_nr_fallback_cached(tmp_path, address_df) -> None:
+    with ResultCache(tmp_path / "cache.sqlite") as cache:
+        for _ in range(2):
+            pd.testing.assert_frame_equal(
+                lookup.query(queries, house_nr_fallback="interpolate", cache=cache),
+                lookup.query(queries, house_nr_fallback="interpolate"),
+            )
+    res = address_df.stadfangaskra.hydrate(house_nr_fallback="nearest")
+    assert "house_nr_match" in res.columns
+
+
+def test_query_house_range() -> None:
+    res = lookup.query_house_range("Laugavegur 10-30, 101 Reykjavík")
+    assert set(res.postcode) == {"101"}
+    assert res.house_nr.iloc[0] == "10"
+    assert res.house_nr.iloc[-1] == "30B"
+    assert "22A" in res.house_nr.values
+
+    res = lookup.query_house_ranges(["Funafold 91-95", "Funafold 3", "10-30", None])
+    testing.assert_array_equal(res.qidx.values, [0, 0, 0, 1])
+    testing.assert_array_equal(res.house_nr.values, ["91", "93", "95", "3"])
@@ -0,0 +1,59 @@
+import pandas as pd
+from numpy import testing
+
+from stadfangaskra import lookup
+from stadfangaskra.keys import AMBIGUOUS, EXACT, NONE, PARTIAL, KeyIndex
+from stadfangaskra.static import INDEX_COLS
+
+
+def _index(tuples) -> pd.MultiIndex:
+    return pd.MultiIndex.from_tuples(tuples, names=INDEX_COLS)
+
+
+def test_packed_keys() -> None:
+    index = KeyIndex(lookup.df.index)
+    # every address is found at its own position by its packed key
+    positions = index.match(index.encode(lookup.df.index))
+    testing.assert_array_equal(positions, range(len(lookup.df)))
+    # values missing from the registry can't be encoded
+    idx = _index([("Reykjavík", "101", "Laugavegur", "99999")])
+    testing.assert_array_equal(index.encode(idx), [-1])
+    testing.assert_array_equal(index.match(index.encode(idx)), [-1])
+
+
+def test_match_index() -> None:
+    index = KeyIndex(
+        _index(
+            [
+                ("Kópavogur", "201", "Hagasmári", "1"),
+                ("Reykjavík", "101", "Laugavegur", "22"),
+                ("Reykjavík", "101", "Laugavegur", "24"),
+            ]
+        )
+    )
+    positions, status = index.match_index(
+        _index(
+            [
+                ("Reykjavík", "101", "Laugavegur", "22"),
+                ("", "", "Hagasmári", "1"),
+                ("", "101", "Laugavegur", ""),
+                ("Reykjavík", "101", "Laugavegur", "99"),
+                ("", "", "", ""),
+            ]
+        )
+    )
+    testing.assert_array_equal(positions, [1, 0, -1, -1, -1])
+    testing.assert_array_equal(status, [EXACT, PARTIAL, AMBIGUOUS, NONE, NONE])
+    # partial matches outside the postcodes aren't accepted
+    positions, status = index.match_index(
+        _index([("", "", "Hagasmári", "1")]), postcodes=["101"]
+    )
+    testing.assert_array_equal(positions, [-1])
+    testing.assert_array_equal(status, [NONE])
+
+
+def test_empty_index() -> None:
+    index = KeyIndex(lookup.df.index[:0])
+    positions, status = index.match_index(lookup.df.index[:2])
+    testing.assert_array_equal(positions, [-1, -1])
+    testing.assert_array_equal(status, [NONE, NONE])
@@ -0,0 +1,72 @@
+import pandas as pd
+import pytest
+from numpy import testing
+
+from stadfangaskra import lookup
+from stadfangaskra.landmarks import LANDMARK_COLS, LandmarkIndex, normalize_name
+
+table = pd.DataFrame(
+    [
+        ["Smáralind", "Kópavogur", "201", "Hagasmári", "1"],
+        ["Ráðhús Reykjavíkur", "Reykjavík", "101", "Tjarnargata", "11"],
+        ["Jónshús", "Garður", "250", "Gerðavegur", "7"],
+        ["Jónshús", "Selfoss", "806", "Hamarsvegur", "8"],
+    ],
+    columns=LANDMARK_COLS,
+)
+
+
+def test_normalize_name() -> None:
+    assert normalize_name("  Ráðhús   REYKJAVÍKUR, ") == "ráðhús reykjavíkur"
+
+
+def test_landmark_index() -> None:
+    index = LandmarkIndex(table)
+    assert len(index) == 3
+    assert index.max_words == 2
+    assert index.get("smáralind") == ("Kópavogur", "201", "Hagasmári", "1")
+    # ambiguous names need a municipality or postcode
+    assert index.get("jónshús") is None
+    assert index.get("jónshús", postcode="806")[2] == "Hamarsvegur"
+    assert index.get("jónshús", municipality="Garður")[2] == "Gerðavegur"
+    assert index.get("smáralind", postcode="101") is None
+    assert index.resolve(["Við", "Ráðhús", "Reykjavíkur."])[2] == "Tjarnargata"
+    assert index.resolve(["Heimilisfang", "vantar"]) is None
+    pd.testing.assert_frame_equal(
+        LandmarkIndex(index.to_frame()).to_frame(), index.to_frame()
+    )
+
+
+def test_landmark_index_resolve_suffix() -> None:
+    index = LandmarkIndex(table)
+    assert index.resolve_suffix(["í", "Ráðhús", "Reykjavíkur"])[2] == "Tjarnargata"
+    assert index.resolve_suffix(["Smáralind", "og"]) is None
+    # names are proper nouns when scanning text
+    assert index.resolve_suffix(["í", "smáralind"]) is None
+
+
+@pytest.mark.parametrize(
+    "query,street,house_nr,postcode",
+    [
+        ("Smáralind", "Hagasmári", "1", "201"),
+        ("smáralind, 201 Kópavogi", "Hagasmári", "1", "201"),
+        ("Alþingishúsið", "Kirkjustræti", "14", "101"),
+        ("Jónshús", "", "", ""),
+        ("Jónshús, 806", "Hamarsvegur", "8", "806"),
+        ("Hagasmári 1", "Hagasmári", "1", "201"),
+    ],
+)
+def test_query_landmarks(query, street, house_nr, postcode) -> None:
+    res = lookup.query(query)
+    testing.assert_array_equal(res.street_nominative.values, [street])
+    testing.assert_array_equal(res.house_nr.values, [house_nr])
+    testing.assert_array_equal(res.postcode.values, [postcode])
+
+
+def test_query_text_body_landmarks() -> None:
+    text = "Við hittumst í Smáralind en ég bý á Laugavegi 11, 101 Reykjavík"
+    res = lookup.query_text_body(text)
+    testing.assert_array_equal(
+        res.street_nominative.values, ["Hagasmári", "Laugavegur"]
+    )
+    testing.assert_array_equal(res.postcode.values, ["201", "101"])
@@ -1,8 +1,13 @@
-#  pylint: disable=redefined-outer-name
+#  pylint: disable=redefined-outer-name,protected-access
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
 import pytest
 from numpy import testing
 
-from stadfangaskra import lookup
+from stadfangaskra import Lookup, lookup
+from stadfangaskra.keys import MATCH_STATUSES
 
 my_text = """
 Nóatún Austurveri er að Háaleitisbraut 68, 103 Reykjavík en ég bý á Laugavegi 11, 101 Reykjavík
@@ -16,7 +21,9 @@ def test_edge_cases() -> None:
 
 def test_query_dataframe(structured_df):
     res = lookup.query_dataframe(structured_df)
-    testing.assert_array_equal(structured_df.postcode.values, res.postcode.values)
+    testing.assert_array_equal(
+        structured_df.postcode.astype(str).values, res.postcode.values
+    )
     testing.assert_array_equal(
         res.street_nominative.values, ["Laugavegur", "Hagasmári", "Laugavegur"]
     )
@@ -30,6 +37,43 @@ def test_query_text_body() -> None:
     )
 
 
+def test_iter_text_body() -> None:
+    text = " ".join([my_text] * 5)
+    batches = list(
+        lookup.iter_text_body(
+            io.BytesIO(text.encode("utf-8")), batch_size=3, chunk_size=7
+        )
+    )
+    assert [len(b) for b in batches] == [3, 3, 3, 1]
+    res = pd.concat(batches, ignore_index=True)
+    testing.assert_array_equal(res.order.values, range(10))
+    testing.assert_array_equal(
+        res.street_nominative.values, ["Háaleitisbraut", "Laugavegur"] * 5
+    )
+    pd.testing.assert_frame_equal(
+        res.drop(columns="qidx"),
+        lookup.query_text_body(text).drop(columns="qidx"),
+        check_like=True,
+    )
+
+
+def test_query_text_bodies() -> None:
+    texts = [my_text, "", "Hagasmári 1, 201 Kópavogi", my_text]
+    res = lookup.query_text_bodies(texts)
+    testing.assert_array_equal(res.document.values, [0, 0, 2, 3, 3])
+    testing.assert_array_equal(res["match"].values, [0, 1, 0, 0, 1])
+    for i, text in enumerate(texts):
+        expected = lookup.query_text_body(text)
+        testing.assert_array_equal(
+            res[res.document == i].fid.values, expected.fid.values
+        )
+    assert lookup.query_text_bodies([]).empty
+
+
+def test_query_text_body_without_addresses() -> None:
+    assert lookup.query_text_body("Engin heimilisföng hér").empty
+
+
 def test_multiple_matches() -> None:
     res = lookup.query("Hafnarbraut 1")
     print(res)
@@ -53,3 +97,105 @@ def test_weird_cases(
     testing.assert_array_equal(res.postcode, [postcode])
     testing.assert_array_equal(res.municipality, [municipality])
     testing.assert_array_equal(res.house_nr, [house_nr])
+
+
+def test_query_keeps_order_of_duplicates() -> None:
+    res = lookup.query(["Funafold 95", "Hafnarbraut 1", "Funafold 95", ""])
+    testing.assert_array_equal(res.postcode.values, ["112", "", "112", ""])
+    testing.assert_array_equal(res.order.values, [0, 1, 2, 3])
+
+
+def test_query_dataframe_does_not_modify_input(structured_df) -> None:
+    before = structured_df.copy()
+    lookup.query_dataframe(structured_df)
+    pd.testing.assert_frame_equal(structured_df, before)
+
+
+def test_query_many(address_df, structured_df) -> None:
+    addresses = address_df.address.tolist() * 3
+    expected = lookup.query(addresses)
+    pd.testing.assert_frame_equal(lookup.query_many(addresses, chunk_size=4), expected)
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        res = lookup.query_many(structured_df, executor=pool, chunk_size=1)
+    pd.testing.assert_frame_equal(res, lookup.query_dataframe(structured_df))
+
+    assert len(lookup.query_many([])) == 0
+
+
+def test_concurrent_queries(address_df) -> None:
+    addresses = address_df.address.tolist()
+    expected = lookup.query(addresses)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(lookup.query, [addresses] * 8))
+    for res in results:
+        pd.testing.assert_frame_equal(res, expected)
+
+
+def test_validate() -> None:
+    queries = [
+        "Laugavegur 22, 101 Reykjavík",
+        "Hagasmári 1",
+        "Hafnarbraut 1",
+        "Blablagata 1",
+        "",
+    ]
+    status, fid = lookup.validate(queries)
+    testing.assert_array_equal(
+        [MATCH_STATUSES[s] for s in status],
+        ["exact", "partial", "ambiguous", "none", "none"],
+    )
+    res = lookup.query(queries)
+    testing.assert_array_equal(fid[:2], res.fid.values[:2])
+    assert list(fid[2:]) == [None, None, None]
+
+
+def test_validate_structured() -> None:
+    # a value which isn't in the registry doesn't affect other queries
+    q = pd.DataFrame(
+        {
+            "postcode": ["", "201", "201"],
+            "street": ["Hagasmári", "Hagasmári", "Hagasmári"],
+            "house_nr": ["1", "ZZZ", "1"],
+        }
+    )
+    status, fid = lookup.validate(q)
+    testing.assert_array_equal(status, [1, 3, 0])
+    assert fid[0] == fid[2]
+    res = lookup.query_dataframe(q)
+    testing.assert_array_equal(
+        res.street_nominative.values, ["Hagasmári", "", "Hagasmári"]
+    )
+
+
+def test_validate_requires_fid() -> None:
+    with pytest.raises(ValueError):
+        Lookup(columns=["geometry"], postcodes=[101]).validate(["Laugavegur 22"])
+
+
+def test_query_crs() -> None:
+    queries = ["Laugavegur 22, 101 Reykjavík", "Hagasmári 999, 201 Kópavogi", ""]
+    res = lookup.query(queries, crs=3057, fallback=True)
+    assert res.crs == "EPSG:3057"
+    # the native coordinates, not a transform
+    assert (res.geometry.iloc[0].x, res.geometry.iloc[0].y) == (
+        res.x.iloc[0],
+        res.y.iloc[0],
+    )
+    idx = lookup.centroid_index
+    pos = idx.index.get_loc(("Kópavogur", "201", "Hagasmári"))
+    assert res.geometry.iloc[1].x == pytest.approx(idx.x[pos])
+    assert res.geometry.iloc[2] is None
+
+    # both agree with a transform to within centimeters
+    expected = lookup.query(queries[:1]).to_crs(3057)
+    assert res.geometry.iloc[:1].distance(expected.geometry).max() < 0.05
+
+    res = lookup.query_dataframe(
+        pd.DataFrame({"postcode": [101], "street": ["Laugavegur"], "house_nr": [22]}),
+        crs="EPSG:3057",
+    )
+    assert res.crs == "EPSG:3057"
+    # other crs are transformed
+    assert lookup.query(queries, crs=3857).crs == "EPSG:3857"
+    assert lookup.query(queries, crs=4326).crs == "EPSG:4326"
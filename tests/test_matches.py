@@ -1,3 +1,5 @@
+import io
+
 import pytest
 
 from stadfangaskra import matches
@@ -22,3 +24,38 @@ from stadfangaskra import matches
 )
 def test_matches(text, expected) -> None:
     assert list(matches.iter_matches(text)) == expected
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 1000])
+def test_stream_matches_across_chunks(size) -> None:
+    text = "Þórsgata 1 101 Reykjavík, Háaleitisbraut 68, 103 Reykjavík"
+    expected = list(matches.iter_matches(text))
+    chunks = [text[i : i + size] for i in range(0, len(text), size)]
+    assert list(matches.iter_stream_matches(iter(chunks))) == expected
+
+    # multi byte characters split between chunks are decoded
+    data = text.encode("utf-8")
+    chunks = [data[i : i + size] for i in range(0, len(data), size)]
+    assert list(matches.iter_stream_matches(chunks)) == expected
+
+
+def test_iter_words() -> None:
+    chunks = ["Laugavegur\t22,\n1", "01  Reykjavík\r\n", "\n"]
+    words = ["Laugavegur", "22,", "101", "Reykjavík"]
+    assert list(matches.iter_words(chunks)) == words
+    text = "".join(chunks)
+    assert list(matches.iter_stream_matches(chunks)) == list(matches.iter_matches(text))
+
+    # text without whitespace isn't held in memory as a single word
+    chunks = ["x" * 100] * 100
+    words = list(matches.iter_words(iter(chunks)))
+    assert len(words) > 1
+    assert max(map(len, words)) <= matches.MAX_WORD_LENGTH + 100
+    assert "".join(words) == "".join(chunks)
+
+
+def test_stream_matches_file() -> None:
+    text = "Laugavegur 22, 101 Reykjavík " * 100
+    for f in [io.StringIO(text), io.BytesIO(text.encode("utf-8"))]:
+        res = list(matches.iter_stream_matches(f, chunk_size=5))
+        assert res == [matches.Match(101, "Laugavegur", "22")] * 100
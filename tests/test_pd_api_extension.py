@@ -52,7 +52,9 @@ def test_hydrate_string_field(address_df) -> None:
 
 def test_hydrate_structured_fields(structured_df):
     res = structured_df.stadfangaskra.hydrate()
-    testing.assert_array_equal(structured_df.postcode.values, res.postcode.values)
+    testing.assert_array_equal(
+        structured_df.postcode.astype(str).values, res.postcode.values
+    )
     testing.assert_array_equal(
         res.street_nominative.values, ["Laugavegur", "Hagasmári", "Laugavegur"]
     )
@@ -61,7 +63,9 @@ def test_hydrate_structured_fields(structured_df):
 def test_hydrate_structured_fields_idx(structured_df):
     structured_df = structured_df.set_index("someother_col")
     res = structured_df.stadfangaskra.hydrate()
-    testing.assert_array_equal(structured_df.postcode.values, res.postcode.values)
+    testing.assert_array_equal(
+        structured_df.postcode.astype(str).values, res.postcode.values
+    )
     testing.assert_array_equal(
         res.street_nominative.values, ["Laugavegur", "Hagasmári", "Laugavegur"]
     )
@@ -95,3 +99,54 @@ def test_with_index() -> None:
     print(res)
     testing.assert_array_equal(["a", "b", "c"], res.index.values)
     #assert False
+
+
+def test_hydrate_with_region() -> None:
+    df = pd.DataFrame({"address": ["Aðalstræti 2", "Aðalstræti 2, Akureyri"]})
+    res = df.stadfangaskra.hydrate(region="Höfuðborgarsvæðið")
+    testing.assert_array_equal(res.postcode.values, ["101", "600"])
+
+
+def test_hydrate_does_not_modify_input(address_df, structured_df) -> None:
+    for df in [address_df, structured_df, address_df.rename_axis("idx")]:
+        before = df.copy()
+        df.stadfangaskra.hydrate()
+        pd.testing.assert_frame_equal(df, before)
+
+
+def test_series_query_text_bodies() -> None:
+    s = pd.Series(
+        [
+            "Laugavegi 22, 101 Reykjavík og Hagasmára 1, 201 Kópavogi",
+            None,
+            "Engin heimilisföng hér",
+            "Þórsgata 1 101 Reykjavík",
+        ],
+        index=["a", "b", "c", "d"],
+    )
+    res = s.stadfangaskra.query_text_bodies()
+    testing.assert_array_equal(res.document.values, ["a", "a", "d"])
+    testing.assert_array_equal(res["match"].values, [0, 1, 0])
+    testing.assert_array_equal(
+        res.street_nominative.values, ["Laugavegur", "Hagasmári", "Þórsgata"]
+    )
+
+
+def test_hydrate_validate(address_df, structured_df) -> None:
+    res = address_df.stadfangaskra.hydrate(mode="validate")
+    assert list(res.columns) == list(address_df.columns) + ["status", "fid"]
+    full = address_df.stadfangaskra.hydrate()
+    testing.assert_array_equal(res.fid.notna(), full.postcode != "")
+
+    res = structured_df.stadfangaskra.hydrate(mode="validate")
+    testing.assert_array_equal(res.status.astype(str), ["exact"] * len(res))
+
+    with pytest.raises(ValueError):
+        address_df.stadfangaskra.hydrate(mode="fast")
+
+
+def test_hydrate_crs(address_df, structured_df) -> None:
+    res = address_df.stadfangaskra.hydrate(crs=3057)
+    assert res.geometry.values.crs == "EPSG:3057"
+    res = structured_df.stadfangaskra.hydrate(crs=3057)
+    assert res.crs == "EPSG:3057"
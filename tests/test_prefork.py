@@ -0,0 +1,109 @@
+#  pylint: disable=redefined-outer-name,protected-access
+import gc
+import multiprocessing
+import os
+import pickle
+
+import pandas as pd
+import pytest
+
+from stadfangaskra import Lookup, lookup
+
+queries = [
+    "Laugavegur 22, 101 Reykjavík",
+    "Hagasmári 1, 201 Kópavogi",
+    "Hagasmári 999, 201 Kópavogi",
+    "Funafold 95",
+    "Hafnarstræti 20",
+    "Reykjavík",
+    "Heimilisfang vantar",
+]
+
+
+@pytest.fixture(scope="module")
+def compact() -> Lookup:
+    return Lookup(compact=True)
+
+
+def test_compact_layout(compact) -> None:
+    assert "geometry" not in compact._columns
+    assert not any(a.dtype == object for a in compact._columns.values())
+    assert isinstance(compact.df.street_nominative.dtype, pd.StringDtype)
+
+
+def test_compact_load_does_not_freeze() -> None:
+    gc.unfreeze()
+    Lookup(compact=True, region="Höfuðborgarsvæðið")
+    # only prepare_fork freezes the objects of the process
+    assert gc.get_freeze_count() == 0
+
+
+def test_compact_query(compact, structured_df) -> None:
+    pd.testing.assert_frame_equal(
+        compact.query(queries, fallback=True), lookup.query(queries, fallback=True)
+    )
+    pd.testing.assert_frame_equal(
+        compact.query(queries, crs=3057), lookup.query(queries, crs=3057)
+    )
+    pd.testing.assert_frame_equal(
+        compact.query_dataframe(structured_df), lookup.query_dataframe(structured_df)
+    )
+    pd.testing.assert_frame_equal(
+        compact.within_radius(-21.92913, 64.14558, 200),
+        lookup.within_radius(-21.92913, 64.14558, 200),
+    )
+
+
+@pytest.mark.parametrize("geometry_format", ["coordinates", "wkb"])
+def test_compact_registry_table(compact, geometry_format) -> None:
+    assert compact.registry_table(geometry_format).equals(
+        lookup.registry_table(geometry_format)
+    )
+
+
+def test_compact_pickle(compact) -> None:
+    restored = pickle.loads(pickle.dumps(compact))
+    assert restored.compact
+    pd.testing.assert_frame_equal(restored.query(queries), compact.query(queries))
+
+
+def _shared_kb() -> int:
+    with open("/proc/self/smaps_rollup") as f:
+        fields = dict(line.split(":", 1) for line in f if ":" in line)
+    return sum(int(fields[k].split()[0]) for k in ["Shared_Clean", "Shared_Dirty"])
+
+
+def _workload(lk: Lookup, q: pd.DataFrame, conn) -> None:
+    before = _shared_kb()
+    for _ in range(3):
+        lk.query_dataframe(q)
+    conn.send(before - _shared_kb())
+    conn.close()
+
+
+@pytest.mark.skipif(
+    not os.path.exists("/proc/self/smaps_rollup"), reason="requires Linux smaps"
+)
+def test_forked_worker_memory(compact) -> None:
+    sample = compact.df.sample(20000, random_state=0)
+    q = pd.DataFrame(
+        {
+            "postcode": sample.postcode.values,
+            "street": sample.street_nominative.values,
+            "house_nr": sample.house_nr.values,
+        }
+    )
+    # warm up the lazy indexes before forking, as a prefork server would
+    compact.query_dataframe(q.head())
+    compact.prepare_fork()
+
+    ctx = multiprocessing.get_context("fork")
+    parent, child = ctx.Pipe(duplex=False)
+    p = ctx.Process(target=_workload, args=(compact, q, child))
+    p.start()
+    lost_kb = parent.recv()
+    p.join()
+    assert p.exitcode == 0
+    # pages the worker copied from the parent, about 48 MiB with the registry
+    # rows as Python objects
+    assert lost_kb < 16 * 1024
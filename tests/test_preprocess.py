@@ -0,0 +1,174 @@
+import sys
+
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+import shapely
+from numpy import testing
+
+from preprocess.__main__ import (
+    build_centroids,
+    build_divisions,
+    build_registry,
+    build_service_areas,
+    build_special_names,
+    build_street_postcodes,
+    main,
+    parse_points,
+    read_source,
+)
+from preprocess.config import REGIONS_PATH
+from stadfangaskra.cells import CELL_COLS
+
+
+@pytest.fixture
+def source_csv(shared_datadir):
+    return shared_datadir / "source.csv"
+
+
+def test_build_registry(source_csv) -> None:
+    df = build_registry(read_source(source_csv))
+    # the duplicated Laugavegur 22 row is dropped
+    assert len(df) == 17
+    assert not df.duplicated(
+        subset=["municipality", "postcode", "street_nominative", "house_nr"]
+    ).any()
+    assert df.fid.str.endswith("-dup").sum() == 0
+    # sorted by postcode, street and house number
+    testing.assert_array_equal(
+        df.index.values,
+        df.sort_values(["postcode", "street_nominative", "house_nr"]).index.values,
+    )
+
+    laugavegur = df[df.street_nominative == "Laugavegur"]
+    assert "18A" in laugavegur.house_nr.values
+    testing.assert_array_equal(
+        laugavegur.municipality.values, ["", "Reykjavík", "Reykjavík", "Reykjavík"]
+    )
+    testing.assert_array_equal(laugavegur.postcode.values, ["0", "101", "101", "101"])
+    assert (df.special_name == "").sum() == 16
+    assert df.municipality_code.dtype == pd.Int32Dtype()
+
+    # the native ISN93 coordinates are kept next to WGS84
+    lindarbraut = df[df.street_nominative == "Lindarbraut"].iloc[0]
+    assert (lindarbraut.x, lindarbraut.y) == (353936.0, 409453.0)
+    assert lindarbraut.lat == pytest.approx(64.15665396)
+    # with the grid cells of each address
+    assert lindarbraut.grid_1000m == 3530000409000
+    assert df[CELL_COLS].notna().all().all()
+
+
+def test_parse_points() -> None:
+    x, y = parse_points(
+        pd.Series(["POINT (353936.00 409453.00)", "POINT(1.5e5 -2)", "", None])
+    )
+    testing.assert_array_equal(x, [353936.0, 150000.0, float("nan"), float("nan")])
+    testing.assert_array_equal(y, [409453.0, -2.0, float("nan"), float("nan")])
+
+
+def test_build_street_postcodes(source_csv) -> None:
+    df = build_registry(read_source(source_csv))
+    lookup = build_street_postcodes(df).set_index(["municipality", "street"])
+    assert lookup.loc[("Reykjavík", "Laugavegur"), "postcode"] == "101"
+    assert lookup.loc[("Reykjavík", "Laugavegi"), "postcode"] == "101"
+    assert lookup.loc[("Kópavogur", "Hagasmára"), "postcode"] == "201"
+    assert ("", "Laugavegur") in lookup.index
+
+
+def test_build_street_postcodes_drops_ambiguous_streets(source_csv) -> None:
+    df = build_registry(read_source(source_csv))
+    extra = df[df.street_nominative == "Funafold"].assign(postcode="110")
+    lookup = build_street_postcodes(pd.concat([df, extra])).set_index(
+        ["municipality", "street"]
+    )
+    assert ("Reykjavík", "Funafold") not in lookup.index
+    assert ("Reykjavík", "Laugavegur") in lookup.index
+
+
+def test_build_centroids(source_csv) -> None:
+    df = build_registry(read_source(source_csv))
+    centroids = build_centroids(df)
+    keys = ["municipality", "postcode", "street_nominative"]
+    assert not centroids.duplicated(keys).any()
+    centroids = centroids.set_index(keys)
+
+    laugavegur = df[(df.street_nominative == "Laugavegur") & (df.postcode == "101")]
+    row = centroids.loc[("Reykjavík", "101", "Laugavegur")]
+    assert row.level == "street"
+    assert row["count"] == 3
+    assert row.lon == pytest.approx(laugavegur.lon.mean())
+    assert row.minx == pytest.approx(laugavegur.lon.min())
+    assert row.maxy == pytest.approx(laugavegur.lat.max())
+    assert row.x == pytest.approx(laugavegur.x.mean())
+    # a street without a postcode, within its municipality
+    assert centroids.loc[("Reykjavík", "", "Laugavegur")].level == "street"
+    assert centroids.loc[("Reykjavík", "101", "")].level == "postcode"
+    assert centroids.loc[("Reykjavík", "", "")]["count"] == 6
+    # rows without a municipality or postcode only make up street centroids
+    assert ("", "0", "") not in centroids.index
+    assert ("", "", "") not in centroids.index
+
+
+def test_build_divisions(source_csv) -> None:
+    df = build_registry(read_source(source_csv))
+    divisions = build_divisions(pd.read_parquet(REGIONS_PATH), df)
+    assert "Seltjarnarnes" in divisions["regions"]["Höfuðborgarsvæðið"]
+    assert {"101", "112", "170", "201"} <= set(
+        divisions["region_postcodes"]["Höfuðborgarsvæðið"]
+    )
+    assert divisions["administrative_divisions"]["Garðabær"] == [
+        "Garðabær",
+        "Garðabær (Álftanes)",
+    ]
+    # single town municipalities are left out
+    assert "Hveragerði" not in divisions["administrative_divisions"]
+
+
+def test_build_service_areas(source_csv) -> None:
+    df = build_registry(read_source(source_csv))
+    areas = build_service_areas(df)
+    # one area per postcode and municipality code
+    assert len(areas) == 12
+    assert not areas.duplicated(["postcode", "municipality_code"]).any()
+    assert areas.set_index("postcode").loc["101", "municipality"] == "Reykjavík"
+    polygons = shapely.from_wkb(areas.geometry.values)
+    assert shapely.is_valid(polygons).all()
+    # every address is inside the area of its postcode, and only that one
+    df = df[df.postcode != "0"]
+    points = shapely.points(df.lon.values, df.lat.values)
+    inside = shapely.contains(polygons[:, None], points[None, :])
+    testing.assert_array_equal(
+        areas.postcode.values[inside.argmax(axis=0)], df.postcode.values
+    )
+    assert (inside.sum(axis=0) == 1).all()
+
+
+def test_build_special_names(source_csv) -> None:
+    df = build_registry(read_source(source_csv))
+    extra = df[df.street_nominative == "Funafold"].assign(special_name="Funafold")
+    special_names = build_special_names(pd.concat([df, extra]))
+    # blank names and names of streets are left out
+    assert special_names.values.tolist() == [
+        ["Smáralind", "Kópavogur", "201", "Hagasmári", "1"]
+    ]
+
+
+def test_main_with_local_source(source_csv, tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(
+        sys,
+        "argv",
+        ["preprocess", "--source", str(source_csv), "--output-path", str(tmp_path)],
+    )
+    main()
+    f = pq.ParquetFile(tmp_path / "df.parquet.gzip")
+    column = f.metadata.row_group(0).column(0)
+    assert column.compression == "ZSTD"
+    assert "RLE_DICTIONARY" in column.encodings
+    assert f.metadata.num_rows == 17
+    for name in [
+        "street_postcodes.parquet",
+        "street_dative.parquet",
+        "centroids.parquet",
+        "divisions.json",
+    ]:
+        assert (tmp_path / name).exists()
@@ -0,0 +1,71 @@
+import pyarrow.parquet as pq
+import pytest
+from numpy import testing
+
+import stadfangaskra
+from stadfangaskra import Lookup, static
+
+
+def test_load_registry_columns() -> None:
+    df = static.load_registry(columns=["fid"], postcodes=[101])
+    assert list(df.columns) == static.INDEX_COLS + ["fid"]
+    assert set(df.postcode) == {"101"}
+
+
+def test_load_registry_geometry() -> None:
+    df = static.load_registry(columns=["geometry"], municipalities=["Akureyri"])
+    assert "lat" not in df.columns
+    assert df.crs == "EPSG:4326"
+    # the native ISN93 coordinates are loaded with the geometry
+    assert {"x", "y"} <= set(df.columns)
+    assert set(df.municipality) == {"Akureyri"}
+
+
+def test_load_registry_unknown_region() -> None:
+    with pytest.raises(ValueError):
+        static.load_registry(region="Atlantis")
+
+
+def test_registry_row_groups_are_clustered_by_postcode() -> None:
+    metadata = pq.ParquetFile(static.data_path).metadata
+    assert metadata.num_row_groups > 1
+    idx = metadata.schema.to_arrow_schema().get_field_index("postcode")
+    matching = [
+        i
+        for i in range(metadata.num_row_groups)
+        if metadata.row_group(i).column(idx).statistics.min
+        <= "600"
+        <= metadata.row_group(i).column(idx).statistics.max
+    ]
+    assert len(matching) == 1
+
+
+def test_region_lookup() -> None:
+    lookup = Lookup(region="Höfuðborgarsvæðið")
+    assert len(lookup.df) < len(stadfangaskra.df)
+    res = lookup.query(["Laugavegur 22, 101 Reykjavík", "Bjarmastígur 13, Akureyri"])
+    testing.assert_array_equal(res.postcode.values, ["101", ""])
+
+
+def test_postcode_lookup_with_columns() -> None:
+    lookup = Lookup(columns=["fid"], postcodes=[201])
+    res = lookup.query("Hagasmári 1, 201 Kópavogi")
+    testing.assert_array_equal(res.street_nominative.values, ["Hagasmári"])
+    assert "geometry" not in res.columns
+
+
+def test_region_hint() -> None:
+    lookup = stadfangaskra.lookup
+    # Aðalstræti 2 exists in Reykjavík, Þingeyri and Akureyri
+    res = lookup.query(["Aðalstræti 2", "Laugavegur 22, 101 Reykjavík"])
+    testing.assert_array_equal(res.postcode.values, ["", "101"])
+    # exact matches outside the region are still returned
+    res = lookup.query(
+        ["Aðalstræti 2", "Laugavegur 22, 101 Reykjavík"], region="Norðurland eystra"
+    )
+    testing.assert_array_equal(res.postcode.values, ["600", "101"])
+
+
+def test_region_hint_unknown_region() -> None:
+    with pytest.raises(ValueError):
+        stadfangaskra.lookup.query("Aðalstræti 2", region="Atlantis")
@@ -0,0 +1,97 @@
+#  pylint: disable=redefined-outer-name
+import pandas as pd
+import pytest
+from numpy import testing
+
+from stadfangaskra import lookup
+from stadfangaskra.keys import AMBIGUOUS, EXACT, NONE, PARTIAL
+from stadfangaskra.sharded import ProcessShard, ShardedLookup
+
+queries = [
+    "Laugavegur 22, 101 Reykjavík",
+    "Hagasmári 1, 201 Kópavogi",
+    "Smáralind",
+    "Hraunbær 102",
+    "Hafnarstræti 20 Akureyri",
+    # on streets in more than one shard
+    "Hafnarstræti 20",
+    "Heimilisfang vantar",
+    "",
+    None,
+    "Laugavegur 22, 101 Reykjavík",
+]
+
+
+@pytest.fixture(scope="module")
+def sharded():
+    with ShardedLookup.by_region() as s:
+        yield s
+
+
+def _compare(res: pd.DataFrame, expected: pd.DataFrame) -> None:
+    # categories of categorical columns are the union of the shards'
+    pd.testing.assert_frame_equal(
+        res, expected, check_dtype=False, check_categorical=False
+    )
+
+
+def test_sharded_query(sharded) -> None:
+    _compare(sharded.query(queries), lookup.query(queries))
+
+
+def test_sharded_query_dataframe(sharded, structured_df) -> None:
+    df = structured_df.assign(postcode=["", 201, 101])
+    _compare(sharded.query_dataframe(df), lookup.query_dataframe(df))
+
+
+def test_sharded_region(sharded) -> None:
+    _compare(
+        sharded.query(queries, region="Höfuðborgarsvæðið"),
+        lookup.query(queries, region="Höfuðborgarsvæðið"),
+    )
+    with pytest.raises(ValueError):
+        sharded.query(queries, region="Atlantis")
+
+
+def test_sharded_options(sharded, structured_df) -> None:
+    for crs in [3057, "EPSG:3857"]:
+        _compare(sharded.query(queries, crs=crs), lookup.query(queries, crs=crs))
+        _compare(
+            sharded.query_dataframe(structured_df, crs=crs),
+            lookup.query_dataframe(structured_df, crs=crs),
+        )
+    for option in [{"fallback": True}, {"house_nr_fallback": "nearest"}]:
+        with pytest.raises(TypeError):
+            sharded.query(queries, **option)
+        with pytest.raises(TypeError):
+            sharded.query_dataframe(structured_df, **option)
+
+
+def test_sharded_status(sharded) -> None:
+    _, status = sharded.match_tuples(
+        pd.MultiIndex.from_tuples(
+            [
+                ("Reykjavík", "101", "Laugavegur", "22"),
+                ("", "", "Hraunbær", "102"),
+                ("", "", "Hafnarstræti", "20"),
+                ("", "", "Blablagata", "1"),
+            ]
+        )
+    )
+    testing.assert_array_equal(status, [EXACT, PARTIAL, AMBIGUOUS, NONE])
+
+
+def test_sharded_partitions() -> None:
+    with pytest.raises(ValueError):
+        ShardedLookup({"a": [101, 102], "b": ["101"]})
+    with pytest.raises(ValueError):
+        ShardedLookup({})
+
+
+def test_process_shards() -> None:
+    with ShardedLookup.by_postcode_range(
+        [100, 300, 600], shard_factory=ProcessShard, columns=["fid"]
+    ) as s:
+        assert list(s.shards) == ["100-299", "300-599", "600-"]
+        res = s.query(queries)
+    _compare(res, lookup.query(queries)[res.columns])
@@ -0,0 +1,56 @@
+import json
+import pickle
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+import stadfangaskra
+from stadfangaskra import Lookup
+from stadfangaskra.arrow import write_ipc
+
+ADDRESSES = ["Laugavegur 22, 101 Reykjavík", "Funafold 95", "Aðalstræti 2"]
+
+
+def test_save_and_load(tmp_path) -> None:
+    lookup = stadfangaskra.lookup
+    path = tmp_path / "lookup.arrow"
+    lookup.save(path)
+    restored = Lookup.load(path)
+
+    pd.testing.assert_frame_equal(restored.df, lookup.df)
+    assert restored.town_street_to_postcode == lookup.town_street_to_postcode
+    assert restored.street_dative == lookup.street_dative
+    pd.testing.assert_frame_equal(restored.query(ADDRESSES), lookup.query(ADDRESSES))
+    assert len(restored.complete("Laugav"))
+
+
+def test_pickle() -> None:
+    lookup = Lookup(region="Höfuðborgarsvæðið")
+    restored = pickle.loads(pickle.dumps(lookup))
+    pd.testing.assert_frame_equal(restored.df, lookup.df)
+    pd.testing.assert_frame_equal(
+        restored.query(ADDRESSES, region="Höfuðborgarsvæðið"),
+        lookup.query(ADDRESSES, region="Höfuðborgarsvæðið"),
+    )
+
+
+def test_save_without_geometry(tmp_path) -> None:
+    lookup = Lookup(columns=["fid"], postcodes=[112])
+    lookup.save(tmp_path / "lookup.arrow", compression=None)
+    restored = Lookup.load(tmp_path / "lookup.arrow")
+    assert list(restored.df.columns) == list(lookup.df.columns)
+
+
+def test_load_invalid_snapshot(tmp_path) -> None:
+    path = str(tmp_path / "table.arrow")
+    write_ipc(pa.table({"a": [1]}), path)
+    with pytest.raises(ValueError):
+        Lookup.load(path)
+
+    table = stadfangaskra.lookup._snapshot()  # pylint: disable=protected-access
+    state = json.loads(table.schema.metadata[b"stadfangaskra"])
+    state["version"] = 0
+    write_ipc(table.replace_schema_metadata({"stadfangaskra": json.dumps(state)}), path)
+    with pytest.raises(ValueError):
+        Lookup.load(path)
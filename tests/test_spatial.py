@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+from numpy import testing
+
+import stadfangaskra
+from stadfangaskra import Lookup
+from stadfangaskra.spatial import GridIndex, haversine
+
+# Laugavegur 22, 101 Reykjavík
+LON, LAT = -21.92913, 64.14558
+
+
+@pytest.fixture(scope="module")
+def coords():
+    geometry = stadfangaskra.lookup.df.geometry
+    return geometry.x.values, geometry.y.values
+
+
+def test_haversine() -> None:
+    # one degree of latitude is roughly 111 km
+    assert haversine(0, 64, 0, 65) == pytest.approx(111195, rel=1e-3)
+
+
+def test_within_radius(coords) -> None:
+    lon, lat = coords
+    res = stadfangaskra.lookup.within_radius(LON, LAT, 500)
+    expected = haversine(LON, LAT, lon, lat) <= 500
+    assert len(res) == expected.sum() > 0
+    assert res.distance_m.is_monotonic_increasing
+    assert res.distance_m.max() <= 500
+    assert res.iloc[0].street_nominative == "Laugavegur"
+
+
+def test_within_bbox(coords) -> None:
+    lon, lat = coords
+    bbox = (-21.95, 64.14, -21.92, 64.15)
+    res = stadfangaskra.lookup.within_bbox(*bbox)
+    expected = (lon >= bbox[0]) & (lon <= bbox[2]) & (lat >= bbox[1]) & (lat <= bbox[3])
+    assert len(res) == expected.sum() > 0
+    assert "101" in set(res.postcode)
+
+
+def test_batch_queries_match_single_queries() -> None:
+    lookup = stadfangaskra.lookup
+    centers = [(LON, LAT), (-18.09, 65.68), (0.0, 0.0)]
+    res = lookup.within_radius_many(
+        [c[0] for c in centers], [c[1] for c in centers], [300, 1000, 1000]
+    )
+    for i, (lon, lat) in enumerate(centers):
+        single = lookup.within_radius(lon, lat, [300, 1000, 1000][i])
+        testing.assert_array_equal(res[res.qidx == i].fid.values, single.fid.values)
+    assert not (res.qidx == 2).any()
+
+    bboxes = [(-21.95, 64.14, -21.92, 64.15), (-18.1, 65.67, -18.08, 65.69)]
+    res = lookup.within_bbox_many(bboxes)
+    for i, bbox in enumerate(bboxes):
+        testing.assert_array_equal(
+            res[res.qidx == i].fid.values, lookup.within_bbox(*bbox).fid.values
+        )
+
+
+def test_grid_index_outside_extent() -> None:
+    index = GridIndex(np.array([1.0, 1.005, 2.0]), np.array([1.0, 1.0, 2.0]))
+    qidx, positions = index.within_bbox([0.0, 5.0], [0.0, 5.0], [1.5, 6.0], [1.5, 6.0])
+    testing.assert_array_equal(qidx, [0, 0])
+    testing.assert_array_equal(positions, [0, 1])
+
+
+def test_spatial_queries_require_geometry() -> None:
+    lookup = Lookup(columns=["fid"], postcodes=[101])
+    with pytest.raises(ValueError):
+        lookup.within_radius(LON, LAT, 500)
@@ -0,0 +1,140 @@
+#  pylint: disable=redefined-outer-name
+import pickle
+import sqlite3
+import sys
+
+import pandas as pd
+import pytest
+from numpy import testing
+
+from preprocess.__main__ import main
+from stadfangaskra import Lookup, lookup
+from stadfangaskra.base import BaseLookup
+from stadfangaskra.sqlite import SqliteLookup, export_sqlite
+
+queries = [
+    "Laugavegur 22, 101 Reykjavík",
+    "Hagasmári 1, 201 Kópavogi",
+    "Smáralind",
+    "Hagasmári 999, 201 Kópavogi",
+    "Funafold 95",
+    "Hafnarstræti 20",
+    "Aðalstræti 2",
+    "Reykjavík",
+    "Heimilisfang vantar",
+    "",
+    None,
+    "Laugavegur 22, 101 Reykjavík",
+]
+
+
+@pytest.fixture(scope="module")
+def sqlite_path(tmp_path_factory):
+    path = tmp_path_factory.mktemp("sqlite") / "registry.sqlite"
+    export_sqlite(path)
+    return path
+
+
+@pytest.fixture(scope="module")
+def sqlite_lookup(sqlite_path):
+    with SqliteLookup(sqlite_path) as s:
+        yield s
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {},
+        {"fallback": True},
+        {"crs": 3057},
+        {"region": "Norðurland eystra"},
+        {"house_nr_fallback": "interpolate"},
+    ],
+)
+def test_sqlite_query(sqlite_lookup, kwargs) -> None:
+    pd.testing.assert_frame_equal(
+        sqlite_lookup.query(queries, **kwargs), lookup.query(queries, **kwargs)
+    )
+
+
+def test_sqlite_query_dataframe(sqlite_lookup, structured_df) -> None:
+    pd.testing.assert_frame_equal(
+        sqlite_lookup.query_dataframe(structured_df),
+        lookup.query_dataframe(structured_df),
+    )
+
+
+def test_sqlite_hydrate(sqlite_lookup, address_df) -> None:
+    pd.testing.assert_frame_equal(
+        address_df.stadfangaskra.hydrate(lookup=sqlite_lookup),
+        address_df.stadfangaskra.hydrate(),
+    )
+
+
+def test_sqlite_validate(sqlite_lookup) -> None:
+    status, fid = sqlite_lookup.validate(queries)
+    expected_status, expected_fid = lookup.validate(queries)
+    testing.assert_array_equal(status, expected_status)
+    testing.assert_array_equal(fid, expected_fid)
+
+
+def test_sqlite_locate(sqlite_lookup) -> None:
+    lon, lat = [-21.92913, -18.09, -17.0], [64.14558, 65.68, 64.8]
+    pd.testing.assert_frame_equal(
+        sqlite_lookup.locate(lon, lat), lookup.locate(lon, lat)
+    )
+
+
+def test_sqlite_query_house_range(sqlite_lookup) -> None:
+    ranges = ["Laugavegur 10-30, 101 Reykjavík", "Funafold 91-95"]
+    pd.testing.assert_frame_equal(
+        sqlite_lookup.query_house_ranges(ranges), lookup.query_house_ranges(ranges)
+    )
+
+
+def test_sqlite_columns(sqlite_path) -> None:
+    with SqliteLookup(sqlite_path, columns=["fid"]) as s:
+        pd.testing.assert_frame_equal(
+            s.query(queries), Lookup(columns=["fid"]).query(queries)
+        )
+    with SqliteLookup(sqlite_path, columns=["geometry"]) as s:
+        with pytest.raises(ValueError):
+            s.validate(queries)
+    with pytest.raises(ValueError):
+        SqliteLookup(sqlite_path, columns=["population"])
+
+
+def test_base_lookup_is_abstract() -> None:
+    # a backend must implement every storage hook
+    with pytest.raises(TypeError):
+        BaseLookup()  # pylint: disable=abstract-class-instantiated
+
+
+def test_sqlite_pickle(sqlite_lookup) -> None:
+    restored = pickle.loads(pickle.dumps(sqlite_lookup))
+    pd.testing.assert_frame_equal(restored.query(queries), lookup.query(queries))
+
+
+def test_sqlite_is_read_only(sqlite_lookup) -> None:
+    # pylint: disable=protected-access
+    with pytest.raises(sqlite3.OperationalError):
+        sqlite_lookup._conn.execute("DELETE FROM addresses")
+
+
+def test_preprocess_sqlite(shared_datadir, tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(
+        sys,
+        "argv",
+        [
+            "preprocess",
+            "--source",
+            str(shared_datadir / "source.csv"),
+            "--output-path",
+            str(tmp_path),
+            "--sqlite",
+        ],
+    )
+    main()
+    with SqliteLookup(tmp_path / "registry.sqlite") as s:
+        res = s.query(["Laugavegur 22, 101 Reykjavík", "Laugavegur 999"])
+    testing.assert_array_equal(res.street_nominative.values, ["Laugavegur", ""])